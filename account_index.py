@@ -0,0 +1,161 @@
+# Author: Ian Docherty
+# Description: This module defines the AccountIndex class, an in-memory index over
+#              account names that answers prefix and substring searches without
+#              scanning every account.
+
+from bisect import bisect_left, insort
+
+
+# Searches shorter than this only match account names that start with the search text
+TRIGRAM_LENGTH = 3
+
+# Sorts after any character, used to find the end of a range of names sharing a prefix
+MAX_CHAR = chr(0x10FFFF)
+
+
+class AccountIndex:
+    """
+    Indexes account names for filter-as-you-type searches. A sorted list of
+    names answers prefix searches with a binary search, and a trigram index
+    narrows substring searches down to a few candidates. Both are updated
+    incrementally as passwords are added, edited, and deleted.
+    """
+
+    def __init__(self):
+        """
+        Creates an empty AccountIndex
+        """
+        self.names_by_id = {}  # Maps row id to lowercase account name
+        self.sorted_names = []  # Sorted list of (lowercase account name, row id)
+        self.trigram_ids = {}  # Maps each trigram to the set of row ids whose name contains it
+
+    def build(self, records):
+        """
+        Replaces the contents of the index with the given records
+        :param records: iterable of PasswordRecord objects
+        """
+        self.names_by_id = {}
+        self.trigram_ids = {}
+        for record in records:
+            name = record.account.lower()
+            self.names_by_id[record.row_id] = name
+            self._add_trigrams(record.row_id, name)
+
+        self.sorted_names = sorted((name, row_id) for (row_id, name) in self.names_by_id.items())
+
+    def add(self, row_id, account):
+        """
+        Adds an account to the index, replacing any account with the same row id
+        """
+        if row_id in self.names_by_id:
+            self.remove(row_id)
+
+        name = account.lower()
+        self.names_by_id[row_id] = name
+        insort(self.sorted_names, (name, row_id))
+        self._add_trigrams(row_id, name)
+
+    def add_records(self, records):
+        """
+        Adds many accounts to the index. Names that sort after every indexed
+        name, like the pages of a streamed load, are appended without a full sort.
+        :param records: iterable of PasswordRecord objects not yet in the index
+        """
+        new_names = []
+        for record in records:
+            name = record.account.lower()
+            self.names_by_id[record.row_id] = name
+            self._add_trigrams(record.row_id, name)
+            new_names.append((name, record.row_id))
+
+        new_names.sort()
+        if new_names and self.sorted_names and new_names[0] < self.sorted_names[-1]:
+            self.sorted_names.extend(new_names)
+            self.sorted_names.sort()  # Merges the two sorted runs in linear time
+        else:
+            self.sorted_names.extend(new_names)
+
+    def remove(self, row_id):
+        """
+        Removes the account with the given row id from the index
+        """
+        name = self.names_by_id.pop(row_id, None)
+        if name is None:
+            return
+
+        del self.sorted_names[bisect_left(self.sorted_names, (name, row_id))]
+        for trigram in get_trigrams(name):
+            row_ids = self.trigram_ids[trigram]
+            row_ids.discard(row_id)
+            if not row_ids:
+                del self.trigram_ids[trigram]
+
+    def search(self, search_text):
+        """
+        Returns the row ids of the accounts matching the given search text.
+        Searches shorter than three characters match account names starting
+        with the text, longer searches match names containing the text.
+        Matching ignores case.
+        :param search_text: text to search account names for
+        :return: A list of matching row ids
+        """
+        search_text = search_text.lower()
+        if len(search_text) < TRIGRAM_LENGTH:
+            return self._search_prefix(search_text)
+
+        # Start from the rarest trigram and only check names containing every trigram
+        trigram_sets = []
+        for trigram in get_trigrams(search_text):
+            row_ids = self.trigram_ids.get(trigram)
+            if row_ids is None:
+                return []
+            trigram_sets.append(row_ids)
+
+        # A three character search is a single trigram, so every candidate matches
+        if len(search_text) == TRIGRAM_LENGTH:
+            return list(trigram_sets[0])
+
+        trigram_sets.sort(key=len)
+        candidate_ids = trigram_sets[0].intersection(*trigram_sets[1:])
+
+        # Trigrams may appear in a different order than in the search text, so check each name
+        names_by_id = self.names_by_id
+        return [row_id for row_id in candidate_ids if search_text in names_by_id[row_id]]
+
+    def _search_prefix(self, prefix):
+        """
+        Returns the row ids of the accounts starting with the given lowercase prefix
+        """
+        start = bisect_left(self.sorted_names, (prefix, ))
+        end = bisect_left(self.sorted_names, (prefix + MAX_CHAR, ))
+        return [row_id for (name, row_id) in self.sorted_names[start:end]]
+
+    def _add_trigrams(self, row_id, name):
+        """
+        Adds the given row id to the set of every trigram in the given name
+        """
+        for trigram in get_trigrams(name):
+            row_ids = self.trigram_ids.get(trigram)
+            if row_ids is None:
+                self.trigram_ids[trigram] = {row_id}
+            else:
+                row_ids.add(row_id)
+
+
+def get_trigrams(text):
+    """
+    Returns the set of three-character substrings of the given text
+    """
+    return {text[index:index + TRIGRAM_LENGTH] for index in range(len(text) - TRIGRAM_LENGTH + 1)}
+
+
+def account_matches(search_text, account):
+    """
+    Returns True if the given account name matches the given search text
+    using the same rules as AccountIndex.search
+    """
+    search_text = search_text.lower()
+    if len(search_text) < TRIGRAM_LENGTH:
+        return account.lower().startswith(search_text)
+
+    return search_text in account.lower()
@@ -0,0 +1,223 @@
+# Author: Ian Docherty
+# Description: This module checks passwords against a local list of passwords
+#              found in data breaches. The list is built once from a Have I Been
+#              Pwned style file of SHA-1 hashes into a compact binary file that
+#              is searched through a memory map. Run this module with the path
+#              of the hash file to build the list.
+
+import argparse
+import hashlib
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+
+# Compiled breached password list read by the app
+BREACH_LIST_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "breached_passwords.bin")
+
+# Layout of the compiled file header: magic, version, number of hashes
+BREACH_LIST_MAGIC = b"PVBP"
+BREACH_LIST_VERSION = 1
+BREACH_LIST_HEADER = struct.Struct("<4sHQ")
+
+# The first HASH_BYTES bytes of each SHA-1 hash are kept. The first
+# PREFIX_BYTES select a bucket of the fanout table and the rest are stored.
+HASH_BYTES = 8
+PREFIX_BYTES = 2
+RECORD_SIZE = HASH_BYTES - PREFIX_BYTES
+BUCKET_COUNT = 1 << (8 * PREFIX_BYTES)
+
+WRITE_BUFFER_SIZE = 1 << 20  # Bytes of records collected before writing them to disk
+
+
+class BreachedPasswordList:
+    """
+    A sorted list of truncated SHA-1 hashes of breached passwords, read from
+    a compiled file through a memory map. A fanout table gives the range of
+    records sharing the first two bytes of a hash, and a binary search within
+    that range finds the hash, so a lookup touches only a few pages.
+    """
+
+    def __init__(self, path=BREACH_LIST_FILE):
+        """
+        Opens the compiled breached password list file at the given path
+        """
+        with open(path, "rb") as file:
+            self.map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, count = BREACH_LIST_HEADER.unpack_from(self.map)
+        if magic != BREACH_LIST_MAGIC or version != BREACH_LIST_VERSION:
+            raise ValueError("Not a breached password list file: " + path)
+
+        # The header is followed by the fanout table, then the records
+        fanout_start = BREACH_LIST_HEADER.size
+        self.count = count
+        self.records_start = fanout_start + 8 * (BUCKET_COUNT + 1)
+        self.fanout = _read_uint64_array(self.map, fanout_start, BUCKET_COUNT + 1)
+
+    def __len__(self):
+        """
+        Returns the number of hashes in the list
+        """
+        return self.count
+
+    def contains(self, password):
+        """
+        Returns True if the given password is in the list
+        """
+        return self.contains_hash(hashlib.sha1(password.encode("utf-8")).digest())
+
+    def contains_hash(self, digest):
+        """
+        Returns True if the given SHA-1 digest is in the list
+        :param digest: SHA-1 digest as bytes, at least HASH_BYTES long
+        """
+        bucket = int.from_bytes(digest[:PREFIX_BYTES], "big")
+        low = self.fanout[bucket]
+        high = end = self.fanout[bucket + 1]
+        key = digest[PREFIX_BYTES:HASH_BYTES]
+
+        while low < high:
+            middle = (low + high) // 2
+            if self.get_record(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+
+        return low < end and self.get_record(low) == key
+
+    def get_record(self, index):
+        """
+        Returns the stored part of the hash at the given index as bytes
+        """
+        start = self.records_start + index * RECORD_SIZE
+        return self.map[start:start + RECORD_SIZE]
+
+
+def _read_uint64_array(buffer, start, count):
+    """
+    Returns a sequence of count little-endian unsigned 64 bit integers read
+    from the given buffer, without copying on little-endian machines
+    """
+    view = memoryview(buffer)[start:start + 8 * count].cast("Q")
+    if sys.byteorder == "little":
+        return view
+
+    values = array("Q", view)
+    values.byteswap()
+    return values
+
+
+def build_breach_list(source_path, path=BREACH_LIST_FILE):
+    """
+    Builds a compiled breached password list from a text file with one
+    uppercase or lowercase hex SHA-1 hash per line, optionally followed by a
+    colon and a count, sorted by hash. The Have I Been Pwned "ordered by hash"
+    downloads use this format. The file is read one line at a time, so its
+    size does not matter.
+    :param source_path: path of the sorted hash file
+    :param path: path of the compiled file to write
+    :return: The number of hashes written
+    """
+    bucket_counts = array("Q", bytes(8 * BUCKET_COUNT))
+    count = 0
+    last_hash = b""
+    buffer = bytearray()
+
+    # Write to a temporary file first so readers never see a partial file
+    temp_path = path + ".tmp"
+    try:
+        with open(source_path, "r", encoding="ascii") as source, open(temp_path, "wb") as file:
+
+            # Reserve space for the header and fanout table, which are written last
+            file.write(bytes(BREACH_LIST_HEADER.size + 8 * (BUCKET_COUNT + 1)))
+
+            for (line_number, line) in enumerate(source, start=1):
+                hex_hash = line.split(":", 1)[0].strip()
+                if not hex_hash:
+                    continue
+
+                try:
+                    truncated_hash = bytes.fromhex(hex_hash)[:HASH_BYTES]
+                except ValueError:
+                    raise ValueError("Invalid hash on line " + str(line_number)) from None
+                if len(truncated_hash) != HASH_BYTES:
+                    raise ValueError("Invalid hash on line " + str(line_number))
+
+                # Hashes differing only after the kept bytes are stored once
+                if truncated_hash < last_hash:
+                    raise ValueError("Hashes are not sorted on line " + str(line_number))
+                if truncated_hash == last_hash:
+                    continue
+                last_hash = truncated_hash
+
+                bucket_counts[int.from_bytes(truncated_hash[:PREFIX_BYTES], "big")] += 1
+                buffer += truncated_hash[PREFIX_BYTES:]
+                count += 1
+                if len(buffer) >= WRITE_BUFFER_SIZE:
+                    file.write(buffer)
+                    buffer.clear()
+
+            file.write(buffer)
+
+            # The fanout table holds the index of the first record of each bucket
+            fanout = array("Q", [0])
+            for bucket_count in bucket_counts:
+                fanout.append(fanout[-1] + bucket_count)
+            if sys.byteorder != "little":
+                fanout.byteswap()
+
+            file.seek(0)
+            file.write(BREACH_LIST_HEADER.pack(BREACH_LIST_MAGIC, BREACH_LIST_VERSION, count))
+            file.write(fanout.tobytes())
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+    os.replace(temp_path, path)
+    return count
+
+
+# Breached password list opened on first use, and the file it was opened from
+_breach_list = None
+_breach_list_file_id = None
+
+
+def get_breach_list():
+    """
+    Returns the shared BreachedPasswordList, or None if no list has been built.
+    The list is opened again if the file was rebuilt since it was opened, so
+    callers can tell the list was replaced by comparing the returned objects.
+    """
+    global _breach_list, _breach_list_file_id
+    try:
+        file_stat = os.stat(BREACH_LIST_FILE)
+        file_id = (file_stat.st_ino, file_stat.st_size, file_stat.st_mtime_ns)
+    except FileNotFoundError:
+        file_id = None
+
+    if file_id != _breach_list_file_id:
+        _breach_list = None if file_id is None else BreachedPasswordList(BREACH_LIST_FILE)
+        _breach_list_file_id = file_id
+
+    return _breach_list
+
+
+def main():
+    """
+    Builds the breached password list from the hash file given on the command line
+    """
+    parser = argparse.ArgumentParser(description="Build the breached password list used by PasswordVault")
+    parser.add_argument("source", help="text file of SHA-1 hashes sorted by hash, such as a Pwned Passwords download")
+    parser.add_argument("--output", default=BREACH_LIST_FILE, help="path of the compiled list to write")
+    args = parser.parse_args()
+
+    count = build_breach_list(args.source, args.output)
+    print("Wrote " + str(count) + " hashes to " + args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+# Author: Ian Docherty
+# Description: This module defines the ConnectionPool class, which keeps a bounded
+#              set of open database connections so that they can be reused instead
+#              of paying for a new TCP connection and authentication handshake on
+#              every database operation.
+
+import threading
+import time
+from contextlib import contextmanager
+
+
+# Default pool settings
+MAX_POOL_SIZE = 5  # Maximum number of open connections at any one time
+IDLE_TIMEOUT = 300  # Seconds an unused connection may sit in the pool before it is closed
+HEALTH_CHECK_AFTER = 30  # Seconds of idleness after which a connection is pinged before reuse
+
+
+class PoolClosedError(Exception):
+    """
+    Raised when a connection is requested from a pool that has been closed
+    """
+    pass
+
+
+class ConnectionPool:
+    """
+    A thread-safe, bounded pool of database connections. Connections are
+    created on demand by the given factory, returned to the pool after use,
+    health checked before being handed out again, and closed once they have
+    been idle for too long.
+    """
+
+    def __init__(self, connection_factory, max_size=MAX_POOL_SIZE, idle_timeout=IDLE_TIMEOUT,
+                 health_check_after=HEALTH_CHECK_AFTER, health_check=None):
+        """
+        Creates an empty ConnectionPool
+        :param connection_factory: callable that opens and returns a new connection
+        :param max_size: maximum number of connections open at the same time
+        :param idle_timeout: seconds before an idle connection is closed
+        :param health_check_after: seconds of idleness before a connection is pinged
+        :param health_check: callable returning True if a connection is still usable,
+                             by default the connection's is_connected method
+        """
+        self.connection_factory = connection_factory
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.health_check_after = health_check_after
+        self.health_check = health_check or _is_connected
+
+        self._idle = []  # List of (connection, time returned to pool), most recent last
+        self._open_count = 0  # Number of idle plus checked out connections
+        self._closed = False
+        self._condition = threading.Condition()
+
+    def get_connection(self, timeout=None):
+        """
+        Returns a healthy connection from the pool, opening a new one if no idle
+        connection is available and the pool is not full. Blocks while the pool
+        is full until a connection is released.
+        :param timeout: seconds to wait for a free connection, or None to wait forever
+        :return: An open database connection
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        while True:
+            with self._condition:
+                if self._closed:
+                    raise PoolClosedError("Connection pool has been closed")
+
+                stale = self._evict_idle_connections()
+
+                if self._idle:
+                    cnx, returned_at = self._idle.pop()
+                elif self._open_count < self.max_size:
+                    cnx, returned_at = None, None
+                    self._open_count += 1  # Reserve a slot before connecting outside the lock
+                else:
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        raise TimeoutError("Timed out waiting for a database connection")
+                    self._condition.wait(remaining)
+                    continue
+
+            self._close_all(stale)
+
+            # Open a new connection, giving the reserved slot back on failure
+            if cnx is None:
+                try:
+                    return self.connection_factory()
+                except Exception:
+                    self._discard()
+                    raise
+
+            # Only ping connections that have been idle long enough to have gone stale
+            if time.monotonic() - returned_at < self.health_check_after or self._is_healthy(cnx):
+                return cnx
+
+            self._close_all([cnx])
+            self._discard()
+
+    def release_connection(self, cnx):
+        """
+        Returns a connection to the pool. Any open transaction is rolled back so
+        that the next user of the connection starts with a fresh snapshot.
+        :param cnx: connection previously returned by get_connection
+        """
+        try:
+            cnx.rollback()
+        except Exception:
+            self._close_all([cnx])
+            self._discard()
+            return
+
+        with self._condition:
+            if self._closed:
+                self._open_count -= 1
+            else:
+                self._idle.append((cnx, time.monotonic()))
+                self._condition.notify()
+                return
+
+        self._close_all([cnx])
+
+    @contextmanager
+    def connection(self):
+        """
+        Context manager that checks a connection out of the pool and returns it
+        when the block exits
+        """
+        cnx = self.get_connection()
+        try:
+            yield cnx
+        finally:
+            self.release_connection(cnx)
+
+    def close(self):
+        """
+        Closes every idle connection and prevents new connections from being
+        handed out. Checked out connections are closed when they are released.
+        """
+        with self._condition:
+            self._closed = True
+            idle = [cnx for (cnx, returned_at) in self._idle]
+            self._idle = []
+            self._open_count -= len(idle)
+            self._condition.notify_all()
+
+        self._close_all(idle)
+
+    def _evict_idle_connections(self):
+        """
+        Removes connections that have been idle longer than the idle timeout.
+        Must be called while holding the pool lock.
+        :return: List of evicted connections that still need to be closed
+        """
+        cutoff = time.monotonic() - self.idle_timeout
+        stale = [cnx for (cnx, returned_at) in self._idle if returned_at < cutoff]
+        if stale:
+            self._idle = [(cnx, returned_at) for (cnx, returned_at) in self._idle if returned_at >= cutoff]
+            self._open_count -= len(stale)
+            self._condition.notify(len(stale))
+
+        return stale
+
+    def _discard(self):
+        """
+        Frees the pool slot held by a connection that was closed or never opened
+        """
+        with self._condition:
+            self._open_count -= 1
+            self._condition.notify()
+
+    def _is_healthy(self, cnx):
+        """
+        Returns True if the given connection is still usable
+        """
+        try:
+            return self.health_check(cnx)
+        except Exception:
+            return False
+
+    @staticmethod
+    def _close_all(connections):
+        """
+        Closes the given connections, ignoring errors from already-dead connections
+        """
+        for cnx in connections:
+            try:
+                cnx.close()
+            except Exception:
+                pass
+
+
+def _is_connected(cnx):
+    """
+    Returns True if the given MySQL connection is still connected
+    """
+    return cnx.is_connected()
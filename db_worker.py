@@ -0,0 +1,135 @@
+# Author: Ian Docherty
+# Description: This module defines the classes used to run database operations on
+#              a background thread so that the graphical user interface stays
+#              responsive while waiting on the database server.
+
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+
+class WorkerSignals(QObject):
+    """
+    Defines the signals a DatabaseWorker uses to report back to the GUI thread.
+    QRunnable is not a QObject, so its signals live on this separate object.
+    """
+
+    result = pyqtSignal(object)  # Return value of the function
+    error = pyqtSignal(object)  # Exception raised by the function
+    progress = pyqtSignal(object)  # Values passed to the progress callback
+    finished = pyqtSignal()  # Emitted last, whether or not the function succeeded
+
+
+class DatabaseWorker(QRunnable):
+    """
+    Runs a single function on a QThreadPool thread and emits its return
+    value or exception through a WorkerSignals object
+    """
+
+    def __init__(self, function, *args, report_progress=False, **kwargs):
+        """
+        Creates a DatabaseWorker that will call the given function with the
+        given arguments
+        :param function: function to run on the background thread
+        :param report_progress: if True, a progress_callback keyword argument is passed
+                                to the function which emits the progress signal
+        """
+        super().__init__()
+        self.function = function
+        self.args = args
+        self.kwargs = kwargs
+        self.signals = WorkerSignals()
+
+        if report_progress:
+            self.kwargs["progress_callback"] = self.signals.progress.emit
+
+    def run(self):
+        """
+        Calls the function and emits its result or the exception it raised
+        """
+        try:
+            result = self.function(*self.args, **self.kwargs)
+        except Exception as err:
+            self.signals.error.emit(err)
+        else:
+            self.signals.result.emit(result)
+        finally:
+            self.signals.finished.emit()
+
+
+class DatabaseTaskRunner(QObject):
+    """
+    Queues database operations onto a dedicated thread pool and tracks how
+    many are still in flight. Operations run one at a time in the order they
+    were submitted, so later operations always see the effects of earlier ones.
+    """
+
+    busy_changed = pyqtSignal(bool)  # True when the first task starts, False when the last one ends
+
+    def __init__(self, error_handler=None, parent=None):
+        """
+        Creates a DatabaseTaskRunner with its own single-threaded thread pool
+        :param error_handler: called with the exception of any task that has no on_error slot
+        """
+        super().__init__(parent)
+        self.error_handler = error_handler
+        self.thread_pool = QThreadPool(self)
+        self.thread_pool.setMaxThreadCount(1)
+        self.active_workers = set()  # Keeps workers alive until their signals are delivered
+
+    def run(self, function, *args, on_result=None, on_error=None, on_progress=None, **kwargs):
+        """
+        Runs the given function with the given arguments on the background thread.
+        The on_result, on_error, and on_progress slots are called on the GUI thread.
+        :param function: function to run
+        :param on_result: slot called with the return value of the function
+        :param on_error: slot called with the exception raised by the function
+        :param on_progress: slot called with each value passed to the function's progress_callback
+        """
+        worker = DatabaseWorker(function, *args, report_progress=on_progress is not None, **kwargs)
+
+        if on_result is not None:
+            worker.signals.result.connect(on_result)
+        if on_error is not None:
+            worker.signals.error.connect(on_error)
+        elif self.error_handler is not None:
+            worker.signals.error.connect(self.error_handler)
+        if on_progress is not None:
+            worker.signals.progress.connect(on_progress)
+        worker.signals.finished.connect(lambda: self.worker_finished(worker))
+
+        self.active_workers.add(worker)
+        if len(self.active_workers) == 1:
+            self.busy_changed.emit(True)
+
+        self.thread_pool.start(worker)
+
+    def worker_finished(self, worker):
+        """
+        Forgets a finished worker and reports when no more work is in flight
+        """
+        self.active_workers.discard(worker)
+        if not self.active_workers:
+            self.busy_changed.emit(False)
+
+    def cancel_queued(self):
+        """
+        Drops the operations that have not started yet. Dropped operations
+        never report a result. An operation that is already running finishes.
+        """
+        for worker in list(self.active_workers):
+            if self.thread_pool.tryTake(worker):
+                self.active_workers.discard(worker)
+
+        if not self.active_workers:
+            self.busy_changed.emit(False)
+
+    def is_busy(self):
+        """
+        Returns True if any database operation is queued or running
+        """
+        return len(self.active_workers) > 0
+
+    def wait_for_done(self):
+        """
+        Blocks until every queued database operation has finished
+        """
+        self.thread_pool.waitForDone()
@@ -0,0 +1,123 @@
+# Author: Ian Docherty
+# Description: This module re-encrypts the stored passwords with the vault's newest data
+#              key after the master password changes. Batches of rows are re-encrypted
+#              in parallel by a pool of worker processes and saved one transaction per
+#              batch, and a marker table records the progress so an interrupted rotation
+#              resumes where it stopped.
+
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from vault_crypto import VaultCipher, get_key_id
+
+
+# Number of rows read, re-encrypted by one worker, and saved per transaction
+ROTATION_BATCH_SIZE = 2000
+
+# Batches handed to the workers ahead of the one being saved, per worker
+BATCHES_AHEAD_PER_WORKER = 2
+
+
+class KeyRotationError(Exception):
+    """
+    Raised when re-encrypted passwords can't be saved
+    """
+    pass
+
+
+def rotate_vault_key(vault_cnx, batch_size=ROTATION_BATCH_SIZE, max_workers=None, progress_callback=None,
+                     should_stop=None):
+    """
+    Finishes the key rotation started by the last master password change, if
+    any. Rows are read in id order, re-encrypted by the worker processes
+    while earlier batches are saved, and saved in order, so the marker's last
+    row id is always a safe place to resume from.
+    :param vault_cnx: connected StorageBackend object
+    :param batch_size: number of rows per batch
+    :param max_workers: number of worker processes, or None for one per CPU
+    :param progress_callback: if given, called with the number of rows re-encrypted after each batch
+    :param should_stop: if given, called before each batch is saved. The rotation stops if it
+                        returns True, and resumes after the last saved batch the next time.
+    :return: The number of rows re-encrypted, 0 if no rotation was in progress, or None if the
+             rotation was stopped or replaced by a newer master password change
+    """
+    rotation = vault_cnx.get_key_rotation()
+    if rotation is None:
+        return 0
+
+    target_key_id, last_row_id = rotation
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+
+    # Workers are spawned rather than forked, since forking a process that runs Qt threads is unsafe
+    rotated_count = 0
+    with ProcessPoolExecutor(max_workers, mp_context=multiprocessing.get_context("spawn"),
+                             initializer=_init_worker,
+                             initargs=(vault_cnx.vault_cipher.data_keys, target_key_id)) as executor:
+        pending_batches = deque()  # (last row id, future) of each batch being re-encrypted, in id order
+        after_id = last_row_id
+        while True:
+
+            # Keep every worker busy while the oldest batch is saved
+            while after_id is not None and len(pending_batches) < max_workers * BATCHES_AHEAD_PER_WORKER:
+                rows = vault_cnx.fetch_encrypted_rows(after_id, batch_size)
+                if not rows:
+                    after_id = None
+                    break
+
+                after_id = rows[-1][0]
+                pending_batches.append((after_id, executor.submit(_reencrypt_rows, rows)))
+
+            if not pending_batches:
+                break
+
+            # A stopped or replaced rotation drops the batches not started yet, the marker records where to resume
+            batch_last_row_id, future = pending_batches.popleft()
+            if should_stop is not None and should_stop():
+                saved_count = None
+            else:
+                saved_count = vault_cnx.save_rotated_rows(future.result(), batch_last_row_id, target_key_id)
+            if saved_count is None:
+                for (_, pending_future) in pending_batches:
+                    pending_future.cancel()
+                return None
+            if saved_count is False:
+                raise KeyRotationError("Database error after re-encrypting " + str(rotated_count) + " passwords")
+
+            rotated_count += saved_count
+            if progress_callback is not None:
+                progress_callback(rotated_count)
+
+    if not vault_cnx.finish_key_rotation(target_key_id):
+        raise KeyRotationError("Database error while removing the old keys")
+
+    return rotated_count
+
+
+# Cipher of each worker process, created once by _init_worker
+_worker_cipher = None
+
+
+def _init_worker(data_keys, target_key_id):
+    """
+    Creates the cipher used by a worker process
+    :param data_keys: dict of key id to data key of every key in the vault
+    :param target_key_id: id of the key passwords are re-encrypted with
+    """
+    global _worker_cipher
+    _worker_cipher = VaultCipher()
+    for (key_id, data_key) in data_keys.items():
+        _worker_cipher.add_key(key_id, data_key, current=key_id == target_key_id)
+
+
+def _reencrypt_rows(rows):
+    """
+    Re-encrypts the passwords of a batch with the target key in a worker
+    process. Rows already encrypted with the target key are left out.
+    :param rows: list of (row id, account name, encrypted password) tuples
+    :return: A list of (new encrypted password, row id, old encrypted password) tuples
+    """
+    return [(_worker_cipher.encrypt(_worker_cipher.decrypt(password, account), account), row_id, password)
+            for (row_id, account, password) in rows
+            if get_key_id(password) != _worker_cipher.current_key_id]
@@ -0,0 +1,122 @@
+# Author: Ian Docherty
+# Description: This module defines the PasswordAuditor class, which scores the
+#              strength of every stored password and summarizes the results in
+#              an audit report.
+
+import heapq
+from breached_passwords import get_breach_list
+from collections import namedtuple
+from password_entropy import PATTERN_MODE, get_entropy_batch, get_password_strength
+
+
+# Strength categories returned by get_password_strength, weakest first
+STRENGTH_CATEGORIES = ["Very Weak", "Weak", "Moderately Strong", "Strong", "Very Strong"]
+
+# Number of weakest passwords listed in an audit report
+WEAKEST_COUNT = 10
+
+# Number of passwords scored between progress reports
+PROGRESS_INTERVAL = 500
+
+
+# Audit result of a single stored password
+AuditEntry = namedtuple("AuditEntry", ["row_id", "account", "bit_entropy", "strength", "breached"])
+
+
+class AuditReport:
+    """
+    The results of auditing every stored password
+    """
+
+    def __init__(self, entries, weakest_count=WEAKEST_COUNT):
+        """
+        Creates an AuditReport from the given audit entries
+        :param entries: list of AuditEntry objects
+        :param weakest_count: number of weakest entries to list
+        """
+        self.total = len(entries)
+        self.buckets = {strength: [] for strength in STRENGTH_CATEGORIES}
+        for entry in entries:
+            self.buckets[entry.strength].append(entry)
+
+        self.weakest = heapq.nsmallest(weakest_count, entries, key=lambda entry: entry.bit_entropy)
+        self.breached = [entry for entry in entries if entry.breached]
+
+    def count(self, strength):
+        """
+        Returns the number of passwords in the given strength category
+        """
+        return len(self.buckets[strength])
+
+
+class PasswordAuditor:
+    """
+    Scores stored passwords the same way as the password strength meter, and
+    caches each score by row id along with the version of the row's encrypted
+    password. Later audits only decrypt and score the rows whose version
+    changed, and every score is recomputed if the breached password list is
+    replaced.
+    """
+
+    def __init__(self):
+        """
+        Creates a PasswordAuditor with an empty score cache
+        """
+        self.scores = {}  # Maps row id to a tuple of (password version, bit entropy, found in a breach)
+        self.breach_list = None  # Breached password list the cached scores were checked against
+
+    def get_changed_ids(self, versions):
+        """
+        Returns the row ids of the given rows that have no cached score for
+        their current password version
+        :param versions: list of PasswordVersion objects of every stored password
+        """
+
+        # Breached flags checked against a replaced list are out of date
+        breach_list = get_breach_list()
+        if breach_list is not self.breach_list:
+            self.scores = {}
+            self.breach_list = breach_list
+
+        return [row.row_id for row in versions if self.scores.get(row.row_id, (None, ))[0] != row.version]
+
+    def audit(self, versions, records, progress_callback=None, should_stop=None):
+        """
+        Scores the given passwords and returns an audit report of every row
+        :param versions: list of PasswordVersion objects of every stored password
+        :param records: list of PasswordRecord objects of the rows returned by get_changed_ids
+        :param progress_callback: if given, called with the number of passwords scored so far
+        :param should_stop: if given, called before each batch of passwords is scored. The
+                            audit stops if it returns True, keeping the scores computed so far.
+        :return: An AuditReport of the given rows, or None if the audit was stopped
+        """
+        versions_by_id = {row.row_id: row.version for row in versions}
+        for start in range(0, len(records), PROGRESS_INTERVAL):
+            if should_stop is not None and should_stop():
+                return None
+
+            # Score the passwords a batch at a time so their character sets are found together
+            batch = records[start:start + PROGRESS_INTERVAL]
+            bit_entropies = get_entropy_batch([record.password for record in batch], PATTERN_MODE)
+            for (record, bit_entropy) in zip(batch, bit_entropies):
+                breached = self.breach_list is not None and self.breach_list.contains(record.password)
+                self.scores[record.row_id] = (versions_by_id[record.row_id], bit_entropy, breached)
+
+            if progress_callback is not None:
+                progress_callback(start + len(batch))
+
+        # Rebuild the cache so deleted rows are forgotten
+        self.scores = {row.row_id: self.scores[row.row_id] for row in versions if row.row_id in self.scores}
+
+        entries = []
+        for row in versions:
+            score = self.scores.get(row.row_id)
+            if score is None:
+                continue  # Deleted after its version was read
+
+            # A breached password is rated as weak however random it looks, as on the strength meter
+            (_, bit_entropy, breached) = score
+            strength = STRENGTH_CATEGORIES[0] if breached else get_password_strength(bit_entropy)
+            entries.append(AuditEntry(row.row_id, row.account, bit_entropy, strength, breached))
+
+        return AuditReport(entries)
@@ -1,61 +1,91 @@
 # Author: Ian Docherty
 # Description: This module defines the VaultConnection class, which allows the
-#              master user to connect to the database and perform CRUD operations
-#              on the database
+#              master user to connect to the MySQL database and perform CRUD
+#              operations on the database, and get_vault_connection, which
+#              returns a connection for the chosen storage backend.
 
 import mysql.connector
 from mysql.connector import errorcode
+from sqlite_vault_connection import SQLiteVaultConnection
+from storage_backend import BULK_CHUNK_SIZE, DEFAULT_PASSWORD, StorageBackend, chunked
+from weakref import WeakKeyDictionary
 
 
-class VaultConnection:
+# Names of the available storage backends
+MYSQL_BACKEND = "mysql"
+SQLITE_BACKEND = "sqlite"
+DEFAULT_BACKEND = MYSQL_BACKEND
+
+# Most server-side prepared statements kept open per connection
+STATEMENT_CACHE_SIZE = 16
+
+
+class VaultConnection(StorageBackend):
     """
     Allows the user to connect to and perform CRUD operations on
-    the database
+    the MySQL database. The master password is the password of the
+    MySQL user account, and the vault's data keys are wrapped with a key
+    derived from the same password. Frequent queries run as server-side
+    prepared statements that are kept open on each pooled connection.
     """
 
+    DatabaseError = mysql.connector.Error
+
     def __init__(self):
         """
-        Creates a VaultConnection object with a master username,
-        a given password, and an initially-NULL connection
+        Creates a VaultConnection object with an empty statement cache
         """
-        self.master_username = "masterUser"
-        self.master_password = None
-        self.db_connection = None
+        super().__init__()
+
+        # Maps each connection to a dict of query text to (query, prepared cursor).
+        # Entries go away with their connection once the pool closes it.
+        self.statement_cache = WeakKeyDictionary()
 
-    def connect_to_db(self, password):
+    def _open_connection(self, password):
         """
-        Connects to the database and sets the class member to
-        point to that connection. Returns True if successful, and
-        False otherwise
-        :return: True on success, False otherwise
+        Opens a new connection to the database as the master user
+        :param password: password to connect to database
+        :return: An open database connection
         """
+        return mysql.connector.connect(user=self.master_username,
+                                       password=password,
+                                       database='passwordvault')
 
-        # Connect to database with given password
-        try:
-            cnx = mysql.connector.connect(user=self.master_username,
-                                          password=password,
-                                          database='passwordvault')
-        except mysql.connector.Error:
-            return False  # Incorrect password
-        else:
-
-            # Set data member to successful connection
-            self.db_connection = cnx
-            return True
-
-    def close_connection(self):
+    def _execute(self, cnx, query, params=()):
         """
-        Closes the database connection
+        Runs the given query as a prepared statement kept for the given
+        connection. The server parses each query once per connection, and
+        later runs only send the parameter values.
+        :param query: query text with %s placeholders
+        :param params: values of the placeholders
+        :return: A prepared cursor that has executed the query
         """
-        self.db_connection.close()
+        statements = self.statement_cache.get(cnx)
+        if statements is None:
+            statements = self.statement_cache[cnx] = {}
+
+        cached_statement = statements.get(query)
+        if cached_statement is None:
 
-    def test_default_password(self):
+            # Close the oldest prepared statement once the cache is full
+            if len(statements) >= STATEMENT_CACHE_SIZE:
+                oldest_query = next(iter(statements))
+                statements.pop(oldest_query)[1].close()
+
+            cached_statement = statements[query] = (query, cnx.cursor(prepared=True))
+
+        # The cursor only reuses its statement when given the same query object
+        prepared_query, cursor = cached_statement
+        cursor.execute(prepared_query, params)
+        return cursor
+
+    def _close_cursor(self, cursor):
         """
-        Returns True if the database user account still has the
-        default password set. Returns False if not.
-        :return: True if database user has default password
+        Reads any rows left in a prepared cursor so the connection can run its
+        next query. The cursor stays open so its statement can be reused.
         """
-        return self.test_db_connection("default")
+        if cursor.with_rows:
+            cursor.fetchall()
 
     def test_db_connection(self, password):
         """
@@ -66,9 +96,7 @@ class VaultConnection:
         :return: True on success, False otherwise
         """
         try:
-            cnx = mysql.connector.connect(user=self.master_username,
-                                          password=password,
-                                          database='passwordvault')
+            cnx = self._open_connection(password)
         except mysql.connector.Error as err:
             if err.errno == errorcode.ER_ACCESS_DENIED_ERROR:
                 return False  # Given password doesn't work
@@ -77,6 +105,7 @@ class VaultConnection:
             else:
                 print(err)
         else:
+            cnx.close()
             return True  # Given password works
 
     def create_user(self, username, password):
@@ -89,19 +118,21 @@ class VaultConnection:
 
         cnx = self._try_connect_with_default()
         if cnx:
+            try:
 
-            # Insert name of user into master account table
-            cursor = cnx.cursor()
-            set_user_query = f"INSERT INTO PasswordVault.MasterAccount (masterUser) VALUE ('{username}');"
-            cursor.execute(set_user_query)
+                # Insert name of user into master account table
+                cursor = cnx.cursor()
+                set_user_query = f"INSERT INTO PasswordVault.MasterAccount (masterUser) VALUE ('{username}');"
+                cursor.execute(set_user_query)
 
-            # Reset user password to the given password
-            set_pwd_query = f"SET PASSWORD = '{password}';"
-            cursor.execute(set_pwd_query)
+                # Reset user password to the given password
+                set_pwd_query = f"SET PASSWORD = '{password}';"
+                cursor.execute(set_pwd_query)
+                cursor.close()
+            finally:
+                cnx.close()
 
-            # Close connection
-            cursor.close()
-            cnx.close()
+            self.default_password_changed = True
             return True
 
     def _try_connect_with_default(self):
@@ -110,9 +141,7 @@ class VaultConnection:
         :return: Connection if successful, None otherwise
         """
         try:
-            cnx = mysql.connector.connect(user=self.master_username,
-                                          password='default',
-                                          database='passwordvault')
+            cnx = self._open_connection(DEFAULT_PASSWORD)
             return cnx
 
         except mysql.connector.Error as err:
@@ -125,146 +154,92 @@ class VaultConnection:
 
             return None
 
-    def edit_master_username(self, new_username):
-        """
-        Inserts a new username into master account table
-        :return: True if successful, False otherwise
-        """
-        try:
-            cursor = self.db_connection.cursor()
-            edit_username_query = "UPDATE PasswordVault.MasterAccount " \
-                                  "SET masterUser = %s WHERE id >= 1;"
-
-            cursor.execute(edit_username_query, (new_username, ))
-
-            # Commit changes
-            self.db_connection.commit()
-            cursor.close()
-
-        except mysql.connector.Error as err:
-            print(err)
-            return False
-        else:
-            return True
-
-    def edit_master_password(self, new_password):
+    def edit_master_password(self, new_password, new_username=None):
         """
-        Updates master account with new password
+        Updates master account with new password, rewraps the vault's data
+        keys with it, and adds the new data key of a key rotation. SET PASSWORD
+        can't be rolled back, so the keys and username are changed in one
+        transaction after it, and the old password is set again if that fails.
+        Passwords are passed as query parameters, which the driver quotes, so
+        any character can be used in them.
+        :param new_username: if given, the master username is changed in the same transaction
         :return: True if successful, False otherwise
         """
         try:
-            cursor = self.db_connection.cursor()
-            edit_password_query = f"SET PASSWORD = '{new_password}';"
-            cursor.execute(edit_password_query)
-
-            cursor.close()
+            with self.db_pool.connection() as cnx:
+                cursor = cnx.cursor()
+                edit_password_query = "SET PASSWORD = %s;"
+                cursor.execute(edit_password_query, (new_password, ))
+
+                try:
+                    if new_username is not None:
+                        cursor.execute("UPDATE PasswordVault.MasterAccount SET masterUser = %s WHERE id >= 1;",
+                                       (new_username, ))
+                    new_key = self._rotate_vault_keys(cursor, new_password)
+
+                    # Commit changes
+                    cnx.commit()
+                except mysql.connector.Error:
+                    cnx.rollback()
+                    cursor.execute(edit_password_query, (self.master_password, ))
+                    raise
+                finally:
+                    cursor.close()
         except mysql.connector.Error as err:
             print(err)
             return False
         else:
-            return True
-
-    def get_master_username(self):
-        """
-        Returns the name of the master account username
-        :return: Master account username or None if not exists
-        """
-        cursor = self.db_connection.cursor()
-        username_query = "SELECT masterUser FROM PasswordVault.MasterAccount;"
-        cursor.execute(username_query)
-
-        master_username = cursor.fetchone()
-        if master_username is None:
-            return None
-        else:
-            return master_username[0]
-
-    def fetch_all_passwords(self):
-        """
-        Executes a query to get all passwords from the database and
-        returns the result set. The dictionaries contain the following
-        keys: 'row_id', 'account', 'password'.
-        :return: An array of dictionaries of the results
-        """
-        cursor = self.db_connection.cursor()
-        fetch_all_query = "SELECT * FROM PasswordVault.Passwords ORDER BY accountName;"
-        cursor.execute(fetch_all_query)
 
-        # Store all results in an array of dictionaries
-        result_set = []
-        for (row_id, account, password) in cursor:
-            row_dict = {"row_id": row_id, "account": account, "password": password}
-            result_set.append(row_dict)
-
-        cursor.close()
-        return result_set
-
-    def add_new_password(self, account, password):
-        """
-        Adds a new password with the given account name and password
-        to the database
-        :param account: account name to add
-        :param password: password to add
-        :return: True if add successful, False otherwise
-        """
-        try:
-            cursor = self.db_connection.cursor()
-            insert_query = "INSERT INTO PasswordVault.Passwords (accountName, accountPassword) " \
-                           "VALUES (%s, %s);"
-            cursor.execute(insert_query, (account, password))
-
-            # Commit changes
-            self.db_connection.commit()
-            cursor.close()
-
-        except mysql.connector.Error as err:
-            print(err)
-            return False
-        else:
+            # New pooled connections must authenticate with the new password
+            self.master_password = new_password
+            self.vault_cipher.add_key(*new_key, current=True)
             return True
 
-    def delete_password(self, password_id):
+    def edit_passwords_bulk(self, entries, chunk_size=BULK_CHUNK_SIZE):
         """
-        Deletes the password in the database with the given id
-        :param password_id: The row id of the password
-        :return: True if deletion successful, False otherwise
+        Updates many passwords in a single transaction. Each chunk of entries
+        is applied with one UPDATE statement joined against the new values.
+        :param entries: iterable of (password_id, account, password) tuples
+        :param chunk_size: number of rows per UPDATE statement
+        :return: Number of entries processed if successful, False otherwise
         """
         try:
-            cursor = self.db_connection.cursor()
-            delete_query = "DELETE FROM PasswordVault.Passwords WHERE id = %s;"
-            cursor.execute(delete_query, (password_id, ))
-
-            # Commit changes
-            self.db_connection.commit()
-            cursor.close()
+            with self.db_pool.connection() as cnx:
+                cursor = cnx.cursor()
+
+                edited_count = 0
+                for chunk in chunked(entries, chunk_size):
+                    new_values_query = " UNION ALL ".join(
+                        ["SELECT %s AS id, %s AS accountName, %s AS accountPassword"] * len(chunk))
+                    edit_query = "UPDATE PasswordVault.Passwords AS p JOIN (" + new_values_query + ") AS v " \
+                                 "ON p.id = v.id SET p.accountName = v.accountName, " \
+                                 "p.accountPassword = v.accountPassword;"
+
+                    cursor.execute(edit_query, [value for (password_id, account, password) in chunk
+                                                for value in (password_id, account,
+                                                              self.vault_cipher.encrypt(password, account))])
+                    edited_count += len(chunk)
+
+                # Commit changes
+                cnx.commit()
+                cursor.close()
 
         except mysql.connector.Error as err:
             print(err)
             return False
         else:
-            return True
-
-    def edit_password(self, password_id, account, password):
-        """
-        Updates the password with the given password ID with the given
-        account name and password
-        :param password_id: ID of password to change
-        :param account: new account name
-        :param password: new password
-        :return: True if edit successful, False otherwise
-        """
-        try:
-            cursor = self.db_connection.cursor()
-            delete_query = "UPDATE PasswordVault.Passwords SET accountName = %s, " \
-                           "accountPassword = %s WHERE id = %s;"
-            cursor.execute(delete_query, (account, password, password_id))
+            return edited_count
 
-            # Commit changes
-            self.db_connection.commit()
-            cursor.close()
 
-        except mysql.connector.Error as err:
-            print(err)
-            return False
-        else:
-            return True
+def get_vault_connection(backend=DEFAULT_BACKEND):
+    """
+    Returns a vault connection for the given storage backend name
+    :param backend: MYSQL_BACKEND or SQLITE_BACKEND
+    :return: A StorageBackend object that is not yet connected
+    """
+    if backend == SQLITE_BACKEND:
+        return SQLiteVaultConnection()
+    elif backend == MYSQL_BACKEND:
+        return VaultConnection()
+    else:
+        raise ValueError("Unknown storage backend: " + str(backend))
@@ -4,45 +4,167 @@
 #              README for more info on information entropy.
 
 import math
+from breached_passwords import get_breach_list
+from password_patterns import get_log2_guesses
+
+try:
+    import numpy
+except ImportError:
+    numpy = None  # get_entropy_batch falls back to scoring one password at a time
 
 
 # Possible characters options for PasswordVault generated passwords
+LOWERS = "abcdefghijklmnopqrstuvwxyz"
 UPPERS = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
 NUMBERS = "1234567890"
 SPECIALS = '@%+!$?~'
 
+# Ways get_entropy can estimate a password's entropy. CHARSET_MODE assumes every
+# character is random, PATTERN_MODE also looks for words and other patterns.
+CHARSET_MODE = "charset"
+PATTERN_MODE = "pattern"
+
+# Bit flags for the optional character sets found in a password
+UPPERS_FLAG = 1
+NUMBERS_FLAG = 2
+SPECIALS_FLAG = 4
+
+
+def _build_log2_table():
+    """
+    Returns a list mapping each combination of character set flags to the
+    base 2 logarithm of the number of possible symbols per character
+    """
+    log2_table = []
+    for flags in range(8):
+        number_of_symbols = len(LOWERS)
+        if flags & UPPERS_FLAG:
+            number_of_symbols += len(UPPERS)
+        if flags & NUMBERS_FLAG:
+            number_of_symbols += len(NUMBERS)
+        if flags & SPECIALS_FLAG:
+            number_of_symbols += len(SPECIALS)
+        log2_table.append(math.log2(number_of_symbols))
+
+    return log2_table
+
+
+# Bits of entropy per character for each combination of character set flags
+LOG2_SYMBOLS = _build_log2_table()
+
+# Sets used to check which character sets appear in a password
+UPPERS_SET = frozenset(UPPERS)
+NUMBERS_SET = frozenset(NUMBERS)
+SPECIALS_SET = frozenset(SPECIALS)
+APPROVED_SET = frozenset(LOWERS + UPPERS + NUMBERS + SPECIALS)
+
+
+def _build_character_flags_table():
+    """
+    Returns a NumPy array mapping each ASCII code, plus one extra entry for
+    all non-ASCII characters, to the character set flag of that character
+    """
+    flags_table = numpy.zeros(129, dtype=numpy.uint8)
+    for characters, flag in ((UPPERS, UPPERS_FLAG), (NUMBERS, NUMBERS_FLAG), (SPECIALS, SPECIALS_FLAG)):
+        for char in characters:
+            flags_table[ord(char)] = flag
+
+    return flags_table
+
+
+# Lookup tables used by get_entropy_batch
+if numpy is not None:
+    CHARACTER_FLAGS_TABLE = _build_character_flags_table()
+    LOG2_TABLE_ARRAY = numpy.array(LOG2_SYMBOLS)
 
-def get_entropy(password):
+
+def contains_unapproved_specials(password):
+    """
+    Returns True if the given password contains special characters not in
+    the approved special characters constant SPECIALS
+    """
+    return not APPROVED_SET.issuperset(password)
+
+
+def get_entropy(password, mode=CHARSET_MODE):
     """
     Calculates the information entropy in bits using the given information. An
     assumption is made that, if the password contains any one of the characters
     in the UPPERS, NUMBERS, and SPECIALS global variables, then any character in
     the given password has an equal probability of being any of the approved
     symbols. Approved symbols are lowercase letters and any symbol in the above
-    global variables.
+    global variables. In PATTERN_MODE, passwords built from dictionary words,
+    keyboard walks, repeats, sequences, or dates are scored by the number of
+    guesses needed to find those patterns instead, if that is lower.
+    :param mode: CHARSET_MODE or PATTERN_MODE
     :return: The bit value representing the password entropy
     """
 
-    # Determine number of possible unique symbols present in the given password
-    number_of_symbols = 26  # Base password only has 26 lowercase chars allowed
-
     # Check if any uppercase, numbers, or special chars exist in given password
-    uppercase_found, number_found, special_found = False, False, False
-    for char in password:
+    character_set_flags = 0
+    if not UPPERS_SET.isdisjoint(password):
+        character_set_flags |= UPPERS_FLAG
+    if not NUMBERS_SET.isdisjoint(password):
+        character_set_flags |= NUMBERS_FLAG
+    if not SPECIALS_SET.isdisjoint(password):
+        character_set_flags |= SPECIALS_FLAG
 
-        if char in UPPERS and not uppercase_found:
-            number_of_symbols += len(UPPERS)
-            uppercase_found = True
+    # log2(N^L) is computed as L * log2(N) to avoid building a huge integer
+    bit_entropy = len(password) * LOG2_SYMBOLS[character_set_flags]
 
-        if char in NUMBERS and not number_found:
-            number_of_symbols += len(NUMBERS)
-            number_found = True
+    if mode == PATTERN_MODE:
+        return min(bit_entropy, get_log2_guesses(password, LOG2_SYMBOLS[character_set_flags]))
+    elif mode == CHARSET_MODE:
+        return bit_entropy
+    else:
+        raise ValueError("Unknown entropy mode: " + str(mode))
 
-        if char in SPECIALS and not special_found:
-            number_of_symbols += len(SPECIALS)
 
-    bit_entropy = math.log((number_of_symbols ** len(password)), 2)
-    return bit_entropy
+def get_entropy_batch(passwords, mode=CHARSET_MODE):
+    """
+    Calculates the information entropy in bits of every given password, using
+    the same calculation as get_entropy. When NumPy is installed, the character
+    sets of all passwords are found at once by encoding them into one UTF-32
+    buffer and looking up the character set of every character in a table.
+    Patterns are still searched for one password at a time in PATTERN_MODE.
+    :param passwords: list of passwords
+    :param mode: CHARSET_MODE or PATTERN_MODE
+    :return: A list of bit values, one per password
+    """
+    if mode not in (CHARSET_MODE, PATTERN_MODE):
+        raise ValueError("Unknown entropy mode: " + str(mode))
+    if numpy is None or not passwords:
+        return [get_entropy(password, mode) for password in passwords]
+
+    # Look up the character set flags of every character of every password
+    lengths = numpy.fromiter(map(len, passwords), dtype=numpy.int64, count=len(passwords))
+    codes = numpy.frombuffer("".join(passwords).encode("utf-32-le"), dtype=numpy.uint32)
+    character_flags = CHARACTER_FLAGS_TABLE[numpy.minimum(codes, len(CHARACTER_FLAGS_TABLE) - 1)]
+
+    # Combine the flags of each password's characters, skipping empty passwords
+    password_flags = numpy.zeros(len(passwords), dtype=numpy.uint8)
+    non_empty = lengths > 0
+    if codes.size:
+        starts = numpy.cumsum(lengths) - lengths
+        password_flags[non_empty] = numpy.bitwise_or.reduceat(character_flags, starts[non_empty])
+
+    log2_symbols = LOG2_TABLE_ARRAY[password_flags]
+    bit_entropies = (lengths * log2_symbols).tolist()
+    if mode == CHARSET_MODE:
+        return bit_entropies
+
+    return [min(bit_entropy, get_log2_guesses(password, log2_per_char))
+            for (password, bit_entropy, log2_per_char) in zip(passwords, bit_entropies, log2_symbols.tolist())]
+
+
+def is_password_breached(password):
+    """
+    Checks the given password against the local list of passwords found in
+    data breaches. See breached_passwords.py for how to build the list.
+    :return: True if the password was found, False if not or if no list has been built
+    """
+    breach_list = get_breach_list()
+    return breach_list is not None and breach_list.contains(password)
 
 
 def get_password_strength(bit_entropy):
@@ -54,11 +176,11 @@ def get_password_strength(bit_entropy):
     """
     if bit_entropy < 28:
         return "Very Weak"
-    elif 28 <= bit_entropy <= 35:
+    elif bit_entropy < 36:
         return "Weak"
-    elif 36 <= bit_entropy <= 59:
+    elif bit_entropy < 60:
         return "Moderately Strong"
-    elif 60 <= bit_entropy <= 127:
+    elif bit_entropy < 128:
         return "Strong"
     else:
         return "Very Strong"
@@ -0,0 +1,230 @@
+# Author: Ian Docherty
+# Description: This module generates random passwords. Passwords are generated in
+#              process using the secrets module by default. The RPyC password
+#              generator microservice can optionally be used instead.
+
+import secrets
+import threading
+from collections import deque
+from password_entropy import LOWERS, UPPERS, NUMBERS, SPECIALS
+
+
+# Names of the available password generator backends
+LOCAL_BACKEND = "local"
+RPYC_BACKEND = "rpyc"
+DEFAULT_BACKEND = LOCAL_BACKEND
+
+# Address of the RPyC password generator microservice
+RPYC_HOST = "localhost"
+RPYC_PORT = 18861
+RPYC_TIMEOUT = 5  # Seconds to wait for the microservice to answer a request
+
+# Number of passwords requested from the microservice per batch, and the queue
+# length below which a new batch is requested in the background
+PREFETCH_SIZE = 64
+REFILL_THRESHOLD = 16
+
+# Cryptographically secure random number generator used to shuffle passwords
+_system_random = secrets.SystemRandom()
+
+
+class GeneratorUnavailableError(Exception):
+    """
+    Raised when a password generator backend cannot generate a password,
+    for example because the microservice is not running
+    """
+    pass
+
+
+def generate_password(length, has_uppercase, has_number, has_special_chars):
+    """
+    Generates a random password of the given length from lowercase letters and
+    the chosen optional character sets. The password contains at least one
+    character from every chosen set.
+    :param length: number of characters in the password
+    :param has_uppercase: True to include uppercase letters
+    :param has_number: True to include numbers
+    :param has_special_chars: True to include the approved special characters
+    :return: The generated password
+    """
+    character_sets = [LOWERS]
+    if has_uppercase:
+        character_sets.append(UPPERS)
+    if has_number:
+        character_sets.append(NUMBERS)
+    if has_special_chars:
+        character_sets.append(SPECIALS)
+
+    # Pick one character from each chosen set, then fill the rest from all chosen sets
+    all_characters = "".join(character_sets)
+    password_chars = [secrets.choice(characters) for characters in character_sets]
+    password_chars += _system_random.choices(all_characters, k=length - len(password_chars))
+
+    # Shuffle so the guaranteed characters are not always at the start
+    _system_random.shuffle(password_chars)
+    return "".join(password_chars)
+
+
+class LocalPasswordGenerator:
+    """
+    Generates passwords in this process. Works offline and never fails.
+    """
+
+    def get_password(self, length, has_uppercase, has_number, has_special_chars):
+        """
+        Returns a random password with the given options
+        """
+        return generate_password(length, has_uppercase, has_number, has_special_chars)
+
+    def close(self):
+        """
+        Does nothing, as the local generator holds no resources
+        """
+        pass
+
+
+class RpycPasswordGenerator:
+    """
+    Generates passwords by calling the RPyC password generator microservice.
+    A single connection is kept open and reopened if it drops. Passwords are
+    requested in batches and queued per combination of options, and the queue
+    is topped up on a background thread, so most calls return a queued
+    password without waiting on the network.
+    """
+
+    def __init__(self, host=RPYC_HOST, port=RPYC_PORT, prefetch_size=PREFETCH_SIZE):
+        """
+        Creates a RpycPasswordGenerator for the microservice at the given address
+        :param prefetch_size: number of passwords requested per batch
+        """
+        self.host = host
+        self.port = port
+        self.prefetch_size = prefetch_size
+
+        self.conn = None
+        self.conn_lock = threading.Lock()  # Serializes requests on the shared connection
+        self.queue_lock = threading.Lock()  # Guards the prefetched queues
+        self.prefetched = {}  # Maps a tuple of password options to a deque of generated passwords
+        self.refilling = set()  # Option tuples with a background refill in progress
+
+    def get_password(self, length, has_uppercase, has_number, has_special_chars):
+        """
+        Returns a random password with the given options, from the prefetched
+        queue if possible
+        :raises GeneratorUnavailableError: if the microservice cannot be reached
+        """
+        options = (length, has_uppercase, has_number, has_special_chars)
+
+        with self.queue_lock:
+            queue = self.prefetched.setdefault(options, deque())
+            password = queue.popleft() if queue else None
+            needs_refill = len(queue) < REFILL_THRESHOLD and options not in self.refilling
+            if password is not None and needs_refill:
+                self.refilling.add(options)
+
+        if password is None:
+
+            # Nothing queued yet for these options, so wait for a batch once
+            passwords = self._request_passwords(options)
+            password = passwords.pop()
+            with self.queue_lock:
+                queue.extend(passwords)
+
+        elif needs_refill:
+            threading.Thread(target=self._refill_queue, args=(options, ), daemon=True).start()
+
+        return password
+
+    def close(self):
+        """
+        Closes the connection to the microservice and discards queued passwords
+        """
+        with self.queue_lock:
+            self.prefetched.clear()
+
+        with self.conn_lock:
+            self._close_connection()
+
+    def _refill_queue(self, options):
+        """
+        Requests a new batch of passwords for the given options and adds it to
+        the queue. Runs on a background thread.
+        """
+        try:
+            passwords = self._request_passwords(options)
+        except GeneratorUnavailableError:
+            passwords = []  # The next call that finds the queue empty reports the error
+
+        with self.queue_lock:
+            self.prefetched.setdefault(options, deque()).extend(passwords)
+            self.refilling.discard(options)
+
+    def _request_passwords(self, options):
+        """
+        Requests a batch of passwords from the microservice, reconnecting once
+        if the connection was lost. Falls back to a single password if the
+        microservice has no batch request.
+        :param options: tuple of length, has_uppercase, has_number, has_special_chars
+        :return: A non-empty list of passwords
+        """
+        with self.conn_lock:
+            for attempt in range(2):
+                conn = self._get_connection()
+                try:
+                    get_passwords = getattr(conn.root, "exposed_get_passwords", None)
+                    if get_passwords is None:
+                        return [conn.root.exposed_get_password(*options)]
+
+                    # The service returns a tuple, which is copied over in a single response
+                    return list(get_passwords(self.prefetch_size, *options))
+
+                except (EOFError, OSError, TimeoutError) as err:
+                    self._close_connection()
+                    if attempt == 1:
+                        raise GeneratorUnavailableError("Lost connection to microservice") from err
+
+    def _get_connection(self):
+        """
+        Returns the open connection to the microservice, connecting if needed.
+        Must be called while holding the connection lock.
+        """
+        if self.conn is not None and not self.conn.closed:
+            return self.conn
+
+        try:
+            import rpyc
+        except ImportError as err:
+            raise GeneratorUnavailableError("rpyc is not installed") from err
+
+        try:
+            self.conn = rpyc.connect(self.host, self.port, config={"sync_request_timeout": RPYC_TIMEOUT})
+        except OSError as err:
+            raise GeneratorUnavailableError("Error connecting to microservice") from err
+
+        return self.conn
+
+    def _close_connection(self):
+        """
+        Closes the connection to the microservice if one is open. Must be
+        called while holding the connection lock.
+        """
+        if self.conn is not None:
+            try:
+                self.conn.close()
+            except Exception:
+                pass
+            self.conn = None
+
+
+def get_password_generator(backend=DEFAULT_BACKEND):
+    """
+    Returns a password generator for the given backend name
+    :param backend: LOCAL_BACKEND or RPYC_BACKEND
+    :return: An object with a get_password method
+    """
+    if backend == RPYC_BACKEND:
+        return RpycPasswordGenerator()
+    elif backend == LOCAL_BACKEND:
+        return LocalPasswordGenerator()
+    else:
+        raise ValueError("Unknown password generator backend: " + str(backend))
@@ -0,0 +1,45 @@
+# Author: Ian Docherty
+# Description: This module defines an RPyC password generator service that is
+#              compatible with the password generator microservice and adds a
+#              batch request. Run this module to start the service on localhost.
+
+import rpyc
+from password_generator import generate_password, RPYC_PORT
+from rpyc.utils.server import ThreadedServer
+
+
+# Largest batch a single request may ask for
+MAX_BATCH_SIZE = 1024
+
+
+class PasswordGeneratorService(rpyc.Service):
+    """
+    Generates random passwords for RPyC clients
+    """
+
+    def exposed_get_password(self, length, has_uppercase, has_number, has_special_chars):
+        """
+        Returns one random password with the given options
+        """
+        return generate_password(length, has_uppercase, has_number, has_special_chars)
+
+    def exposed_get_passwords(self, count, length, has_uppercase, has_number, has_special_chars):
+        """
+        Returns a tuple of count random passwords with the given options. A
+        tuple of strings is sent to the client by value in one response.
+        """
+        count = max(1, min(count, MAX_BATCH_SIZE))
+        return tuple(generate_password(length, has_uppercase, has_number, has_special_chars)
+                     for _ in range(count))
+
+
+def main():
+    """
+    Starts the password generator service
+    """
+    server = ThreadedServer(PasswordGeneratorService, hostname="localhost", port=RPYC_PORT)
+    server.start()
+
+
+if __name__ == "__main__":
+    main()
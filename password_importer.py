@@ -0,0 +1,255 @@
+# Author: Ian Docherty
+# Description: This module imports passwords exported from other password managers
+#              and browsers. CSV, JSON Lines, and KeePass 2.x XML files are read one
+#              entry at a time, and valid entries are added to the vault in batches,
+#              so files of any size are imported in constant memory.
+
+import csv
+import io
+import json
+import os
+import time
+from collections import namedtuple
+from password_entropy import contains_unapproved_specials
+from xml.etree import ElementTree
+
+
+# Supported import file formats
+CSV_FORMAT = "csv"
+JSONL_FORMAT = "jsonl"
+KEEPASS_XML_FORMAT = "keepass xml"
+
+# File extensions of each import file format
+FORMATS_BY_EXTENSION = {".csv": CSV_FORMAT, ".jsonl": JSONL_FORMAT, ".xml": KEEPASS_XML_FORMAT}
+
+# Column or key names holding the account name and password, in order of preference.
+# These cover KeePass, Chrome, Firefox, and Bitwarden exports.
+ACCOUNT_FIELDS = ["account", "title", "name", "url", "login_uri", "origin_url"]
+PASSWORD_FIELDS = ["password", "login_password"]
+
+# KeePass entry fields used as the account name, in order of preference
+KEEPASS_ACCOUNT_FIELDS = ["Title", "URL", "UserName"]
+
+# Number of entries added to the vault per bulk insert
+IMPORT_BATCH_SIZE = 1000
+
+MAX_FIELD_LENGTH = 255  # Longest account name or password the Passwords table can store
+
+
+class PasswordImportError(Exception):
+    """
+    Raised when an import file can't be read or its entries can't be saved
+    """
+    pass
+
+
+class ImportProgress(namedtuple("ImportProgress", ["imported", "skipped", "bytes_read", "total_bytes",
+                                                   "seconds"])):
+    """
+    The progress of an import: the number of entries imported and skipped so
+    far, how much of the file has been read, and the seconds since the import
+    started
+    """
+
+    __slots__ = ()
+
+    @property
+    def percent_done(self):
+        """
+        Returns the percentage of the file read so far
+        """
+        if self.total_bytes == 0:
+            return 100
+        return min(100, 100 * self.bytes_read // self.total_bytes)
+
+    @property
+    def entries_per_second(self):
+        """
+        Returns the number of entries imported per second so far
+        """
+        if self.seconds <= 0:
+            return 0
+        return self.imported / self.seconds
+
+
+def get_import_format(path):
+    """
+    Returns the import file format matching the extension of the given path
+    :return: CSV_FORMAT, JSONL_FORMAT, or KEEPASS_XML_FORMAT
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in FORMATS_BY_EXTENSION:
+        raise PasswordImportError("Unsupported import file type: " + extension)
+
+    return FORMATS_BY_EXTENSION[extension]
+
+
+def iter_csv_entries(file):
+    """
+    Generator that reads (account, password) pairs from a CSV file with a
+    header row, one row at a time
+    :param file: CSV file opened in binary mode
+    """
+    reader = csv.reader(io.TextIOWrapper(file, encoding="utf-8-sig", newline=""))
+    header = [column.strip().lower() for column in next(reader, [])]
+    account_columns = [header.index(field) for field in ACCOUNT_FIELDS if field in header]
+    password_columns = [header.index(field) for field in PASSWORD_FIELDS if field in header]
+    if not password_columns:
+        raise PasswordImportError("The CSV file has no password column")
+
+    for row in reader:
+        yield (_first_value(row, account_columns).strip(), _first_value(row, password_columns))
+
+
+def iter_jsonl_entries(file):
+    """
+    Generator that reads (account, password) pairs from a JSON Lines file,
+    where each line is one JSON object. Lines that are not objects are
+    returned as empty entries so they are counted as skipped.
+    :param file: JSON Lines file opened in binary mode
+    """
+    for line in io.TextIOWrapper(file, encoding="utf-8-sig"):
+        if not line.strip():
+            continue
+
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            entry = None
+        if not isinstance(entry, dict):
+            yield ("", "")
+            continue
+
+        lowercase_entry = {str(key).lower(): value for (key, value) in entry.items()}
+        account = next((lowercase_entry[field] for field in ACCOUNT_FIELDS if lowercase_entry.get(field)), "")
+        password = next((lowercase_entry[field] for field in PASSWORD_FIELDS if lowercase_entry.get(field)), "")
+        yield (str(account).strip(), str(password))
+
+
+def iter_keepass_xml_entries(file):
+    """
+    Generator that reads (account, password) pairs from a KeePass 2.x XML
+    export. Each entry is removed from the parsed tree once it has been read,
+    so memory use does not grow with the file. Old versions of entries kept
+    in their History are skipped.
+    :param file: KeePass XML file opened in binary mode
+    """
+    open_elements = []  # Elements from the root down to the one being parsed
+    history_depth = 0
+
+    for (event, element) in ElementTree.iterparse(file, events=("start", "end")):
+        if event == "start":
+            open_elements.append(element)
+            if element.tag == "History":
+                history_depth += 1
+            continue
+
+        open_elements.pop()
+        if element.tag == "History":
+            history_depth -= 1
+
+        elif element.tag == "Entry" and history_depth == 0:
+            fields = {string.findtext("Key"): string.findtext("Value") or ""
+                      for string in element.findall("String")}
+            account = next((fields[field] for field in KEEPASS_ACCOUNT_FIELDS if fields.get(field)), "")
+            yield (account.strip(), fields.get("Password", ""))
+            open_elements[-1].remove(element)
+
+        # Meta holds icons and attachments, which are not imported
+        elif element.tag == "Meta" and open_elements:
+            open_elements[-1].remove(element)
+
+
+# Entry readers for each import file format
+ENTRY_READERS = {CSV_FORMAT: iter_csv_entries, JSONL_FORMAT: iter_jsonl_entries,
+                 KEEPASS_XML_FORMAT: iter_keepass_xml_entries}
+
+
+def is_valid_entry(account, password):
+    """
+    Returns True if the given account name and password can be stored in the
+    vault, using the same rules as the add password screen
+    """
+    if not account or not password:
+        return False
+    if len(account) > MAX_FIELD_LENGTH or len(password) > MAX_FIELD_LENGTH:
+        return False
+
+    return not contains_unapproved_specials(password)
+
+
+def import_passwords(vault_cnx, path, file_format=None, batch_size=IMPORT_BATCH_SIZE, progress_callback=None):
+    """
+    Imports every valid entry of the given file into the vault. Entries are
+    added in batches, and each batch is committed on its own, so a failed
+    import keeps the batches added before the failure.
+    :param vault_cnx: connected StorageBackend object
+    :param path: path of the file to import
+    :param file_format: one of the import file formats, or None to pick one from the file extension
+    :param batch_size: number of entries added per bulk insert
+    :param progress_callback: if given, called with an ImportProgress after each batch
+    :return: An ImportProgress describing the finished import
+    """
+    if file_format is None:
+        file_format = get_import_format(path)
+    if file_format not in ENTRY_READERS:
+        raise PasswordImportError("Unsupported import file format: " + str(file_format))
+
+    total_bytes = os.path.getsize(path)
+    start_time = time.monotonic()
+    imported_count = 0
+    skipped_count = 0
+    batch = []
+
+    with open(path, "rb") as file:
+
+        def get_progress():
+            return ImportProgress(imported_count, skipped_count, file.tell(), total_bytes,
+                                  time.monotonic() - start_time)
+
+        try:
+            for (account, password) in ENTRY_READERS[file_format](file):
+                if not is_valid_entry(account, password):
+                    skipped_count += 1
+                    continue
+
+                batch.append((account, password))
+                if len(batch) == batch_size:
+                    imported_count += _add_batch(vault_cnx, batch, imported_count)
+                    batch = []
+                    if progress_callback is not None:
+                        progress_callback(get_progress())
+
+        except (csv.Error, UnicodeDecodeError, ElementTree.ParseError) as err:
+            raise PasswordImportError("Could not read the import file: " + str(err)) from err
+
+        if batch:
+            imported_count += _add_batch(vault_cnx, batch, imported_count)
+
+        return ImportProgress(imported_count, skipped_count, total_bytes, total_bytes,
+                              time.monotonic() - start_time)
+
+
+def _add_batch(vault_cnx, batch, imported_count):
+    """
+    Adds a batch of entries to the vault
+    :param imported_count: number of entries imported before this batch
+    :return: The number of entries added
+    """
+    added_count = vault_cnx.add_passwords_bulk(batch)
+    if added_count is False:
+        raise PasswordImportError("Database error after importing " + str(imported_count) + " passwords")
+
+    return added_count
+
+
+def _first_value(row, columns):
+    """
+    Returns the first non-empty value of the given columns of a CSV row, or
+    an empty string if there is none
+    """
+    for column in columns:
+        if column < len(row) and row[column]:
+            return row[column]
+
+    return ""
@@ -0,0 +1,777 @@
+# Author: Ian Docherty
+# Description: This module estimates how many guesses an attacker would need to
+#              find a password by looking for the patterns people use when they
+#              choose passwords: dictionary words, keyboard walks, repeats,
+#              sequences, and dates. Run this module to rebuild the compiled
+#              frequency list file from the word lists in frequency_lists.
+
+import datetime
+import math
+import mmap
+import os
+import re
+import struct
+import sys
+from array import array
+from collections import namedtuple
+
+
+# Word lists, most common word first, and the compiled file built from them
+FREQUENCY_LISTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "frequency_lists")
+FREQUENCY_LIST_NAMES = ["passwords", "english", "names"]
+FREQUENCY_LIST_FILE = os.path.join(FREQUENCY_LISTS_DIR, "frequency_lists.bin")
+
+# Layout of the compiled frequency list file header: magic, version, number of words
+FREQUENCY_LIST_MAGIC = b"PVFL"
+FREQUENCY_LIST_VERSION = 1
+FREQUENCY_LIST_HEADER = struct.Struct("<4sHI")
+
+MIN_WORD_LENGTH = 3  # Shorter words match almost anywhere, so they are left out
+CACHED_PREFIX_LENGTH = 2  # The range of words starting with each prefix up to this long is cached
+MAX_ANALYZED_LENGTH = 64  # Longer passwords are estimated this many characters at a time
+MAX_ESTIMATED_LENGTH = 256  # Characters after this are ignored, which bounds the time of an estimate
+MIN_RUN_LENGTH = 8  # Shortest repeat or sequence scored as a whole in a long password
+
+# Names of the pattern types
+DICTIONARY_PATTERN = "dictionary"
+REVERSED_PATTERN = "reversed"
+L33T_PATTERN = "l33t"
+SPATIAL_PATTERN = "spatial"
+REPEAT_PATTERN = "repeat"
+SEQUENCE_PATTERN = "sequence"
+DATE_PATTERN = "date"
+YEAR_PATTERN = "year"
+
+# Guess counts used when combining matches, as in the zxcvbn estimator
+MIN_GUESSES_BEFORE_GROWING_SEQUENCE = 10000
+MIN_SUBMATCH_GUESSES_SINGLE_CHAR = 10
+MIN_SUBMATCH_GUESSES_MULTI_CHAR = 50
+
+# Dates are guessed outwards from the current year
+REFERENCE_YEAR = datetime.date.today().year
+MIN_YEAR_SPACE = 20
+DATE_MIN_YEAR = 1000
+DATE_MAX_YEAR = 2050
+
+# Ways to split a run of 4 to 8 digits into day, month, and year
+DATE_SPLITS = {
+    4: [(1, 2), (2, 3)],
+    5: [(1, 3), (2, 3)],
+    6: [(1, 2), (2, 4), (4, 5)],
+    7: [(1, 3), (2, 3), (4, 5), (4, 6)],
+    8: [(2, 4), (4, 6)],
+}
+
+# Largest difference between neighbouring characters that still counts as a sequence
+MAX_SEQUENCE_DELTA = 5
+
+# Characters commonly substituted for letters. A 1 or | may stand for i or l.
+L33T_TABLE = {"4": "a", "@": "a", "8": "b", "(": "c", "{": "c", "3": "e", "6": "g", "1": "i",
+              "!": "i", "|": "i", "0": "o", "$": "s", "5": "s", "7": "t", "+": "t", "%": "x", "2": "z"}
+L33T_ALTERNATIVES = {"1": "l", "|": "l"}
+
+# Rows of a QWERTY keyboard as unshifted and shifted character pairs, with the
+# column of the first key of each row
+QWERTY_ROWS = [
+    (0, "`~ 1! 2@ 3# 4$ 5% 6^ 7& 8* 9( 0) -_ =+"),
+    (1, "qQ wW eE rR tT yY uU iI oO pP [{ ]} \\|"),
+    (1, "aA sS dD fF gG hH jJ kK lL ;: '\""),
+    (1, "zZ xX cC vV bB nN mM ,< .> /?"),
+]
+
+# Column and row offsets of the six keys around a key on a slanted keyboard
+KEYBOARD_DIRECTIONS = [(-1, 0), (0, -1), (1, -1), (1, 0), (0, 1), (-1, 1)]
+
+# Regular expressions used by the matchers
+GREEDY_REPEAT = re.compile(r"(.+)\1+", re.DOTALL)
+LAZY_REPEAT = re.compile(r"(.+?)\1+", re.DOTALL)
+LAZY_ANCHORED_REPEAT = re.compile(r"^(.+?)\1+$", re.DOTALL)
+DATE_WITHOUT_SEPARATOR = re.compile(r"[0-9]{4,8}")
+DATE_WITH_SEPARATOR = re.compile(r"([0-9]{1,4})([\s/\\_.-])([0-9]{1,2})\2([0-9]{1,4})")
+RECENT_YEAR = re.compile(r"19[0-9][0-9]|20[0-9][0-9]")
+
+
+# A part of a password that follows a pattern, from index i to index j inclusive
+Match = namedtuple("Match", ["pattern", "i", "j", "token", "log2_guesses"])
+
+
+class FrequencyList:
+    """
+    A sorted list of words and their frequency ranks, read from a compiled
+    frequency list file through a memory map. Only the pages touched by a
+    lookup are read from disk, and the pages are shared between processes.
+    """
+
+    def __init__(self, path=FREQUENCY_LIST_FILE):
+        """
+        Opens the compiled frequency list file at the given path
+        """
+        with open(path, "rb") as file:
+            self.map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, count = FREQUENCY_LIST_HEADER.unpack_from(self.map)
+        if magic != FREQUENCY_LIST_MAGIC or version != FREQUENCY_LIST_VERSION:
+            raise ValueError("Not a frequency list file: " + path)
+
+        # The header is followed by count + 1 word offsets, count ranks, then the words
+        offsets_start = FREQUENCY_LIST_HEADER.size
+        ranks_start = offsets_start + 4 * (count + 1)
+        self.count = count
+        self.words_start = ranks_start + 4 * count
+        self.offsets = _read_uint32_array(self.map, offsets_start, count + 1)
+        self.ranks = _read_uint32_array(self.map, ranks_start, count)
+        self.prefix_ranges = {}  # Maps each short prefix to the (low, high) index range of words starting with it
+
+    def get_word(self, index):
+        """
+        Returns the word at the given index of the sorted list as bytes
+        """
+        start = self.words_start + self.offsets[index]
+        end = self.words_start + self.offsets[index + 1]
+        return self.map[start:end]
+
+    def find_words(self, text, start):
+        """
+        Finds every word in the list that appears in the given text starting
+        at the given index. The search for longer words stops as soon as no
+        word in the list starts with the text read so far.
+        :param text: ASCII bytes to search
+        :param start: index of the first character of the words
+        :return: A list of (index of the last character, rank) tuples
+        """
+        found = []
+        low = 0
+        high = self.count
+        for end in range(start + 1, len(text) + 1):
+            prefix = text[start:end]
+
+            # Words starting with a longer prefix are within the range of the shorter one
+            if end - start <= CACHED_PREFIX_LENGTH:
+                prefix_range = self.prefix_ranges.get(prefix)
+                if prefix_range is None:
+                    prefix_range = self.prefix_ranges[prefix] = self.find_prefix_range(prefix, low, high)
+                (low, high) = prefix_range
+            else:
+                (low, high) = self.find_prefix_range(prefix, low, high)
+
+            if low == high:
+                break
+            if self.get_word(low) == prefix:
+                found.append((end - 1, self.ranks[low]))
+
+        return found
+
+    def find_prefix_range(self, prefix, low, high):
+        """
+        Returns the (low, high) range of indexes of the words starting with
+        the given prefix, searching only between the given indexes
+        """
+        low = self._bisect(prefix, low, high)
+        return low, self._bisect(prefix + b"\xff", low, high)  # Words are ASCII, so they sort before 0xff
+
+    def _bisect(self, key, low, high):
+        """
+        Returns the index of the first word between the given indexes that
+        does not sort before the given key
+        """
+        while low < high:
+            middle = (low + high) // 2
+            if self.get_word(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+
+        return low
+
+
+def _read_uint32_array(buffer, start, count):
+    """
+    Returns a sequence of count little-endian unsigned 32 bit integers read
+    from the given buffer, without copying on little-endian machines
+    """
+    view = memoryview(buffer)[start:start + 4 * count].cast("I")
+    if sys.byteorder == "little":
+        return view
+
+    values = array("I", view)
+    values.byteswap()
+    return values
+
+
+def build_frequency_lists(source_dir=FREQUENCY_LISTS_DIR, path=FREQUENCY_LIST_FILE):
+    """
+    Compiles the word lists in the given directory into one frequency list
+    file. A word found in several lists keeps its best rank.
+    :param source_dir: directory containing one text file per list name
+    :param path: path of the compiled file to write
+    """
+    ranks = {}
+    for name in FREQUENCY_LIST_NAMES:
+        with open(os.path.join(source_dir, name + ".txt"), encoding="utf-8") as file:
+            rank = 0
+            for line in file:
+                word = line.strip().lower()
+                if not word:
+                    continue
+
+                rank += 1
+                if len(word) >= MIN_WORD_LENGTH and word.isascii() and rank < ranks.get(word, rank + 1):
+                    ranks[word] = rank
+
+    # Words are sorted as bytes, the order used by FrequencyList.find_words
+    words = sorted(word.encode("ascii") for word in ranks)
+    offsets = array("I", [0])
+    for word in words:
+        offsets.append(offsets[-1] + len(word))
+    word_ranks = array("I", (ranks[word.decode("ascii")] for word in words))
+    if sys.byteorder != "little":
+        offsets.byteswap()
+        word_ranks.byteswap()
+
+    # Write to a temporary file first so readers never see a partial file
+    temp_path = path + ".tmp"
+    with open(temp_path, "wb") as file:
+        file.write(FREQUENCY_LIST_HEADER.pack(FREQUENCY_LIST_MAGIC, FREQUENCY_LIST_VERSION, len(words)))
+        file.write(offsets.tobytes())
+        file.write(word_ranks.tobytes())
+        file.write(b"".join(words))
+    os.replace(temp_path, path)
+
+
+# Frequency list opened on first use
+_frequency_list = None
+
+
+def get_frequency_list():
+    """
+    Returns the shared FrequencyList, compiling the word lists first if the
+    compiled file does not exist yet
+    """
+    global _frequency_list
+    if _frequency_list is None:
+        if not os.path.exists(FREQUENCY_LIST_FILE):
+            build_frequency_lists()
+        _frequency_list = FrequencyList(FREQUENCY_LIST_FILE)
+
+    return _frequency_list
+
+
+def _build_keyboard_graph():
+    """
+    Returns a dictionary mapping each character on a QWERTY keyboard to a
+    list of its six neighbouring keys, or None where there is no key
+    """
+    keys_by_position = {}
+    for (row, (first_column, keys)) in enumerate(QWERTY_ROWS):
+        for (column, key) in enumerate(keys.split(), start=first_column):
+            keys_by_position[(column, row)] = key
+
+    graph = {}
+    for ((column, row), key) in keys_by_position.items():
+        neighbours = [keys_by_position.get((column + x, row + y)) for (x, y) in KEYBOARD_DIRECTIONS]
+        for char in key:
+            graph[char] = neighbours
+
+    return graph
+
+
+# Keyboard layout used to find keyboard walks
+KEYBOARD_GRAPH = _build_keyboard_graph()
+SHIFTED_CHARS = frozenset(key[1] for (_, keys) in QWERTY_ROWS for key in keys.split())
+KEYBOARD_STARTING_POSITIONS = len(KEYBOARD_GRAPH) // 2
+KEYBOARD_AVERAGE_DEGREE = (sum(len([key for key in neighbours if key]) for neighbours in KEYBOARD_GRAPH.values())
+                           / len(KEYBOARD_GRAPH))
+
+# Base 2 logarithms of the constants used by the estimator
+LOG2_FACTORIALS = [math.lgamma(number + 1) / math.log(2) for number in range(MAX_ANALYZED_LENGTH + 2)]
+LOG2_SEQUENCE_PENALTIES = [(parts - 1) * math.log2(MIN_GUESSES_BEFORE_GROWING_SEQUENCE)
+                           for parts in range(MAX_ANALYZED_LENGTH + 2)]
+LOG2_MIN_SUBMATCH_GUESSES_SINGLE_CHAR = math.log2(MIN_SUBMATCH_GUESSES_SINGLE_CHAR)
+LOG2_MIN_SUBMATCH_GUESSES_MULTI_CHAR = math.log2(MIN_SUBMATCH_GUESSES_MULTI_CHAR)
+
+
+def get_log2_guesses(password, log2_bruteforce_per_char):
+    """
+    Estimates the base 2 logarithm of the number of guesses needed to find
+    the given password. The password is split into the sequence of patterns
+    and random characters that is cheapest to guess, as in the zxcvbn
+    estimator, so the result is comparable to a bit entropy value.
+    :param password: password to estimate
+    :param log2_bruteforce_per_char: bits of entropy of a random character of the password
+    :return: The estimated number of guesses as a power of 2
+    """
+
+    password = password[:MAX_ESTIMATED_LENGTH]
+    if len(password) <= MAX_ANALYZED_LENGTH:
+        return _get_most_guessable_log2(password, find_matches(password, log2_bruteforce_per_char),
+                                        log2_bruteforce_per_char)
+
+    # Long repeats and sequences are found in the whole password and scored once,
+    # so repeated text is not counted again in every piece it spans
+    log2_guesses = 0.0
+    position = 0
+    for run in _find_long_runs(password, log2_bruteforce_per_char):
+        log2_guesses += _get_log2_guesses_in_pieces(password[position:run.i], log2_bruteforce_per_char)
+        log2_guesses += run.log2_guesses
+        position = run.j + 1
+
+    return log2_guesses + _get_log2_guesses_in_pieces(password[position:], log2_bruteforce_per_char)
+
+
+def _find_long_runs(password, log2_bruteforce_per_char):
+    """
+    Returns the non-overlapping repeats and sequences of at least
+    MIN_RUN_LENGTH characters in the given password, preferring longer runs,
+    ordered by where they start
+    :return: A list of Match objects
+    """
+    runs = [match for match in _find_repeat_matches(password, log2_bruteforce_per_char)
+            + _find_sequence_matches(password) if len(match.token) >= MIN_RUN_LENGTH]
+
+    chosen_runs = []
+    for run in sorted(runs, key=lambda match: match.i - match.j):
+        if all(run.j < other.i or run.i > other.j for other in chosen_runs):
+            chosen_runs.append(run)
+
+    return sorted(chosen_runs, key=lambda match: match.i)
+
+
+def _get_log2_guesses_in_pieces(text, log2_bruteforce_per_char):
+    """
+    Estimates the guesses of the given text MAX_ANALYZED_LENGTH characters at
+    a time, which keeps the search fast, and adds up the pieces
+    :return: The base 2 logarithm of the estimated guesses
+    """
+    log2_guesses = 0.0
+    for start in range(0, len(text), MAX_ANALYZED_LENGTH):
+        piece = text[start:start + MAX_ANALYZED_LENGTH]
+        log2_guesses += _get_most_guessable_log2(piece, find_matches(piece, log2_bruteforce_per_char),
+                                                 log2_bruteforce_per_char)
+
+    return log2_guesses
+
+
+def find_matches(password, log2_bruteforce_per_char):
+    """
+    Returns every pattern match found in the given password
+    :param password: password to search
+    :param log2_bruteforce_per_char: bits of entropy of a random character, used to score repeats
+    :return: A list of Match objects
+    """
+    matches = _find_dictionary_matches(password)
+    matches += _find_spatial_matches(password)
+    matches += _find_repeat_matches(password, log2_bruteforce_per_char)
+    matches += _find_sequence_matches(password)
+    matches += _find_date_matches(password)
+
+    # A pattern inside a longer password is never cheaper than a few guesses
+    for (index, match) in enumerate(matches):
+        if len(match.token) < len(password):
+            if len(match.token) == 1:
+                min_log2_guesses = LOG2_MIN_SUBMATCH_GUESSES_SINGLE_CHAR
+            else:
+                min_log2_guesses = LOG2_MIN_SUBMATCH_GUESSES_MULTI_CHAR
+            if match.log2_guesses < min_log2_guesses:
+                matches[index] = match._replace(log2_guesses=min_log2_guesses)
+
+    return matches
+
+
+def _get_most_guessable_log2(password, matches, log2_bruteforce_per_char):
+    """
+    Finds the sequence of non-overlapping matches and random characters
+    covering the password that needs the fewest guesses. A sequence of l
+    parts needs l! times the product of its parts' guesses, plus a penalty
+    that grows with l, as in the zxcvbn estimator. Works in base 2
+    logarithms so long passwords do not overflow.
+    :return: The base 2 logarithm of the guesses of the best sequence
+    """
+    length = len(password)
+    if length == 0:
+        return 0.0
+
+    matches_by_end = [[] for _ in range(length)]
+    for match in matches:
+        matches_by_end[match.j].append(match)
+
+    # For each end index, map the number of parts to the best sequence found with that many parts
+    best_total = [{} for _ in range(length)]  # log2 of the guesses of the whole sequence
+    best_product = [{} for _ in range(length)]  # log2 of the product of the parts' guesses
+    ends_random = [{} for _ in range(length)]  # True if the last part is random characters
+
+    def update(end, start, log2_guesses, parts, is_random):
+        """
+        Records a sequence ending with the given part if it beats every
+        sequence ending at the same index with as many parts or fewer
+        """
+        product = log2_guesses
+        if parts > 1:
+            product += best_product[start - 1][parts - 1]
+        total = _log2_add(LOG2_FACTORIALS[parts] + product, LOG2_SEQUENCE_PENALTIES[parts])
+
+        for (other_parts, other_total) in best_total[end].items():
+            if other_parts <= parts and other_total <= total:
+                return
+
+        best_total[end][parts] = total
+        best_product[end][parts] = product
+        ends_random[end][parts] = is_random
+
+    for end in range(length):
+        for match in matches_by_end[end]:
+            if match.i == 0:
+                update(end, 0, match.log2_guesses, 1, False)
+            else:
+                for parts in list(best_product[match.i - 1]):
+                    update(end, match.i, match.log2_guesses, parts + 1, False)
+
+        # Random characters may follow any sequence that does not already end with random characters
+        update(end, 0, (end + 1) * log2_bruteforce_per_char, 1, True)
+        for start in range(1, end + 1):
+            log2_guesses = (end - start + 1) * log2_bruteforce_per_char
+            for (parts, is_random) in list(ends_random[start - 1].items()):
+                if not is_random:
+                    update(end, start, log2_guesses, parts + 1, True)
+
+    return min(best_total[length - 1].values())
+
+
+def _log2_add(log2_a, log2_b):
+    """
+    Returns log2(a + b) given log2(a) and log2(b)
+    """
+    if log2_a < log2_b:
+        log2_a, log2_b = log2_b, log2_a
+    return log2_a + math.log2(1 + 2 ** (log2_b - log2_a))
+
+
+def _get_log2_variations(changed_count, unchanged_count):
+    """
+    Returns the base 2 logarithm of the number of ways a word could have some
+    of its characters changed, given how many were changed and how many
+    changeable characters were left alone
+    """
+    if changed_count == 0 or unchanged_count == 0:
+        return 1.0
+
+    total = changed_count + unchanged_count
+    return math.log2(sum(math.comb(total, count) for count in range(1, min(changed_count, unchanged_count) + 1)))
+
+
+def _get_log2_uppercase_variations(token):
+    """
+    Returns the base 2 logarithm of the number of ways the given word could
+    have been capitalized. Capitalizing the first letter, the last letter, or
+    every letter counts as a single extra guess.
+    """
+    upper_count = sum(1 for char in token if char.isupper())
+    if upper_count == 0:
+        return 0.0
+
+    lower_count = sum(1 for char in token if char.islower())
+    if lower_count == 0 or (upper_count == 1 and (token[0].isupper() or token[-1].isupper())):
+        return 1.0
+
+    return _get_log2_variations(upper_count, lower_count)
+
+
+def _find_dictionary_matches(password):
+    """
+    Returns matches for the words of the frequency list found in the given
+    password, read forwards, backwards, and with l33t substitutions undone
+    """
+    frequency_list = get_frequency_list()
+    lower = password.lower()
+    length = len(password)
+    matches = []
+
+    def find_all(text):
+        """
+        Returns (start, end, rank) tuples for every word found in the given text
+        """
+        data = text.encode("ascii", "replace")
+        return [(start, end, rank) for start in range(length) for (end, rank) in frequency_list.find_words(data, start)]
+
+    for (start, end, rank) in find_all(lower):
+        token = password[start:end + 1]
+        matches.append(Match(DICTIONARY_PATTERN, start, end, token,
+                             math.log2(rank) + _get_log2_uppercase_variations(token)))
+
+    # Reversed words take twice as many guesses
+    for (start, end, rank) in find_all(lower[::-1]):
+        start, end = length - 1 - end, length - 1 - start
+        token = password[start:end + 1]
+        matches.append(Match(REVERSED_PATTERN, start, end, token,
+                             math.log2(rank) + _get_log2_uppercase_variations(token) + 1))
+
+    for substitutions in _get_l33t_substitutions(lower):
+        unsubbed = "".join(substitutions.get(char, char) for char in lower)
+        for (start, end, rank) in find_all(unsubbed):
+            token = password[start:end + 1]
+            token_lower = lower[start:end + 1]
+            used = {char: substitutions[char] for char in token_lower if char in substitutions}
+            if not used:
+                continue  # Already found as a plain word
+
+            log2_l33t_variations = sum(_get_log2_variations(token_lower.count(char), token_lower.count(letter))
+                                       for (char, letter) in used.items())
+            matches.append(Match(L33T_PATTERN, start, end, token,
+                                 math.log2(rank) + _get_log2_uppercase_variations(token) + log2_l33t_variations))
+
+    return matches
+
+
+def _get_l33t_substitutions(lower):
+    """
+    Returns the l33t substitution tables worth trying on the given lowercase
+    password. Each table maps a character of the password to a letter.
+    """
+    substitutions = {char: L33T_TABLE[char] for char in set(lower) if char in L33T_TABLE}
+    if not substitutions:
+        return []
+
+    alternatives = {char: L33T_ALTERNATIVES[char] for char in substitutions if char in L33T_ALTERNATIVES}
+    if not alternatives:
+        return [substitutions]
+
+    return [substitutions, dict(substitutions, **alternatives)]
+
+
+def _find_spatial_matches(password):
+    """
+    Returns matches for runs of three or more neighbouring keys on a QWERTY
+    keyboard, such as qwerty or zxcvb
+    """
+    matches = []
+    length = len(password)
+    start = 0
+    while start < length - 1:
+        end = start + 1
+        last_direction = None
+        turns = 0
+        shifted_count = 1 if password[start] in SHIFTED_CHARS else 0
+
+        while True:
+            found = False
+            if end < length:
+                neighbours = KEYBOARD_GRAPH.get(password[end - 1], ())
+                for (direction, key) in enumerate(neighbours):
+                    if key and password[end] in key:
+                        found = True
+                        if key.index(password[end]) == 1:
+                            shifted_count += 1
+                        if direction != last_direction:
+                            turns += 1
+                            last_direction = direction
+                        break
+
+            if found:
+                end += 1
+                continue
+
+            if end - start > 2:
+                matches.append(Match(SPATIAL_PATTERN, start, end - 1, password[start:end],
+                                     _get_log2_spatial_guesses(end - start, turns, shifted_count)))
+            start = end
+            break
+
+    return matches
+
+
+def _get_log2_spatial_guesses(length, turns, shifted_count):
+    """
+    Returns the base 2 logarithm of the number of keyboard walks with the
+    given length and number of turns, times the ways to use the shift key
+    """
+    guesses = 0
+    for walk_length in range(2, length + 1):
+        for walk_turns in range(1, min(turns, walk_length - 1) + 1):
+            guesses += (math.comb(walk_length - 1, walk_turns - 1) * KEYBOARD_STARTING_POSITIONS
+                        * KEYBOARD_AVERAGE_DEGREE ** walk_turns)
+
+    log2_guesses = math.log2(guesses)
+    if shifted_count:
+        log2_guesses += _get_log2_variations(shifted_count, length - shifted_count)
+
+    return log2_guesses
+
+
+def _find_repeat_matches(password, log2_bruteforce_per_char):
+    """
+    Returns matches for runs of a repeated string, such as aaa or abcabc.
+    The repeated string is scored by estimating it as a password.
+    """
+    matches = []
+    search_start = 0
+    while search_start < len(password):
+        greedy = GREEDY_REPEAT.search(password, search_start)
+        if greedy is None:
+            break
+        lazy = LAZY_REPEAT.search(password, search_start)
+
+        # Prefer the longer run, and find the shortest string that repeats to form it
+        if len(greedy.group(0)) > len(lazy.group(0)):
+            match = greedy
+            base = LAZY_ANCHORED_REPEAT.match(match.group(0)).group(1)
+        else:
+            match = lazy
+            base = match.group(1)
+
+        repeat_count = len(match.group(0)) // len(base)
+        log2_base_guesses = get_log2_guesses(base, log2_bruteforce_per_char)
+        matches.append(Match(REPEAT_PATTERN, match.start(), match.end() - 1, match.group(0),
+                             log2_base_guesses + math.log2(repeat_count)))
+        search_start = match.end()
+
+    return matches
+
+
+def _find_sequence_matches(password):
+    """
+    Returns matches for runs of characters with evenly spaced codes, such as
+    abcd, 1357, or zyx
+    """
+    matches = []
+
+    def add_match(start, end, delta):
+        """
+        Adds a match for the run from start to end if it counts as a sequence
+        """
+        if (end - start > 1 or abs(delta) == 1) and 0 < abs(delta) <= MAX_SEQUENCE_DELTA:
+            token = password[start:end + 1]
+            if token[0] in "aAzZ019":
+                base_guesses = 4  # Obvious starting points
+            elif token[0].isdigit():
+                base_guesses = 10
+            else:
+                base_guesses = 26
+            if delta < 0:
+                base_guesses *= 2
+            matches.append(Match(SEQUENCE_PATTERN, start, end, token, math.log2(base_guesses * len(token))))
+
+    if len(password) < 2:
+        return matches
+
+    start = 0
+    last_delta = None
+    for index in range(1, len(password)):
+        delta = ord(password[index]) - ord(password[index - 1])
+        if last_delta is None:
+            last_delta = delta
+        if delta == last_delta:
+            continue
+
+        add_match(start, index - 1, last_delta)
+        start = index - 1
+        last_delta = delta
+
+    add_match(start, len(password) - 1, last_delta)
+    return matches
+
+
+def _find_date_matches(password):
+    """
+    Returns matches for dates written with or without separators, such as
+    13/05/1991 or 130591, and for recent years on their own
+    """
+    matches = []
+    for match in RECENT_YEAR.finditer(password):
+        matches.append(Match(YEAR_PATTERN, match.start(), match.end() - 1, match.group(0),
+                             math.log2(_get_year_space(int(match.group(0))))))
+
+    # Dates need at least four digits
+    if sum(1 for char in password if char.isdigit()) < 4:
+        return matches
+
+    length = len(password)
+    for start in range(length - 3):
+        for end in range(start + 3, min(start + 8, length)):
+            token = password[start:end + 1]
+            if not DATE_WITHOUT_SEPARATOR.fullmatch(token):
+                continue
+
+            years = []
+            for (first_split, second_split) in DATE_SPLITS[len(token)]:
+                year = _get_date_year((int(token[:first_split]), int(token[first_split:second_split]),
+                                       int(token[second_split:])))
+                if year is not None:
+                    years.append(year)
+
+            if years:
+                year_space = min(_get_year_space(year) for year in years)
+                matches.append(Match(DATE_PATTERN, start, end, token, math.log2(year_space * 365)))
+
+    for start in range(length - 5):
+        for end in range(start + 5, min(start + 10, length)):
+            token = password[start:end + 1]
+            match = DATE_WITH_SEPARATOR.fullmatch(token)
+            if match is None:
+                continue
+
+            year = _get_date_year((int(match.group(1)), int(match.group(3)), int(match.group(4))))
+            if year is not None:
+                # Four guesses cover the common separators
+                matches.append(Match(DATE_PATTERN, start, end, token, math.log2(_get_year_space(year) * 365 * 4)))
+
+    return matches
+
+
+def _get_year_space(year):
+    """
+    Returns the number of years an attacker would try before the given year
+    """
+    return max(abs(year - REFERENCE_YEAR), MIN_YEAR_SPACE)
+
+
+def _get_date_year(values):
+    """
+    Returns the year of the date formed by three integers in a day, month,
+    and year order people commonly use, or None if they do not form a date
+    """
+    if values[1] > 31 or values[1] <= 0:
+        return None
+
+    over_12 = over_31 = under_1 = 0
+    for value in values:
+        if 99 < value < DATE_MIN_YEAR or value > DATE_MAX_YEAR:
+            return None
+        if value > 31:
+            over_31 += 1
+        if value > 12:
+            over_12 += 1
+        if value <= 0:
+            under_1 += 1
+    if over_31 >= 2 or over_12 == 3 or under_1 >= 2:
+        return None
+
+    # A four digit year must be first or last
+    orders = [(values[2], values[0], values[1]), (values[0], values[1], values[2])]
+    for (year, first, second) in orders:
+        if DATE_MIN_YEAR <= year <= DATE_MAX_YEAR:
+            return year if _is_day_and_month(first, second) else None
+
+    # Otherwise try a two digit year first or last
+    for (year, first, second) in orders:
+        if _is_day_and_month(first, second):
+            return year + (1900 if year > 50 else 2000)
+
+    return None
+
+
+def _is_day_and_month(first, second):
+    """
+    Returns True if the two integers are a day and a month in either order
+    """
+    return (1 <= first <= 31 and 1 <= second <= 12) or (1 <= second <= 31 and 1 <= first <= 12)
+
+
+def main():
+    """
+    Rebuilds the compiled frequency list file from the word lists
+    """
+    build_frequency_lists()
+    print("Wrote " + FREQUENCY_LIST_FILE)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+# Author: Ian Docherty
+# Description: This module defines the ReuseDetector class, an in-memory index over
+#              stored passwords that finds passwords reused across accounts and
+#              passwords that are only slightly different from each other.
+
+import hashlib
+import secrets
+import struct
+
+
+# Number of bytes in the keyed digest of each password
+DIGEST_SIZE = 16
+
+# Length of the character shingles compared by near-duplicate detection
+SHINGLE_LENGTH = 3
+
+# Passwords shorter than this are only checked for exact reuse
+MIN_SIMILAR_LENGTH = 6
+
+# MinHash signature size, split into bands of rows for locality-sensitive hashing.
+# Two passwords become candidates if all rows of any one band match.
+SIGNATURE_SIZE = 16
+BAND_ROWS = 2
+
+# Fraction of matching signature values needed to report two passwords as similar
+SIMILARITY_THRESHOLD = 0.5
+
+# Each shingle is hashed once into SIGNATURE_SIZE independent 32 bit values,
+# one per MinHash function, instead of applying a permutation per function
+SHINGLE_HASHES = struct.Struct(">" + "I" * SIGNATURE_SIZE)
+
+
+class ReuseDetector:
+    """
+    Finds stored passwords that are reused or nearly reused. Each password is
+    kept only as a keyed digest, mapped to the row ids using it, so exact reuse
+    is a single dictionary lookup. Near-duplicates are found by comparing
+    MinHash signatures of the password's character shingles, using a
+    locality-sensitive index so only likely matches are compared. Both are
+    updated incrementally as passwords are added, edited, and deleted.
+    """
+
+    def __init__(self, detect_similar=True):
+        """
+        Creates an empty ReuseDetector with a new random key
+        :param detect_similar: False to only detect exact reuse
+        """
+        self.detect_similar = detect_similar
+        self.key = secrets.token_bytes(32)  # Random per detector, so digests can't be compared elsewhere
+        self.shingle_hasher = hashlib.blake2b(key=self.key, digest_size=SHINGLE_HASHES.size)
+        self.digests_by_id = {}  # Maps row id to the digest of that row's password
+        self.ids_by_digest = {}  # Maps each digest to the set of row ids whose password has it
+        self.signatures_by_id = {}  # Maps row id to the MinHash signature of that row's password
+        self.band_ids = {}  # Maps each (band number, band values) to the set of row ids in that bucket
+
+    def build(self, records):
+        """
+        Replaces the contents of the detector with the given records
+        :param records: iterable of PasswordRecord objects
+        """
+        self.digests_by_id = {}
+        self.ids_by_digest = {}
+        self.signatures_by_id = {}
+        self.band_ids = {}
+        self.add_records(records)
+
+    def add(self, row_id, password):
+        """
+        Adds a password to the detector, replacing any password with the same row id
+        """
+        self.add_entry(self.get_entry(row_id, password))
+
+    def add_entry(self, entry):
+        """
+        Adds a password hashed by get_entry to the detector, replacing any
+        password with the same row id
+        :param entry: tuple of (row id, digest, signature)
+        """
+        row_id, digest, signature = entry
+        if row_id in self.digests_by_id:
+            self.remove(row_id)
+
+        self.digests_by_id[row_id] = digest
+        self.ids_by_digest.setdefault(digest, set()).add(row_id)
+
+        if signature is not None:
+            self.signatures_by_id[row_id] = signature
+            for band in _get_bands(signature):
+                self.band_ids.setdefault(band, set()).add(row_id)
+
+    def add_records(self, records):
+        """
+        Adds many passwords to the detector
+        :param records: iterable of PasswordRecord objects
+        """
+        for record in records:
+            self.add(record.row_id, record.password)
+
+    def remove(self, row_id):
+        """
+        Removes the password with the given row id from the detector
+        """
+        digest = self.digests_by_id.pop(row_id, None)
+        if digest is None:
+            return
+
+        _discard_id(self.ids_by_digest, digest, row_id)
+        signature = self.signatures_by_id.pop(row_id, None)
+        if signature is not None:
+            for band in _get_bands(signature):
+                _discard_id(self.band_ids, band, row_id)
+
+    def find_reused(self, password, exclude_id=None):
+        """
+        Returns the set of row ids storing exactly the given password
+        :param exclude_id: row id to leave out, such as the row being edited
+        """
+        row_ids = set(self.ids_by_digest.get(self.get_digest(password), ()))
+        row_ids.discard(exclude_id)
+        return row_ids
+
+    def find_similar(self, password, exclude_id=None):
+        """
+        Returns the set of row ids storing a password similar to, but not the
+        same as, the given password
+        :param exclude_id: row id to leave out, such as the row being edited
+        """
+        signature = self.get_signature(password)
+        if signature is None:
+            return set()
+
+        # Only rows sharing a band with the password need their signatures compared
+        candidates = set()
+        for band in _get_bands(signature):
+            candidates.update(self.band_ids.get(band, ()))
+        candidates.discard(exclude_id)
+        candidates -= self.ids_by_digest.get(self.get_digest(password), set())
+
+        min_matches = SIMILARITY_THRESHOLD * SIGNATURE_SIZE
+        return {row_id for row_id in candidates
+                if _count_matches(signature, self.signatures_by_id[row_id]) >= min_matches}
+
+    def get_entry(self, row_id, password):
+        """
+        Hashes a password for add_entry without changing the detector, so the
+        hashing can run on another thread
+        :return: A tuple of (row id, digest, signature)
+        """
+        return row_id, self.get_digest(password), self.get_signature(password)
+
+    def get_digest(self, password):
+        """
+        Returns the keyed digest of the given password
+        """
+        return hashlib.blake2b(password.encode("utf-8"), key=self.key, digest_size=DIGEST_SIZE).digest()
+
+    def get_signature(self, password):
+        """
+        Returns the MinHash signature of the given password's lowercase
+        character shingles, or None if near-duplicate detection is off or the
+        password is too short
+        """
+        if not self.detect_similar or len(password) < MIN_SIMILAR_LENGTH:
+            return None
+
+        # Hash each shingle once, starting from a copy of the keyed hash, then
+        # keep the smallest value of each of the hash functions
+        text = password.lower().encode("utf-8")
+        shingle_hashes = []
+        for i in range(len(text) - SHINGLE_LENGTH + 1):
+            shingle_hash = self.shingle_hasher.copy()
+            shingle_hash.update(text[i:i + SHINGLE_LENGTH])
+            shingle_hashes.append(SHINGLE_HASHES.unpack(shingle_hash.digest()))
+
+        return tuple(map(min, zip(*shingle_hashes)))
+
+
+def _get_bands(signature):
+    """
+    Returns the locality-sensitive index keys of the given MinHash signature
+    """
+    return [(start, signature[start:start + BAND_ROWS]) for start in range(0, SIGNATURE_SIZE, BAND_ROWS)]
+
+
+def _count_matches(signature, other_signature):
+    """
+    Returns the number of positions where two MinHash signatures are equal
+    """
+    return sum(1 for (value, other_value) in zip(signature, other_signature) if value == other_value)
+
+
+def _discard_id(ids_by_key, key, row_id):
+    """
+    Removes a row id from the set stored under the given key, deleting the
+    set once it is empty
+    """
+    row_ids = ids_by_key.get(key)
+    if row_ids is not None:
+        row_ids.discard(row_id)
+        if not row_ids:
+            del ids_by_key[key]
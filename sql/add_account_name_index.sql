@@ -0,0 +1,7 @@
+/* Migration for databases created before the accountName index was
+ * added to database_definition.sql. Adds the index used to sort and
+ * search passwords by account name. Run once from the MySQL root
+ * account, or a similar account that has INDEX privileges.
+ */
+
+CREATE INDEX accountName_index ON PasswordVault.Passwords (accountName);
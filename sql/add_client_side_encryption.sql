@@ -0,0 +1,18 @@
+/* Migration for databases created before passwords were encrypted by
+ * the app. Makes room for encrypted passwords and adds the table that
+ * stores the vault's keys. The stored passwords are encrypted the next
+ * time the master user logs in. Run once from the MySQL root account,
+ * or a similar account that has ALTER and CREATE privileges.
+ */
+
+ALTER TABLE PasswordVault.Passwords MODIFY accountPassword VARBINARY(512) NOT NULL;
+
+CREATE TABLE PasswordVault.VaultKeys (
+	id INT AUTO_INCREMENT NOT NULL,
+    kdfSalt VARBINARY(16) NOT NULL,
+    kdfLog2N TINYINT UNSIGNED NOT NULL,
+    kdfR TINYINT UNSIGNED NOT NULL,
+    kdfP TINYINT UNSIGNED NOT NULL,
+    wrappedKey VARBINARY(64) NOT NULL,
+    PRIMARY KEY (id)
+);
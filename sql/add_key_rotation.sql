@@ -0,0 +1,12 @@
+/* Migration for databases created before the master key could be
+ * rotated. Adds the table that tracks an unfinished re-encryption of
+ * the passwords. Run once from the MySQL root account, or a similar
+ * account that has CREATE privileges.
+ */
+
+CREATE TABLE PasswordVault.KeyRotation (
+	id INT AUTO_INCREMENT NOT NULL,
+    targetKeyId INT NOT NULL,
+    lastRowId INT NOT NULL,
+    PRIMARY KEY (id)
+);
@@ -4,14 +4,18 @@
 
 CREATE SCHEMA IF NOT EXISTS PasswordVault;
 
-DROP TABLE IF EXISTS PasswordVault.Passwords, PasswordVault.MasterAccount;
+DROP TABLE IF EXISTS PasswordVault.Passwords, PasswordVault.MasterAccount, PasswordVault.VaultKeys,
+    PasswordVault.KeyRotation;
 
-/* Stores all of the user's accounts and passwords */
+/* Stores all of the user's accounts and passwords. Passwords are
+ * encrypted by the app before they are stored.
+ */
 CREATE TABLE PasswordVault.Passwords (
 	id INT AUTO_INCREMENT NOT NULL,
     accountName VARCHAR(255) NOT NULL,
-    accountPassword VARCHAR(255) NOT NULL,
-    PRIMARY KEY (id)
+    accountPassword VARBINARY(512) NOT NULL,
+    PRIMARY KEY (id),
+    INDEX accountName_index (accountName)
 );
 
 /* Stores the master account username and password */
@@ -21,6 +25,29 @@ CREATE TABLE PasswordVault.MasterAccount (
     PRIMARY KEY (id)
 );
 
+/* Stores the keys that encrypt the passwords, each wrapped by a key
+ * derived from the master password with the given scrypt settings
+ */
+CREATE TABLE PasswordVault.VaultKeys (
+	id INT AUTO_INCREMENT NOT NULL,
+    kdfSalt VARBINARY(16) NOT NULL,
+    kdfLog2N TINYINT UNSIGNED NOT NULL,
+    kdfR TINYINT UNSIGNED NOT NULL,
+    kdfP TINYINT UNSIGNED NOT NULL,
+    wrappedKey VARBINARY(64) NOT NULL,
+    PRIMARY KEY (id)
+);
+
+/* Marks an unfinished re-encryption of the passwords with a new key,
+ * and the last row id re-encrypted so far
+ */
+CREATE TABLE PasswordVault.KeyRotation (
+	id INT AUTO_INCREMENT NOT NULL,
+    targetKeyId INT NOT NULL,
+    lastRowId INT NOT NULL,
+    PRIMARY KEY (id)
+);
+
 /* Create a new user account with default password "password" */
 DROP USER IF EXISTS 'masterUser'@'localhost';
 CREATE USER IF NOT EXISTS 'masterUser'@'localhost' IDENTIFIED BY 'default';
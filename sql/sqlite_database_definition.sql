@@ -0,0 +1,49 @@
+/* Table definition queries used to build the PasswordVault database
+ * in an embedded SQLite file. The file is attached to each connection
+ * under the PasswordVault schema name, so the tables match the ones in
+ * database_definition.sql. These queries are run on every connection
+ * and only create tables that do not exist yet.
+ */
+
+/* Stores all of the user's accounts and passwords. NOCASE sorts and
+ * compares account names like the default MySQL collation. Passwords
+ * are encrypted by the app before they are stored.
+ */
+CREATE TABLE IF NOT EXISTS PasswordVault.Passwords (
+    id INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL,
+    accountName VARCHAR(255) NOT NULL COLLATE NOCASE,
+    accountPassword BLOB NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS PasswordVault.accountName_index ON Passwords (accountName);
+
+/* Stores the master account username and a salted scrypt hash of the
+ * master password, since SQLite has no user accounts of its own
+ */
+CREATE TABLE IF NOT EXISTS PasswordVault.MasterAccount (
+    id INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL,
+    masterUser VARCHAR(255) NOT NULL,
+    masterPasswordSalt BLOB NOT NULL,
+    masterPasswordHash BLOB NOT NULL
+);
+
+/* Stores the keys that encrypt the passwords, each wrapped by a key
+ * derived from the master password with the given scrypt settings
+ */
+CREATE TABLE IF NOT EXISTS PasswordVault.VaultKeys (
+    id INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL,
+    kdfSalt BLOB NOT NULL,
+    kdfLog2N INTEGER NOT NULL,
+    kdfR INTEGER NOT NULL,
+    kdfP INTEGER NOT NULL,
+    wrappedKey BLOB NOT NULL
+);
+
+/* Marks an unfinished re-encryption of the passwords with a new key,
+ * and the last row id re-encrypted so far
+ */
+CREATE TABLE IF NOT EXISTS PasswordVault.KeyRotation (
+    id INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL,
+    targetKeyId INTEGER NOT NULL,
+    lastRowId INTEGER NOT NULL
+);
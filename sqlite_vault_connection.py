@@ -0,0 +1,222 @@
+# Author: Ian Docherty
+# Description: This module defines the SQLiteVaultConnection class, which stores the
+#              password vault in an embedded SQLite database file instead of on a
+#              MySQL server. It needs no server or database setup, and the tables
+#              are created the first time the file is opened.
+
+import hashlib
+import hmac
+import os
+import sqlite3
+from connection_pool import ConnectionPool
+from storage_backend import DEFAULT_PASSWORD, StorageBackend
+
+
+# Database file used by the SQLite backend, and the queries that create its tables
+SQLITE_DATABASE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "password_vault.db")
+SQLITE_SCHEMA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sql",
+                                  "sqlite_database_definition.sql")
+
+# Number of compiled statements kept per connection, so repeated queries skip parsing
+STATEMENT_CACHE_SIZE = 128
+
+BUSY_TIMEOUT = 5  # Seconds to wait for another connection's write lock
+
+# scrypt settings used to hash the master password
+SCRYPT_N = 2 ** 14
+SCRYPT_R = 8
+SCRYPT_P = 1
+SALT_SIZE = 16
+HASH_SIZE = 32
+
+
+class SQLiteVaultConnection(StorageBackend):
+    """
+    Allows the user to connect to and perform CRUD operations on an
+    embedded SQLite database. The database file is attached to each
+    connection as PasswordVault, so the shared queries run unchanged apart
+    from their placeholders. The file uses write-ahead logging so reads
+    never wait for a write. SQLite has no user accounts, so the master
+    password is checked against a salted hash stored in the MasterAccount
+    table.
+    """
+
+    DatabaseError = sqlite3.Error
+    LIKE_ESCAPE = " ESCAPE '\\'"
+
+    def __init__(self, path=SQLITE_DATABASE_FILE):
+        """
+        Creates a SQLiteVaultConnection object for the database file at the given path
+        """
+        super().__init__()
+        self.path = path
+
+    def _open_connection(self, password):
+        """
+        Opens a new connection to the database file, creating the tables if
+        they do not exist. The file itself is not protected by the password,
+        which is checked by connect_to_db before any connection is opened.
+        :param password: unused, accepted for compatibility with other backends
+        :return: An open database connection
+        """
+        cnx = sqlite3.connect(":memory:", timeout=BUSY_TIMEOUT, check_same_thread=False,
+                              cached_statements=STATEMENT_CACHE_SIZE)
+        try:
+            cnx.execute("ATTACH DATABASE ? AS PasswordVault;", (self.path, ))
+            cnx.execute("PRAGMA PasswordVault.journal_mode = WAL;")
+            cnx.execute("PRAGMA PasswordVault.synchronous = NORMAL;")  # Safe with WAL, and skips a sync per commit
+            cnx.executescript(_get_schema())
+        except sqlite3.Error:
+            cnx.close()
+            raise
+
+        return cnx
+
+    def _create_pool(self):
+        """
+        Returns a new connection pool that opens connections to the database file
+        """
+        return ConnectionPool(self._open_master_connection, health_check=_is_open)
+
+    def convert_query(self, query):
+        """
+        Returns the given query with %s placeholders replaced by the ? placeholders SQLite uses
+        """
+        return query.replace("%s", "?")
+
+    def connect_to_db(self, password):
+        """
+        Checks the given password against the master account, then creates a
+        connection pool for the database file
+        :return: True on success, False otherwise
+        """
+        if not self.test_db_connection(password):
+            self.close_connection()
+            return False  # Incorrect password
+
+        return super().connect_to_db(password)
+
+    def test_db_connection(self, password):
+        """
+        Tests the given password against the master account. Until the master
+        account is created, only the default password works.
+        :param password: password to test
+        :return: True if the password is correct, False otherwise
+        """
+        try:
+            cnx = self._open_connection(password)
+            try:
+                password_query = "SELECT masterPasswordSalt, masterPasswordHash FROM PasswordVault.MasterAccount " \
+                                 "ORDER BY id LIMIT 1;"
+                master_account = cnx.execute(password_query).fetchone()
+            finally:
+                cnx.close()
+        except sqlite3.Error as err:
+            print(err)
+            return None
+
+        if master_account is None:
+            return password == DEFAULT_PASSWORD
+
+        salt, password_hash = master_account
+        return hmac.compare_digest(_hash_master_password(password, salt), password_hash)
+
+    def create_user(self, username, password):
+        """
+        Creates a master user with a given name, and a given password, if no
+        master account exists yet
+        :param username: name of user
+        :param password: master password
+        :return: True if account creation successful, False otherwise
+        """
+        salt = os.urandom(SALT_SIZE)
+        try:
+            cnx = self._open_connection(DEFAULT_PASSWORD)
+            try:
+                cursor = cnx.cursor()
+
+                # Only insert the account if there is none, in a single statement
+                create_user_query = "INSERT INTO PasswordVault.MasterAccount " \
+                                    "(masterUser, masterPasswordSalt, masterPasswordHash) " \
+                                    "SELECT ?, ?, ? WHERE NOT EXISTS (SELECT 1 FROM PasswordVault.MasterAccount);"
+                cursor.execute(create_user_query, (username, salt, _hash_master_password(password, salt)))
+                created = cursor.rowcount == 1
+
+                # Commit changes
+                cnx.commit()
+                cursor.close()
+            finally:
+                cnx.close()
+        except sqlite3.Error as err:
+            print(err)
+            return False
+
+        if not created:
+            print("Master account already exists")
+            return False
+
+        self.default_password_changed = True
+        return True
+
+    def edit_master_password(self, new_password, new_username=None):
+        """
+        Updates master account with a hash of the new password, rewraps the
+        vault's data keys with it, and adds the new data key of a key
+        rotation, all in one transaction
+        :param new_username: if given, the master username is changed in the same transaction
+        :return: True if successful, False otherwise
+        """
+        salt = os.urandom(SALT_SIZE)
+        try:
+            with self.db_pool.connection() as cnx:
+                cursor = cnx.cursor()
+                edit_password_query = "UPDATE PasswordVault.MasterAccount SET masterPasswordSalt = ?, " \
+                                      "masterPasswordHash = ? WHERE id >= 1;"
+                cursor.execute(edit_password_query, (salt, _hash_master_password(new_password, salt)))
+                if new_username is not None:
+                    cursor.execute("UPDATE PasswordVault.MasterAccount SET masterUser = ? WHERE id >= 1;",
+                                   (new_username, ))
+                new_key = self._rotate_vault_keys(cursor, new_password)
+
+                # Commit changes
+                cnx.commit()
+                cursor.close()
+
+        except sqlite3.Error as err:
+            print(err)
+            return False
+        else:
+            self.master_password = new_password
+            self.vault_cipher.add_key(*new_key, current=True)
+            return True
+
+
+def _hash_master_password(password, salt):
+    """
+    Returns the scrypt hash of the given master password and salt
+    """
+    return hashlib.scrypt(password.encode("utf-8"), salt=salt, n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P, dklen=HASH_SIZE)
+
+
+def _is_open(cnx):
+    """
+    Returns True if the given SQLite connection can still run queries
+    """
+    cnx.execute("SELECT 1;").fetchone()
+    return True
+
+
+# Table definition queries, read on first use
+_schema = None
+
+
+def _get_schema():
+    """
+    Returns the queries that create the SQLite tables
+    """
+    global _schema
+    if _schema is None:
+        with open(SQLITE_SCHEMA_FILE, "r", encoding="utf-8") as file:
+            _schema = file.read()
+
+    return _schema
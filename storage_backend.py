@@ -0,0 +1,921 @@
+# Author: Ian Docherty
+# Description: This module defines the StorageBackend class, the database independent
+#              part of a connection to the password vault. Subclasses open connections
+#              to a specific database engine and handle master account operations that
+#              differ between engines, while the password queries are shared. Passwords
+#              are encrypted before they are sent to the database.
+
+import os
+from collections import namedtuple
+from collections.abc import Mapping
+from connection_pool import ConnectionPool
+from itertools import islice
+from vault_crypto import CIPHERTEXT_OVERHEAD, CIPHERTEXT_START, SALT_SIZE, KdfParams, VaultCipher, VaultKeyError, \
+    calibrate_kdf, derive_key, generate_data_key, get_key_id, unwrap_data_key, wrap_data_key
+
+
+# Number of rows fetched per query when streaming passwords
+PAGE_SIZE = 500
+
+# Number of rows written per statement by the bulk operations
+BULK_CHUNK_SIZE = 1000
+
+# Maximum number of rows returned by a search
+SEARCH_LIMIT = 100
+
+# Password of the master account before the user creates their account
+DEFAULT_PASSWORD = "default"
+
+
+class PasswordRecord(namedtuple("PasswordRecord", ["row_id", "account", "password"])):
+    """
+    A single row of the Passwords table. Records are tuples without a
+    per-instance dictionary, so a large result set takes a fraction of the
+    memory of one dictionary per row. Fields are read as attributes, e.g.
+    record.account. Code written for row dictionaries can read a record
+    through as_dict, e.g. record.as_dict()["account"].
+    """
+
+    __slots__ = ()
+
+    def as_dict(self):
+        """
+        Returns a read-only mapping view of the record's fields. The view reads
+        the record itself, so no dictionary is built.
+        """
+        return RecordView(self)
+
+
+class RecordView(Mapping):
+    """
+    A read-only mapping of field name to value over a namedtuple record
+    """
+
+    __slots__ = ("record", )
+
+    def __init__(self, record):
+        """
+        Creates a RecordView of the given record
+        """
+        self.record = record
+
+    def __getitem__(self, key):
+        """
+        Returns the field with the given name
+        """
+        if key not in self.record._fields:
+            raise KeyError(key)
+        return getattr(self.record, key)
+
+    def __iter__(self):
+        """
+        Returns an iterator over the field names
+        """
+        return iter(self.record._fields)
+
+    def __len__(self):
+        """
+        Returns the number of fields
+        """
+        return len(self.record._fields)
+
+
+# A row of the Passwords table without its password, used to list passwords
+# without decrypting them. Passwords only use ASCII characters, so the
+# length in characters is the length in bytes.
+PasswordSummary = namedtuple("PasswordSummary", ["row_id", "account", "password_length"])
+
+# A row of the Passwords table with the version of its password instead of the
+# password. The version is the header and nonce of the encrypted password,
+# which change every time the password is saved or re-encrypted.
+PasswordVersion = namedtuple("PasswordVersion", ["row_id", "account", "version"])
+
+
+class StorageBackend:
+    """
+    Allows the user to connect to and perform CRUD operations on the
+    database. Queries are written with %s placeholders and tables qualified
+    by the PasswordVault schema name, and are converted by convert_query for
+    engines that need a different syntax. Subclasses must implement
+    _open_connection, test_db_connection, create_user, and edit_master_password.
+
+    Passwords are encrypted on the client with the vault's data key, which is
+    stored in the VaultKeys table wrapped by a key derived from the master
+    password. The key is unwrapped once when connecting and kept until the
+    connection is closed.
+    """
+
+    # Base class of the errors raised by the database driver
+    DatabaseError = Exception
+
+    # Clause added to LIKE conditions so a backslash escapes wildcards
+    LIKE_ESCAPE = ""
+
+    def __init__(self):
+        """
+        Creates a StorageBackend object with a master username,
+        a given password, and an initially-NULL connection pool
+        """
+        self.master_username = "masterUser"
+        self.master_password = None
+        self.db_pool = None
+        self.vault_cipher = None
+        self.default_password_changed = False
+
+    def _open_connection(self, password):
+        """
+        Opens a new connection to the database as the master user
+        :param password: password to connect to database
+        :return: An open database connection
+        """
+        raise NotImplementedError
+
+    def _open_master_connection(self):
+        """
+        Opens a new connection using the current master password. Used as the
+        connection factory of the connection pool.
+        :return: An open database connection
+        """
+        return self._open_connection(self.master_password)
+
+    def _create_pool(self):
+        """
+        Returns a new connection pool that opens connections as the master user
+        """
+        return ConnectionPool(self._open_master_connection)
+
+    def convert_query(self, query):
+        """
+        Returns the given query rewritten for this database engine
+        """
+        return query
+
+    def _execute(self, cnx, query, params=()):
+        """
+        Runs the given query on the given connection and returns the cursor
+        holding its results. Pass the cursor to _close_cursor once its results
+        have been read.
+        :param query: query text with %s placeholders
+        :param params: values of the placeholders
+        :return: A cursor that has executed the query
+        """
+        cursor = cnx.cursor()
+        cursor.execute(self.convert_query(query), params)
+        return cursor
+
+    def _close_cursor(self, cursor):
+        """
+        Finishes with a cursor returned by _execute
+        """
+        cursor.close()
+
+    def connect_to_db(self, password):
+        """
+        Creates a connection pool for the given password and opens its first
+        connection to verify the password, then unlocks the vault's data keys.
+        Returns True if successful, and False otherwise
+        :return: True on success, False otherwise
+        """
+        self.close_connection()
+        self.master_password = password
+        self.db_pool = self._create_pool()
+
+        # Unlocking reads the keys on the pool's first connection, which leaves a warm connection
+        try:
+            self.vault_cipher = self._unlock_vault(password)
+        except self.DatabaseError:
+            self.close_connection()
+            return False  # Incorrect password
+        except VaultKeyError as err:
+            print(err)
+            self.close_connection()
+            return False
+        else:
+            return True
+
+    def _unlock_vault(self, password):
+        """
+        Unwraps every data key of the vault with a key derived from the given
+        password. Creates the first data key if the vault has none.
+        :return: A VaultCipher holding the unwrapped keys
+        """
+        with self.db_pool.connection() as cnx:
+            keys_query = "SELECT id, kdfSalt, kdfLog2N, kdfR, kdfP, wrappedKey FROM PasswordVault.VaultKeys " \
+                         "ORDER BY id;"
+            cursor = self._execute(cnx, keys_query)
+            vault_keys = cursor.fetchall()
+            self._close_cursor(cursor)
+
+        if not vault_keys:
+            return self._create_vault_key(password)
+
+        # Keys share their salt and settings, so the slow derivation runs once
+        vault_cipher = VaultCipher()
+        wrapping_keys = {}
+        for (key_id, salt, log2_n, r, p, wrapped_key) in vault_keys:
+            salt = bytes(salt)
+            kdf_params = KdfParams(log2_n, r, p)
+            if (salt, kdf_params) not in wrapping_keys:
+                wrapping_keys[(salt, kdf_params)] = derive_key(password, salt, kdf_params)
+
+            data_key = unwrap_data_key(bytes(wrapped_key), wrapping_keys[(salt, kdf_params)], salt, kdf_params)
+            vault_cipher.add_key(key_id, data_key, current=key_id == vault_keys[-1][0])
+
+        return vault_cipher
+
+    def _create_vault_key(self, password):
+        """
+        Creates the vault's first data key, wrapped with the given password,
+        and encrypts any passwords stored before encryption was added. Both
+        happen in one transaction.
+        :return: A VaultCipher holding the new key
+        """
+        data_key = generate_data_key()
+        salt, kdf_params, wrapping_key = _derive_new_wrapping_key(password)
+
+        vault_cipher = VaultCipher()
+        with self.db_pool.connection() as cnx:
+            cursor = cnx.cursor()
+            insert_key_query = "INSERT INTO PasswordVault.VaultKeys (kdfSalt, kdfLog2N, kdfR, kdfP, wrappedKey) " \
+                               "VALUES (%s, %s, %s, %s, %s);"
+            cursor.execute(self.convert_query(insert_key_query),
+                           (salt, *kdf_params, wrap_data_key(data_key, wrapping_key, salt, kdf_params)))
+            vault_cipher.add_key(cursor.lastrowid, data_key, current=True)
+
+            # Encrypt the passwords that are still stored as plain text
+            cursor.execute("SELECT id, accountName, accountPassword FROM PasswordVault.Passwords;")
+            encrypted_rows = [(vault_cipher.encrypt(_to_text(stored_password), account), password_id)
+                              for (password_id, account, stored_password) in cursor.fetchall()
+                              if get_key_id(stored_password) is None]
+
+            encrypt_query = self.convert_query("UPDATE PasswordVault.Passwords SET accountPassword = %s "
+                                               "WHERE id = %s;")
+            for chunk in chunked(encrypted_rows, BULK_CHUNK_SIZE):
+                cursor.executemany(encrypt_query, chunk)
+
+            # Commit changes
+            cnx.commit()
+            cursor.close()
+
+        return vault_cipher
+
+    def _rotate_vault_keys(self, cursor, password):
+        """
+        Wraps every data key of the vault with a key derived from the given
+        password, using a new salt and freshly calibrated settings, and adds a
+        new data key that encrypts passwords from now on. A KeyRotation marker
+        records that the stored passwords still have to be re-encrypted with
+        the new key, which key_rotation.rotate_vault_key does. The caller
+        commits the changes, then adds the returned key to the vault cipher.
+        :param cursor: cursor of the connection to update the keys on
+        :return: Tuple of the id and the data key of the new key
+        """
+        salt, kdf_params, wrapping_key = _derive_new_wrapping_key(password)
+
+        wrap_query = "UPDATE PasswordVault.VaultKeys SET kdfSalt = %s, kdfLog2N = %s, kdfR = %s, kdfP = %s, " \
+                     "wrappedKey = %s WHERE id = %s;"
+        cursor.executemany(self.convert_query(wrap_query),
+                           [(salt, *kdf_params, wrap_data_key(data_key, wrapping_key, salt, kdf_params), key_id)
+                            for (key_id, data_key) in self.vault_cipher.data_keys.items()])
+
+        # Add the new key
+        data_key = generate_data_key()
+        insert_key_query = "INSERT INTO PasswordVault.VaultKeys (kdfSalt, kdfLog2N, kdfR, kdfP, wrappedKey) " \
+                           "VALUES (%s, %s, %s, %s, %s);"
+        cursor.execute(self.convert_query(insert_key_query),
+                       (salt, *kdf_params, wrap_data_key(data_key, wrapping_key, salt, kdf_params)))
+        key_id = cursor.lastrowid
+
+        # Replace any unfinished rotation, since the new one covers every row
+        cursor.execute("DELETE FROM PasswordVault.KeyRotation;")
+        cursor.execute(self.convert_query("INSERT INTO PasswordVault.KeyRotation (targetKeyId, lastRowId) "
+                                          "VALUES (%s, 0);"), (key_id, ))
+
+        return key_id, data_key
+
+    def _make_record(self, row):
+        """
+        Returns a PasswordRecord of a row of the Passwords table, with the
+        password decrypted
+        :param row: tuple of id, account name, and encrypted password
+        """
+        return PasswordRecord(row[0], row[1], self.vault_cipher.decrypt(row[2], row[1]))
+
+    def close_connection(self):
+        """
+        Closes all pooled database connections
+        """
+        if self.db_pool is not None:
+            self.db_pool.close()
+            self.db_pool = None
+
+        self.master_password = None
+        self.vault_cipher = None
+
+    def test_default_password(self):
+        """
+        Returns True if the database user account still has the
+        default password set. Returns False if not. Once the default
+        password is known to have been changed it is not tested again,
+        which saves a connection attempt on every login.
+        :return: True if database user has default password
+        """
+        if self.default_password_changed:
+            return False
+
+        default_works = self.test_db_connection(DEFAULT_PASSWORD)
+        if default_works is False:
+            self.default_password_changed = True
+
+        return default_works
+
+    def test_db_connection(self, password):
+        """
+        Tests the given password against the database. Returns True if test
+        was successful. A return value of False indicates the given password
+        is incorrect.
+        :param password: password to connect to database
+        :return: True on success, False otherwise
+        """
+        raise NotImplementedError
+
+    def create_user(self, username, password):
+        """
+        Creates a master user with a given name, and a given password
+        :param username: name of user
+        :param password: master password
+        :return: True if account creation successful, False otherwise
+        """
+        raise NotImplementedError
+
+    def edit_master_username(self, new_username):
+        """
+        Inserts a new username into master account table
+        :return: True if successful, False otherwise
+        """
+        try:
+            with self.db_pool.connection() as cnx:
+                edit_username_query = "UPDATE PasswordVault.MasterAccount " \
+                                      "SET masterUser = %s WHERE id >= 1;"
+
+                cursor = self._execute(cnx, edit_username_query, (new_username, ))
+
+                # Commit changes
+                cnx.commit()
+                self._close_cursor(cursor)
+
+        except self.DatabaseError as err:
+            print(err)
+            return False
+        else:
+            return True
+
+    def edit_master_password(self, new_password, new_username=None):
+        """
+        Updates master account with new password, and rewraps the vault's
+        data keys with it. A new data key is added, and the stored passwords
+        are left to be re-encrypted with it by key_rotation.rotate_vault_key.
+        :param new_username: if given, the master username is changed in the same transaction
+        :return: True if successful, False otherwise
+        """
+        raise NotImplementedError
+
+    def get_key_rotation(self):
+        """
+        Returns the progress of an unfinished key rotation
+        :return: Tuple of the id of the key passwords are re-encrypted with and the
+                 last row id re-encrypted, or None if no rotation is in progress
+        """
+        with self.db_pool.connection() as cnx:
+            rotation_query = "SELECT targetKeyId, lastRowId FROM PasswordVault.KeyRotation ORDER BY id LIMIT 1;"
+            cursor = self._execute(cnx, rotation_query)
+
+            rotation = cursor.fetchone()
+            self._close_cursor(cursor)
+
+        if rotation is None:
+            return None
+        else:
+            return tuple(rotation)
+
+    def fetch_encrypted_rows(self, after_id, limit):
+        """
+        Returns rows of the Passwords table ordered by id without decrypting them
+        :param after_id: only rows with a larger id are returned
+        :param limit: maximum number of rows to return
+        :return: A list of (row id, account name, encrypted password) tuples
+        """
+        with self.db_pool.connection() as cnx:
+            fetch_query = "SELECT id, accountName, accountPassword FROM PasswordVault.Passwords " \
+                          "WHERE id > %s ORDER BY id LIMIT %s;"
+            cursor = self._execute(cnx, fetch_query, (after_id, limit))
+
+            rows = [(row_id, account, bytes(password)) for (row_id, account, password) in cursor]
+            self._close_cursor(cursor)
+
+        return rows
+
+    def save_rotated_rows(self, rows, last_row_id, target_key_id):
+        """
+        Stores a batch of re-encrypted passwords and advances the key rotation
+        marker in one transaction, so an interrupted rotation resumes after the
+        last saved batch. A row is only updated if its password has not
+        changed since it was read. Nothing is saved if a newer master password
+        change replaced the rotation.
+        :param rows: iterable of (new encrypted password, row id, old encrypted password) tuples
+        :param last_row_id: largest row id of the batch
+        :param target_key_id: id of the key the rows were re-encrypted with
+        :return: Number of rows updated if successful, None if the rotation was replaced,
+                 False otherwise
+        """
+        try:
+            with self.db_pool.connection() as cnx:
+                cursor = cnx.cursor()
+                rotate_query = self.convert_query("UPDATE PasswordVault.Passwords SET accountPassword = %s "
+                                                  "WHERE id = %s AND accountPassword = %s;")
+
+                # Rows deleted or changed since they were read are not updated, so are not counted
+                rotated_count = 0
+                for chunk in chunked(rows, BULK_CHUNK_SIZE):
+                    cursor.executemany(rotate_query, chunk)
+                    rotated_count += cursor.rowcount
+
+                marker_query = "UPDATE PasswordVault.KeyRotation SET lastRowId = %s WHERE targetKeyId = %s;"
+                cursor.execute(self.convert_query(marker_query), (last_row_id, target_key_id))
+                if cursor.rowcount == 0:
+                    cnx.rollback()
+                    cursor.close()
+                    return None
+
+                # Commit changes
+                cnx.commit()
+                cursor.close()
+
+        except self.DatabaseError as err:
+            print(err)
+            return False
+        else:
+            return rotated_count
+
+    def finish_key_rotation(self, target_key_id):
+        """
+        Deletes the data keys replaced by a finished key rotation and its
+        marker. Nothing is deleted if a newer master password change replaced
+        the rotation, since the newer rotation still needs those keys. The
+        vault cipher keeps the deleted keys until the vault is closed, since
+        a read on another thread may still return rows encrypted with them.
+        :param target_key_id: id of the key every password is now encrypted with
+        :return: True if successful, False otherwise
+        """
+        try:
+            with self.db_pool.connection() as cnx:
+                cursor = cnx.cursor()
+                cursor.execute(self.convert_query("DELETE FROM PasswordVault.KeyRotation WHERE targetKeyId = %s;"),
+                               (target_key_id, ))
+                if cursor.rowcount == 1:
+                    cursor.execute(self.convert_query("DELETE FROM PasswordVault.VaultKeys WHERE id < %s;"),
+                                   (target_key_id, ))
+
+                # Commit changes
+                cnx.commit()
+                cursor.close()
+
+        except self.DatabaseError as err:
+            print(err)
+            return False
+        else:
+            return True
+
+    def get_master_username(self):
+        """
+        Returns the name of the master account username
+        :return: Master account username or None if not exists
+        """
+        with self.db_pool.connection() as cnx:
+            username_query = "SELECT masterUser FROM PasswordVault.MasterAccount;"
+            cursor = self._execute(cnx, username_query)
+
+            master_username = cursor.fetchone()
+            self._close_cursor(cursor)
+
+        if master_username is None:
+            return None
+        else:
+            return master_username[0]
+
+    def fetch_all_passwords(self):
+        """
+        Executes a query to get all passwords from the database and
+        returns the result set. The records have the following fields:
+        'row_id', 'account', 'password'.
+        :return: A list of PasswordRecord objects of the results
+        """
+        with self.db_pool.connection() as cnx:
+            fetch_all_query = "SELECT id, accountName, accountPassword FROM PasswordVault.Passwords " \
+                              "ORDER BY accountName, id;"
+            cursor = self._execute(cnx, fetch_all_query)
+
+            # Store all results in a list of records
+            result_set = [self._make_record(row) for row in cursor]
+
+            self._close_cursor(cursor)
+
+        return result_set
+
+    def iter_passwords(self, page_size=PAGE_SIZE, after_account=None, after_id=None, summaries_only=False):
+        """
+        Generator that streams all passwords ordered by account name, one page
+        at a time. Each page is a separate keyset query that starts after the
+        last row of the previous page, so memory use is bounded by the page
+        size and the pooled connection is returned between pages. Yields
+        the same records as fetch_all_passwords.
+        :param page_size: maximum number of rows fetched per query
+        :param after_account: if given, only rows after this account name are returned
+        :param after_id: if given with after_account, rows with the same account name
+                         and a larger id are also returned
+        :param summaries_only: if True, only the length of each password is fetched
+        :return: A generator of PasswordRecord objects of the results, or of
+                 PasswordSummary objects if summaries_only is True
+        """
+        while True:
+            page = self._fetch_password_page(page_size, after_account, after_id, summaries_only)
+            yield from page
+
+            if len(page) < page_size:
+                return
+
+            # Start the next page after the last row of this page
+            after_account = page[-1].account
+            after_id = page[-1].row_id
+
+    def iter_password_pages(self, page_size=PAGE_SIZE, summaries_only=False):
+        """
+        Generator that streams all passwords ordered by account name as lists
+        of at most page_size rows
+        :param page_size: maximum number of rows per page
+        :param summaries_only: if True, only the length of each password is fetched
+        :return: A generator of lists of PasswordRecord objects of the results, or
+                 of PasswordSummary objects if summaries_only is True
+        """
+        page = []
+        for record in self.iter_passwords(page_size, summaries_only=summaries_only):
+            page.append(record)
+            if len(page) == page_size:
+                yield page
+                page = []
+
+        if page:
+            yield page
+
+    def iter_password_snapshot(self, batch_size=PAGE_SIZE, after_id=0):
+        """
+        Generator that streams all passwords ordered by id from a single query,
+        as lists of at most batch_size rows. Rows are fetched from the cursor as
+        they are needed, so memory use is bounded by the batch size, and every
+        row comes from the same consistent snapshot of the table. The pooled
+        connection is held until the generator finishes.
+        :param batch_size: maximum number of rows per list
+        :param after_id: only rows with a greater id are streamed
+        :return: A generator of lists of PasswordRecord objects of the results
+        """
+        with self.db_pool.connection() as cnx:
+            cursor = cnx.cursor()
+            snapshot_query = "SELECT id, accountName, accountPassword FROM PasswordVault.Passwords " \
+                             "WHERE id > %s ORDER BY id;"
+            cursor.execute(self.convert_query(snapshot_query), (after_id, ))
+
+            try:
+                rows = cursor.fetchmany(batch_size)
+                while rows:
+                    yield [self._make_record(row) for row in rows]
+                    rows = cursor.fetchmany(batch_size)
+            finally:
+                cursor.close()
+
+    def _fetch_password_page(self, page_size, after_account, after_id, summaries_only=False):
+        """
+        Executes a keyset query for the page of passwords that follows the given
+        account name and id. Rows are read from the cursor as the database
+        returns them.
+        :param summaries_only: if True, the encrypted passwords are not fetched
+        :return: A list of at most page_size PasswordRecord objects, or
+                 PasswordSummary objects if summaries_only is True
+        """
+        select_query, make_row = self._get_select_query(summaries_only)
+        order_query = "ORDER BY accountName, id LIMIT %s;"
+
+        # Build the keyset condition for rows after the given position
+        if after_account is None:
+            page_query = select_query + order_query
+            query_params = (page_size, )
+        elif after_id is None:
+            page_query = select_query + "WHERE accountName > %s " + order_query
+            query_params = (after_account, page_size)
+        else:
+            page_query = select_query + "WHERE accountName > %s OR (accountName = %s AND id > %s) " + order_query
+            query_params = (after_account, after_account, after_id, page_size)
+
+        with self.db_pool.connection() as cnx:
+            cursor = self._execute(cnx, page_query, query_params)
+
+            page = [make_row(row) for row in cursor]
+
+            self._close_cursor(cursor)
+
+        return page
+
+    def fetch_password(self, password_id):
+        """
+        Fetches and decrypts a single password
+        :param password_id: The row id of the password
+        :return: A PasswordRecord of the row, or None if no row has the given id
+        """
+        with self.db_pool.connection() as cnx:
+            fetch_query = "SELECT id, accountName, accountPassword FROM PasswordVault.Passwords WHERE id = %s;"
+            cursor = self._execute(cnx, fetch_query, (password_id, ))
+
+            row = cursor.fetchone()
+            self._close_cursor(cursor)
+
+        if row is None:
+            return None
+        else:
+            return self._make_record(row)
+
+    def fetch_passwords(self, password_ids, chunk_size=BULK_CHUNK_SIZE):
+        """
+        Fetches and decrypts the passwords with the given row ids, one SELECT
+        statement per chunk of ids
+        :param password_ids: iterable of password row ids
+        :param chunk_size: number of ids per SELECT statement
+        :return: A list of PasswordRecord objects of the rows that exist
+        """
+        result_set = []
+        with self.db_pool.connection() as cnx:
+            cursor = cnx.cursor()
+            for chunk in chunked(password_ids, chunk_size):
+                fetch_query = "SELECT id, accountName, accountPassword FROM PasswordVault.Passwords WHERE id IN (" + \
+                              ", ".join(["%s"] * len(chunk)) + ");"
+                cursor.execute(self.convert_query(fetch_query), chunk)
+                result_set.extend(self._make_record(row) for row in cursor.fetchall())
+
+            cursor.close()
+
+        return result_set
+
+    def fetch_password_versions(self):
+        """
+        Fetches the row id, account name, and password version of every row
+        without decrypting any password, so callers can find the rows whose
+        password changed since they last read them
+        :return: A list of PasswordVersion objects
+        """
+        with self.db_pool.connection() as cnx:
+            versions_query = "SELECT id, accountName, SUBSTR(accountPassword, 1, " + str(CIPHERTEXT_START) + ") " \
+                             "FROM PasswordVault.Passwords;"
+            cursor = self._execute(cnx, versions_query)
+
+            result_set = [PasswordVersion(row[0], row[1], bytes(row[2])) for row in cursor]
+
+            self._close_cursor(cursor)
+
+        return result_set
+
+    def _get_select_query(self, summaries_only):
+        """
+        Returns the start of a query selecting password rows, up to the WHERE
+        clause, and the function that turns each result row into an object
+        :param summaries_only: if True, the encrypted passwords are not fetched
+        """
+        if summaries_only:
+            select_query = "SELECT id, accountName, LENGTH(accountPassword) - " + str(CIPHERTEXT_OVERHEAD) + \
+                           " FROM PasswordVault.Passwords "
+            return select_query, PasswordSummary._make
+
+        return "SELECT id, accountName, accountPassword FROM PasswordVault.Passwords ", self._make_record
+
+    def search_passwords(self, search_text, limit=SEARCH_LIMIT, prefix_only=False, summaries_only=False):
+        """
+        Returns the passwords whose account name contains the given text,
+        ordered by account name. Prefix searches are answered from the
+        accountName index. Matching ignores case.
+        :param search_text: text to search account names for
+        :param limit: maximum number of rows to return
+        :param prefix_only: if True, only account names starting with the text match
+        :param summaries_only: if True, the encrypted passwords are not fetched
+        :return: A list of at most limit PasswordRecord objects, or
+                 PasswordSummary objects if summaries_only is True
+        """
+
+        # Escape LIKE wildcards so they are matched literally
+        escaped_text = search_text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        if prefix_only:
+            search_pattern = escaped_text + "%"
+        else:
+            search_pattern = "%" + escaped_text + "%"
+
+        select_query, make_row = self._get_select_query(summaries_only)
+        with self.db_pool.connection() as cnx:
+            search_query = select_query + "WHERE accountName LIKE %s" + self.LIKE_ESCAPE + \
+                           " ORDER BY accountName, id LIMIT %s;"
+            cursor = self._execute(cnx, search_query, (search_pattern, limit))
+
+            result_set = [make_row(row) for row in cursor]
+            self._close_cursor(cursor)
+
+        return result_set
+
+    def add_new_password(self, account, password):
+        """
+        Adds a new password with the given account name and password
+        to the database
+        :param account: account name to add
+        :param password: password to add
+        :return: Row id of the new password if add successful, False otherwise
+        """
+        try:
+            with self.db_pool.connection() as cnx:
+                insert_query = "INSERT INTO PasswordVault.Passwords (accountName, accountPassword) " \
+                               "VALUES (%s, %s);"
+                cursor = self._execute(cnx, insert_query, (account, self.vault_cipher.encrypt(password, account)))
+                new_password_id = cursor.lastrowid
+
+                # Commit changes
+                cnx.commit()
+                self._close_cursor(cursor)
+
+        except self.DatabaseError as err:
+            print(err)
+            return False
+        else:
+            return new_password_id
+
+    def delete_password(self, password_id):
+        """
+        Deletes the password in the database with the given id
+        :param password_id: The row id of the password
+        :return: Row id of the deleted password if deletion successful, False otherwise
+        """
+        try:
+            with self.db_pool.connection() as cnx:
+                delete_query = "DELETE FROM PasswordVault.Passwords WHERE id = %s;"
+                cursor = self._execute(cnx, delete_query, (password_id, ))
+
+                # Commit changes
+                cnx.commit()
+                self._close_cursor(cursor)
+
+        except self.DatabaseError as err:
+            print(err)
+            return False
+        else:
+            return password_id
+
+    def edit_password(self, password_id, account, password):
+        """
+        Updates the password with the given password ID with the given
+        account name and password
+        :param password_id: ID of password to change
+        :param account: new account name
+        :param password: new password
+        :return: Row id of the edited password if edit successful, False otherwise
+        """
+        try:
+            with self.db_pool.connection() as cnx:
+                edit_query = "UPDATE PasswordVault.Passwords SET accountName = %s, " \
+                             "accountPassword = %s WHERE id = %s;"
+                cursor = self._execute(cnx, edit_query,
+                                       (account, self.vault_cipher.encrypt(password, account), password_id))
+
+                # Commit changes
+                cnx.commit()
+                self._close_cursor(cursor)
+
+        except self.DatabaseError as err:
+            print(err)
+            return False
+        else:
+            return password_id
+
+    def add_passwords_bulk(self, entries, chunk_size=BULK_CHUNK_SIZE):
+        """
+        Adds many passwords in a single transaction. Each chunk of entries is
+        written with one executemany call, and the transaction is only
+        committed once every chunk has been written.
+        :param entries: iterable of (account, password) pairs
+        :param chunk_size: number of rows per executemany call
+        :return: Number of passwords added if successful, False otherwise
+        """
+        try:
+            with self.db_pool.connection() as cnx:
+                cursor = cnx.cursor()
+                insert_query = self.convert_query("INSERT INTO PasswordVault.Passwords (accountName, accountPassword) "
+                                                  "VALUES (%s, %s);")
+
+                added_count = 0
+                for chunk in chunked(entries, chunk_size):
+                    cursor.executemany(insert_query, [(account, self.vault_cipher.encrypt(password, account))
+                                                      for (account, password) in chunk])
+                    added_count += len(chunk)
+
+                # Commit changes
+                cnx.commit()
+                cursor.close()
+
+        except self.DatabaseError as err:
+            print(err)
+            return False  # Uncommitted chunks are rolled back when the connection is released
+        else:
+            return added_count
+
+    def edit_passwords_bulk(self, entries, chunk_size=BULK_CHUNK_SIZE):
+        """
+        Updates many passwords in a single transaction, running one prepared
+        UPDATE statement for every entry
+        :param entries: iterable of (password_id, account, password) tuples
+        :param chunk_size: number of rows per executemany call
+        :return: Number of entries processed if successful, False otherwise
+        """
+        try:
+            with self.db_pool.connection() as cnx:
+                cursor = cnx.cursor()
+                edit_query = self.convert_query("UPDATE PasswordVault.Passwords SET accountName = %s, "
+                                                "accountPassword = %s WHERE id = %s;")
+
+                edited_count = 0
+                for chunk in chunked(entries, chunk_size):
+                    cursor.executemany(edit_query, [(account, self.vault_cipher.encrypt(password, account), password_id)
+                                                    for (password_id, account, password) in chunk])
+                    edited_count += len(chunk)
+
+                # Commit changes
+                cnx.commit()
+                cursor.close()
+
+        except self.DatabaseError as err:
+            print(err)
+            return False
+        else:
+            return edited_count
+
+    def delete_passwords_bulk(self, password_ids, chunk_size=BULK_CHUNK_SIZE):
+        """
+        Deletes many passwords in a single transaction, one DELETE statement
+        per chunk of ids
+        :param password_ids: iterable of password row ids
+        :param chunk_size: number of ids per DELETE statement
+        :return: Number of passwords deleted if successful, False otherwise
+        """
+        try:
+            with self.db_pool.connection() as cnx:
+                cursor = cnx.cursor()
+
+                deleted_count = 0
+                for chunk in chunked(password_ids, chunk_size):
+                    delete_query = "DELETE FROM PasswordVault.Passwords WHERE id IN (" + \
+                                   ", ".join(["%s"] * len(chunk)) + ");"
+                    cursor.execute(self.convert_query(delete_query), chunk)
+                    deleted_count += cursor.rowcount
+
+                # Commit changes
+                cnx.commit()
+                cursor.close()
+
+        except self.DatabaseError as err:
+            print(err)
+            return False
+        else:
+            return deleted_count
+
+
+def chunked(iterable, chunk_size):
+    """
+    Generator that splits the given iterable into lists of at most chunk_size items
+    """
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _derive_new_wrapping_key(password):
+    """
+    Derives a key for wrapping data keys from the given password, with a new
+    salt and KDF settings calibrated to take about KDF_TARGET_SECONDS
+    :return: Tuple of the salt, the KdfParams, and the derived key
+    """
+    salt = os.urandom(SALT_SIZE)
+    kdf_params = calibrate_kdf()
+    return salt, kdf_params, derive_key(password, salt, kdf_params)
+
+
+def _to_text(password):
+    """
+    Returns a password stored as plain text as a string. Drivers return
+    binary columns as bytes.
+    """
+    if isinstance(password, (bytes, bytearray)):
+        return bytes(password).decode("utf-8")
+    return password
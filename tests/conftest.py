@@ -0,0 +1,9 @@
+# Author: Ian Docherty
+# Description: Makes the application modules importable from the tests and runs
+#              Qt without a display.
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
@@ -0,0 +1,39 @@
+# Author: Ian Docherty
+# Description: Tests that DatabaseTaskRunner can drop queued operations when the
+#              app closes.
+
+import threading
+import unittest
+from db_worker import DatabaseTaskRunner
+from PyQt5.QtWidgets import QApplication
+
+
+class DatabaseTaskRunnerTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.app = QApplication.instance() or QApplication([])
+
+    def test_cancel_queued(self):
+        task_runner = DatabaseTaskRunner()
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        def blocking_task():
+            started.set()
+            release.wait(5)
+            calls.append("running")
+
+        task_runner.run(blocking_task)
+        task_runner.run(calls.append, "queued")
+        self.assertTrue(started.wait(5))
+
+        task_runner.cancel_queued()
+        release.set()
+        task_runner.wait_for_done()
+        self.assertEqual(calls, ["running"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+# Author: Ian Docherty
+# Description: Tests stopping, replacing, and counting key rotations on an SQLite vault.
+
+import pytest
+from key_rotation import rotate_vault_key
+from sqlite_vault_connection import SQLiteVaultConnection
+
+# Number of passwords stored in each test vault, and rows per rotation batch
+PASSWORD_COUNT = 50
+BATCH_SIZE = 10
+
+
+@pytest.fixture
+def vault_cnx(tmp_path):
+    """
+    Returns a connected SQLite vault whose master password was just changed,
+    so every stored password still has to be re-encrypted
+    """
+    vault_cnx = SQLiteVaultConnection(str(tmp_path / "vault.db"))
+    vault_cnx.create_user("owner", "first")
+    assert vault_cnx.connect_to_db("first")
+    vault_cnx.add_passwords_bulk([("account%02d" % i, "Password%02d!" % i) for i in range(PASSWORD_COUNT)])
+    assert vault_cnx.edit_master_password("second")
+
+    yield vault_cnx
+    vault_cnx.close_connection()
+
+
+def get_passwords(vault_cnx):
+    return [record.password for record in vault_cnx.fetch_all_passwords()]
+
+
+def test_rotation_counts_only_updated_rows(vault_cnx):
+    fetch_encrypted_rows = vault_cnx.fetch_encrypted_rows
+    deleted_ids = []
+
+    # Delete a row after it is read but before its batch is saved
+    def fetch_then_delete(after_id, limit):
+        rows = fetch_encrypted_rows(after_id, limit)
+        if rows and not deleted_ids:
+            deleted_ids.append(rows[0][0])
+            assert vault_cnx.delete_password(rows[0][0])
+        return rows
+
+    vault_cnx.fetch_encrypted_rows = fetch_then_delete
+    assert rotate_vault_key(vault_cnx, batch_size=BATCH_SIZE, max_workers=1) == PASSWORD_COUNT - 1
+    assert vault_cnx.get_key_rotation() is None
+
+
+def test_stopped_rotation_resumes_after_last_saved_batch(vault_cnx):
+    passwords = get_passwords(vault_cnx)
+    saved_batches = []
+    save_rotated_rows = vault_cnx.save_rotated_rows
+
+    def save_and_count(rows, last_row_id, target_key_id):
+        saved_batches.append(last_row_id)
+        return save_rotated_rows(rows, last_row_id, target_key_id)
+
+    vault_cnx.save_rotated_rows = save_and_count
+    assert rotate_vault_key(vault_cnx, batch_size=BATCH_SIZE, max_workers=1,
+                            should_stop=lambda: len(saved_batches) == 2) is None
+    assert vault_cnx.get_key_rotation()[1] == saved_batches[-1]
+
+    assert rotate_vault_key(vault_cnx, batch_size=BATCH_SIZE, max_workers=1) == PASSWORD_COUNT - 2 * BATCH_SIZE
+    assert vault_cnx.get_key_rotation() is None
+    assert get_passwords(vault_cnx) == passwords
+
+
+def test_replaced_rotation_keeps_newer_marker_and_keys(vault_cnx):
+    passwords = get_passwords(vault_cnx)
+    save_rotated_rows = vault_cnx.save_rotated_rows
+
+    # Change the master password again while the first rotation is running
+    def change_password_then_save(rows, last_row_id, target_key_id):
+        assert vault_cnx.edit_master_password("third")
+        vault_cnx.save_rotated_rows = save_rotated_rows
+        return save_rotated_rows(rows, last_row_id, target_key_id)
+
+    vault_cnx.save_rotated_rows = change_password_then_save
+    assert rotate_vault_key(vault_cnx, batch_size=BATCH_SIZE, max_workers=1) is None
+    assert vault_cnx.get_key_rotation()[1] == 0
+
+    assert rotate_vault_key(vault_cnx, batch_size=BATCH_SIZE, max_workers=1) == PASSWORD_COUNT
+    assert vault_cnx.get_key_rotation() is None
+    assert get_passwords(vault_cnx) == passwords
+
+    # Only the newest key is left once the vault is reopened
+    vault_cnx.close_connection()
+    assert vault_cnx.connect_to_db("third")
+    assert len(vault_cnx.vault_cipher.data_keys) == 1
+    assert get_passwords(vault_cnx) == passwords
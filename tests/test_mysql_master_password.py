@@ -0,0 +1,89 @@
+# Author: Ian Docherty
+# Description: Tests that VaultConnection.edit_master_password passes passwords
+#              containing quotes to MySQL as query parameters.
+
+import mysql.connector
+from contextlib import contextmanager
+from password_db_connector import VaultConnection
+from vault_crypto import VaultCipher
+
+# Passwords that break a statement built by pasting them between quotes
+OLD_PASSWORD = "old'pass\\"
+NEW_PASSWORD = "it's'; DROP USER root; --"
+
+
+class FakeCursor:
+    """
+    Records the statements executed on it
+    """
+
+    def __init__(self, statements):
+        self.statements = statements
+
+    def execute(self, query, params=()):
+        self.statements.append((query, params))
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    """
+    Connection handing out FakeCursors and recording rollbacks
+    """
+
+    def __init__(self):
+        self.statements = []
+        self.rolled_back = False
+
+    def cursor(self):
+        return FakeCursor(self.statements)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        self.rolled_back = True
+
+
+class FakePool:
+    """
+    Connection pool with a single FakeConnection
+    """
+
+    def __init__(self):
+        self.cnx = FakeConnection()
+
+    @contextmanager
+    def connection(self):
+        yield self.cnx
+
+
+def make_vault_connection(monkeypatch, rotate_vault_keys):
+    vault_cnx = VaultConnection()
+    vault_cnx.db_pool = FakePool()
+    vault_cnx.master_password = OLD_PASSWORD
+    vault_cnx.vault_cipher = VaultCipher()
+    monkeypatch.setattr(vault_cnx, "_rotate_vault_keys", rotate_vault_keys)
+    return vault_cnx
+
+
+def test_new_password_is_a_query_parameter(monkeypatch):
+    vault_cnx = make_vault_connection(monkeypatch, lambda cursor, password: (2, bytes(32)))
+
+    assert vault_cnx.edit_master_password(NEW_PASSWORD)
+    assert vault_cnx.db_pool.cnx.statements == [("SET PASSWORD = %s;", (NEW_PASSWORD, ))]
+    assert vault_cnx.master_password == NEW_PASSWORD
+
+
+def test_old_password_is_restored_as_a_query_parameter(monkeypatch):
+    def fail_to_rotate(cursor, password):
+        raise mysql.connector.Error("lost connection")
+
+    vault_cnx = make_vault_connection(monkeypatch, fail_to_rotate)
+
+    assert not vault_cnx.edit_master_password(NEW_PASSWORD)
+    assert vault_cnx.db_pool.cnx.rolled_back
+    assert vault_cnx.db_pool.cnx.statements == [("SET PASSWORD = %s;", (NEW_PASSWORD, )),
+                                                ("SET PASSWORD = %s;", (OLD_PASSWORD, ))]
+    assert vault_cnx.master_password == OLD_PASSWORD
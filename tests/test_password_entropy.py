@@ -0,0 +1,26 @@
+# Author: Ian Docherty
+# Description: Tests that batch scoring matches scoring passwords one at a time.
+
+import password_entropy
+import pytest
+from password_entropy import CHARSET_MODE, PATTERN_MODE, get_entropy, get_entropy_batch
+
+# Passwords covering every character set, patterns, non-ASCII characters, and the empty string
+PASSWORDS = ["", "a", "password", "Password1", "P@ssw0rd!", "qwertyuiop", "aaaaaaaa", "abcdef123456",
+             "19/04/1987", "xK7$mQ2~vL9%", "crème brûlée", "日本語パスワード", "Tr0ub4dor&3", "correcthorsebattery"]
+
+
+@pytest.mark.parametrize("mode", [CHARSET_MODE, PATTERN_MODE])
+def test_batch_matches_get_entropy(mode):
+    assert get_entropy_batch(PASSWORDS, mode) == [get_entropy(password, mode) for password in PASSWORDS]
+
+
+@pytest.mark.parametrize("mode", [CHARSET_MODE, PATTERN_MODE])
+def test_batch_without_numpy_matches_get_entropy(monkeypatch, mode):
+    monkeypatch.setattr(password_entropy, "numpy", None)
+    assert get_entropy_batch(PASSWORDS, mode) == [get_entropy(password, mode) for password in PASSWORDS]
+
+
+def test_batch_rejects_unknown_mode():
+    with pytest.raises(ValueError):
+        get_entropy_batch(PASSWORDS, "unknown")
@@ -0,0 +1,34 @@
+# Author: Ian Docherty
+# Description: Tests the dictionary view of a PasswordRecord.
+
+import pytest
+from storage_backend import PasswordRecord
+
+
+def test_as_dict_reads_fields_by_name():
+    record = PasswordRecord(7, "mail", "secret")
+    view = record.as_dict()
+
+    assert view["row_id"] == 7
+    assert view["account"] == "mail"
+    assert view["password"] == "secret"
+    assert view.get("missing") is None
+    assert list(view) == ["row_id", "account", "password"]
+    assert dict(view) == {"row_id": 7, "account": "mail", "password": "secret"}
+
+
+def test_as_dict_is_read_only():
+    view = PasswordRecord(7, "mail", "secret").as_dict()
+
+    with pytest.raises(KeyError):
+        view["username"]
+    with pytest.raises(TypeError):
+        view["account"] = "other"
+
+
+def test_record_stays_a_compact_tuple():
+    record = PasswordRecord(7, "mail", "secret")
+
+    assert record.account == "mail"
+    assert tuple(record) == (7, "mail", "secret")
+    assert not hasattr(record, "__dict__")
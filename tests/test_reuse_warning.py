@@ -0,0 +1,59 @@
+# Author: Ian Docherty
+# Description: Tests the reuse warnings of the main screen while the table has
+#              not loaded every row the reuse detector knows.
+
+import unittest
+from types import SimpleNamespace
+from storage_backend import PasswordSummary
+from user_interface import MainScreen
+
+
+class FakeReuseDetector:
+    """
+    Reuse detector returning fixed row ids
+    """
+
+    def __init__(self, reused_ids=(), similar_ids=()):
+        self.reused_ids = set(reused_ids)
+        self.similar_ids = set(similar_ids)
+
+    def find_reused(self, password, exclude_id=None):
+        return self.reused_ids - {exclude_id}
+
+    def find_similar(self, password, exclude_id=None):
+        return self.similar_ids - {exclude_id}
+
+
+def make_main_screen(reuse_detector, loaded_rows):
+    """
+    Returns a stand-in for a MainScreen whose table has loaded the given rows
+    """
+    main_screen = SimpleNamespace(reuse_detector=reuse_detector,
+                                  password_model=SimpleNamespace(records_by_id={row.row_id: row
+                                                                                for row in loaded_rows}))
+    main_screen.get_account_names = lambda row_ids: MainScreen.get_account_names(main_screen, row_ids)
+    return main_screen
+
+
+class ReuseWarningTest(unittest.TestCase):
+
+    def test_similar_row_not_loaded(self):
+        main_screen = make_main_screen(FakeReuseDetector(similar_ids=[7]), [])
+        self.assertEqual(MainScreen.get_reuse_warning(main_screen, "password1"),
+                         "This password is similar to the one used for 1 other account.")
+
+    def test_reused_rows_partly_loaded(self):
+        main_screen = make_main_screen(FakeReuseDetector(reused_ids=[1, 2, 3]),
+                                       [PasswordSummary(1, "mail", 9), PasswordSummary(2, "bank", 9)])
+        self.assertEqual(MainScreen.get_reuse_warning(main_screen, "password1"),
+                         "This password is also used for bank, mail and 1 more.")
+
+    def test_reused_rows_loaded(self):
+        main_screen = make_main_screen(FakeReuseDetector(reused_ids=[1, 2, 3, 4]),
+                                       [PasswordSummary(row_id, "acct" + str(row_id), 9) for row_id in range(1, 5)])
+        self.assertEqual(MainScreen.get_reuse_warning(main_screen, "password1", exclude_id=4),
+                         "This password is also used for acct1, acct2, acct3.")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -3,22 +3,55 @@
 #              password vault graphical user interface.
 
 import password_entropy
-import threading
-import time
 import pyperclip
-import rpyc
-from password_db_connector import VaultConnection
+from account_index import AccountIndex, account_matches, TRIGRAM_LENGTH
+from bisect import bisect_left, bisect_right, insort
+from db_worker import DatabaseTaskRunner
+from password_audit import PasswordAuditor, STRENGTH_CATEGORIES
+from password_db_connector import get_vault_connection
+from password_generator import GeneratorUnavailableError, get_password_generator
+from key_rotation import rotate_vault_key
+from password_importer import import_passwords
+from reuse_detector import ReuseDetector
+from storage_backend import PasswordSummary, SEARCH_LIMIT
+from vault_backup import BACKUP_FILE_EXTENSION, export_backup, restore_backup
 from PyQt5 import QtCore
 from PyQt5.QtGui import QIcon, QPixmap, QFont
 from PyQt5.QtWidgets import QApplication, QMainWindow, QWidget, QStackedWidget, QPushButton, \
-    QLabel, QVBoxLayout, QLineEdit, QHBoxLayout, QTableWidget, QTableWidgetItem, \
-    QCheckBox, QSpinBox, QMessageBox, QProgressBar, QMenu, QAction
+    QLabel, QVBoxLayout, QLineEdit, QHBoxLayout, QTableView, QHeaderView, QStyledItemDelegate, \
+    QStyleOptionButton, QStyle, QCheckBox, QSpinBox, QMessageBox, QProgressBar, QMenu, QAction, \
+    QTableWidget, QTableWidgetItem, QFileDialog, QInputDialog
 
-# Constants for allowed characters
-LOWERS = "abcdefghijklmnopqrstuvwxyz"
-UPPERS = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
-NUMBERS = '1234567890'
-SPECIALS = '@%+!$?~'
+# Status bar message shown while database operations are in flight
+WORKING_MESSAGE = "Working..."
+
+# Filters matching more than 1 / FILTER_SCAN_RATIO of the rows are applied by scanning every row
+FILTER_SCAN_RATIO = 8
+
+# Milliseconds to wait after the last keystroke before searching the database
+# for accounts that have not been loaded yet
+SEARCH_DELAY = 300
+
+# Milliseconds to wait after the last keystroke before estimating password strength
+STRENGTH_DEBOUNCE_MS = 150
+
+# File types offered when importing passwords
+IMPORT_FILE_FILTER = "Password exports (*.csv *.jsonl *.xml);;CSV files (*.csv);;" \
+                     "JSON Lines files (*.jsonl);;KeePass XML files (*.xml)"
+
+# File types offered when exporting and restoring backups
+BACKUP_FILE_FILTER = "PasswordVault backups (*" + BACKUP_FILE_EXTENSION + ")"
+
+# Milliseconds a copied password stays on the clipboard
+CLIPBOARD_CLEAR_MS = 15000
+
+# Most account names listed in a password reuse warning
+MAX_REUSE_ACCOUNTS_SHOWN = 3
+
+# Results of a login attempt
+LOGIN_SUCCESSFUL = "successful"
+LOGIN_FAILED = "failed"
+LOGIN_NO_ACCOUNT = "no account"
 
 
 class MainWindow(QMainWindow):
@@ -34,8 +67,30 @@ class MainWindow(QMainWindow):
         """
         super().__init__()
 
-        # Create VaultConnection object
-        self.vault_cnx = VaultConnection()
+        # Create vault connection object and a runner to use it off the GUI thread
+        self.vault_cnx = get_vault_connection()
+        self.db_tasks = DatabaseTaskRunner(self.show_database_error, self)
+        self.db_tasks.busy_changed.connect(self.show_busy_state)
+
+        # Create a second runner, with its own pooled connection, for the reuse detector's
+        # passes over the vault, so copying and editing passwords never wait behind them
+        self.reuse_tasks = DatabaseTaskRunner(self.show_database_error, self)
+
+        # Create a runner for searches made while the passwords are still loading
+        self.search_tasks = DatabaseTaskRunner(self.show_database_error, self)
+
+        # Create a runner for password strength audits, which can take seconds to score a large vault
+        self.audit_tasks = DatabaseTaskRunner(self.show_database_error, self)
+
+        # Create a runner for key rotations, which re-encrypt every stored password after a master password change
+        self.rotation_tasks = DatabaseTaskRunner(self.show_database_error, self)
+        self.closing = False  # Set when the app closes, so long-running tasks stop early
+
+        # Create the clipboard manager that clears copied passwords
+        self.clipboard_manager = ClipboardManager(self)
+
+        # Create the password generator used by the add and edit screens
+        self.password_generator = get_password_generator()
 
         # Create a menu bar object
         self.account_menu = QMenu("Account Settings")
@@ -51,8 +106,7 @@ class MainWindow(QMainWindow):
         self.login_screen_widget.create_account_button.clicked.connect(self.go_to_create_account_screen)
 
         # If default password already changed, disable create account button
-        if not self.vault_cnx.test_default_password():
-            self.login_screen_widget.create_account_button.setEnabled(False)
+        self.db_tasks.run(self.vault_cnx.test_default_password, on_result=self.set_create_account_button_state)
 
         # Create a CreateAccountScreen object and define button slots
         self.create_account_screen_widget = CreateAccountScreen()
@@ -63,6 +117,7 @@ class MainWindow(QMainWindow):
         self.add_password_screen_widget = None
         self.edit_password_screen_widget = None
         self.edit_master_account_screen_widget = None
+        self.audit_screen_widget = None
 
         # Add all screen widgets to stacked widget indexes
         self.central_widget.addWidget(self.login_screen_widget)  # Index 0
@@ -77,10 +132,57 @@ class MainWindow(QMainWindow):
         self.statusBar().showMessage("Ready")
         self.show()
 
+    def stop_background_tasks(self):
+        """
+        Stops the database work still in flight when the app closes. Queued
+        reuse detector passes, searches, audits, and key rotations are dropped,
+        running ones stop at their next page or batch, and queued changes on
+        the database thread are finished. Returns once every runner is idle, so no thread still holds
+        decrypted passwords or a connection when the vault is closed.
+        """
+        self.closing = True
+        background_runners = [self.reuse_tasks, self.search_tasks, self.audit_tasks, self.rotation_tasks]
+        for task_runner in background_runners:
+            task_runner.cancel_queued()
+
+        for task_runner in [self.db_tasks] + background_runners:
+            task_runner.wait_for_done()
+
+    def show_busy_state(self, busy):
+        """
+        Shows a busy cursor and status message while database operations are
+        running, and restores them once all operations have finished
+        """
+        if busy:
+            QApplication.setOverrideCursor(QtCore.Qt.BusyCursor)
+            self.statusBar().showMessage(WORKING_MESSAGE)
+        else:
+            QApplication.restoreOverrideCursor()
+
+            # Keep any message that a finished operation displayed
+            if self.statusBar().currentMessage() == WORKING_MESSAGE:
+                self.statusBar().showMessage("Ready")
+
+    def show_database_error(self, err):
+        """
+        Displays an unexpected database error in the status bar
+        """
+        self.statusBar().showMessage("Database error: " + str(err))
+
+    def set_create_account_button_state(self, has_default_password):
+        """
+        Disables the create account button if the default password was already changed
+        """
+        if not has_default_password:
+            self.login_screen_widget.create_account_button.setEnabled(False)
+
     def go_to_login_screen(self):
         """
-        Clears any password input and shows login screen
+        Clears any password input and copied password, closes any open
+        database connections, and shows login screen
         """
+        self.clipboard_manager.clear()
+        self.db_tasks.run(self.vault_cnx.close_connection)
         self.menuBar().clear()
         self.reset_login_screen()
 
@@ -92,31 +194,72 @@ class MainWindow(QMainWindow):
 
     def attempt_to_login(self):
         """
-        Attempts to login to master account. Displays message if attempt fails.
+        Attempts to login to master account on the database thread. Displays
+        message if attempt fails.
         """
+        password = self.login_screen_widget.password_input.text()
+        self.login_screen_widget.login_button.setEnabled(False)  # Disable until attempt finishes
+        self.db_tasks.run(self.log_in_to_vault, password, on_result=self.finish_login,
+                          on_error=self.login_error)
 
-        # Check if user has an account. If not, display message.
+    def log_in_to_vault(self, password):
+        """
+        Checks that a master account exists and connects to the database with
+        the given password. Runs on the database thread.
+        :param password: master password entered by the user
+        :return: Tuple of the login result and the master username
+        """
+
+        # Check if user has an account
         if self.vault_cnx.test_default_password():
-            self.show_create_account_message()
-        else:
+            return LOGIN_NO_ACCOUNT, None
+
+        if not self.vault_cnx.connect_to_db(password):
+            return LOGIN_FAILED, None
 
-            # If password is correct, create remaining screens and go to main screen
-            if self.vault_cnx.connect_to_db(self.login_screen_widget.password_input.text()):
+        return LOGIN_SUCCESSFUL, self.vault_cnx.get_master_username()
+
+    def finish_login(self, login_result):
+        """
+        Goes to the main screen after a successful login. Displays message if
+        attempt failed.
+        :param login_result: tuple returned by log_in_to_vault
+        """
+        login_status, master_user = login_result
+
+        # If user has no account, display message
+        if login_status == LOGIN_NO_ACCOUNT:
+            self.show_create_account_message()
+            return
 
-                self.add_account_settings_to_menu_bar()
+        self.login_screen_widget.login_button.setEnabled(True)
 
-                if self.screens_already_exist():
-                    self.central_widget.setCurrentIndex(2)
-                    return
+        # If password is correct, create remaining screens and go to main screen
+        if login_status == LOGIN_SUCCESSFUL:
 
-                self.create_remaining_screen_widgets()
-                self.display_master_username()
+            self.add_account_settings_to_menu_bar()
+            self.resume_key_rotation()
 
-                # Go to main screen and enlarge window
+            if self.screens_already_exist():
+                self.display_master_username(master_user)
                 self.central_widget.setCurrentIndex(2)
-                self.setGeometry(600, 500, 550, 400)
-            else:
-                self.show_failed_login_message()
+                return
+
+            self.create_remaining_screen_widgets()
+            self.display_master_username(master_user)
+
+            # Go to main screen and enlarge window
+            self.central_widget.setCurrentIndex(2)
+            self.setGeometry(600, 500, 550, 400)
+        else:
+            self.show_failed_login_message()
+
+    def login_error(self, err):
+        """
+        Re-enables the login button and displays the error raised while logging in
+        """
+        self.login_screen_widget.login_button.setEnabled(True)
+        self.show_database_error(err)
 
     def show_create_account_message(self):
         """
@@ -136,6 +279,7 @@ class MainWindow(QMainWindow):
         self.create_add_password_screen_widget()
         self.create_edit_password_screen_widget()
         self.edit_master_account_screen_widget = EditMasterAccountScreen(self)
+        self.audit_screen_widget = AuditScreen(self)
         self.add_remaining_widgets_to_stack()
 
     def screens_already_exist(self):
@@ -147,17 +291,19 @@ class MainWindow(QMainWindow):
         add_exists = self.add_password_screen_widget is not None
         edit_exists = self.edit_password_screen_widget is not None
         edit_master_exists = self.edit_master_account_screen_widget is not None
-        return main_exists and add_exists and edit_exists and edit_master_exists
+        audit_exists = self.audit_screen_widget is not None
+        return main_exists and add_exists and edit_exists and edit_master_exists and audit_exists
 
     def add_remaining_widgets_to_stack(self):
         """
-        Adds the main, add password, edit password, and edit master account screen
-        widgets to the central stacked widget
+        Adds the main, add password, edit password, edit master account, and audit
+        screen widgets to the central stacked widget
         """
         self.central_widget.addWidget(self.main_screen_widget)  # Index 2
         self.central_widget.addWidget(self.add_password_screen_widget)  # Index 3
         self.central_widget.addWidget(self.edit_password_screen_widget)  # Index 4
         self.central_widget.addWidget(self.edit_master_account_screen_widget)  # Index 5
+        self.central_widget.addWidget(self.audit_screen_widget)  # Index 6
 
     def create_main_screen_widget(self):
         """
@@ -182,11 +328,10 @@ class MainWindow(QMainWindow):
         self.edit_password_screen_widget.edit_button.clicked.connect(self.attempt_to_edit_password)
         self.edit_password_screen_widget.cancel_button.clicked.connect(self.go_to_main_screen_from_edit)
 
-    def display_master_username(self):
+    def display_master_username(self, master_user):
         """
-        Displays master username stored in database
+        Displays the given master username on the main screen
         """
-        master_user = self.vault_cnx.get_master_username()
         self.main_screen_widget.welcome_label.setText("Welcome, " + master_user)
 
     def add_account_settings_to_menu_bar(self):
@@ -202,6 +347,22 @@ class MainWindow(QMainWindow):
         account_action.triggered.connect(self.go_to_edit_master_account_screen)
         self.account_menu.addAction(account_action)
 
+        audit_action = QAction("Password Strength Audit", self)
+        audit_action.triggered.connect(self.go_to_audit_screen)
+        self.account_menu.addAction(audit_action)
+
+        import_action = QAction("Import Passwords", self)
+        import_action.triggered.connect(self.import_passwords_from_file)
+        self.account_menu.addAction(import_action)
+
+        export_backup_action = QAction("Export Encrypted Backup", self)
+        export_backup_action.triggered.connect(self.export_backup_to_file)
+        self.account_menu.addAction(export_backup_action)
+
+        restore_backup_action = QAction("Restore Encrypted Backup", self)
+        restore_backup_action.triggered.connect(self.restore_backup_from_file)
+        self.account_menu.addAction(restore_backup_action)
+
         logout_action = QAction("Sign Out", self)
         logout_action.triggered.connect(self.go_to_login_screen)
         self.account_menu.addAction(logout_action)
@@ -215,15 +376,177 @@ class MainWindow(QMainWindow):
 
     def go_to_edit_master_account_screen(self):
         """
-        Creates an EditMasterAccountScreen widget then routes user to that
-        screen
+        Fetches the master username then routes user to the edit master
+        account screen
         """
+        self.db_tasks.run(self.vault_cnx.get_master_username, on_result=self.show_edit_master_account_screen)
 
-        # Display current username in the username input prior to routing
-        master_username = self.vault_cnx.get_master_username()
+    def show_edit_master_account_screen(self, master_username):
+        """
+        Displays current username in the username input then routes user to
+        the edit master account screen
+        """
         self.edit_master_account_screen_widget.name_input.setText(master_username)
         self.central_widget.setCurrentIndex(5)
 
+    def go_to_audit_screen(self):
+        """
+        Audits the strength of every stored password on the audit thread,
+        showing progress in the status bar, then routes user to the audit screen
+        """
+        self.audit_tasks.run(self.audit_screen_widget.run_audit,
+                             on_progress=lambda scored_count:
+                             self.statusBar().showMessage("Auditing passwords... " + str(scored_count) + " scored"),
+                             on_result=self.show_audit_screen)
+
+    def show_audit_screen(self, audit_report):
+        """
+        Displays the given audit report on the audit screen, unless the
+        audit was stopped because the app is closing
+        """
+        if audit_report is None:
+            return
+
+        self.statusBar().showMessage("Audited " + str(audit_report.total) + " passwords.")
+        self.audit_screen_widget.show_report(audit_report)
+        self.central_widget.setCurrentIndex(6)
+
+    def import_passwords_from_file(self):
+        """
+        Asks the user for a CSV, JSON Lines, or KeePass XML export then imports
+        it on the database thread, showing progress in the status bar
+        """
+        path = QFileDialog.getOpenFileName(self, "Import Passwords", "", IMPORT_FILE_FILTER)[0]
+        if path:
+            self.statusBar().showMessage("Importing passwords...")
+            self.db_tasks.run(import_passwords, self.vault_cnx, path,
+                              on_progress=self.show_import_progress,
+                              on_result=self.finish_importing_passwords,
+                              on_error=self.import_passwords_error)
+
+    def show_import_progress(self, progress):
+        """
+        Displays the progress of a running import in the status bar
+        """
+        self.statusBar().showMessage("Importing passwords... " + str(progress.percent_done) + "% read, " +
+                                     str(progress.imported) + " imported, " + str(progress.skipped) +
+                                     " skipped (" + str(round(progress.entries_per_second)) + " per second)")
+
+    def finish_importing_passwords(self, progress):
+        """
+        Reloads the main screen table with the imported passwords and displays
+        the import totals
+        """
+        self.main_screen_widget.load_password_data()
+        self.statusBar().showMessage("Imported " + str(progress.imported) + " passwords in " +
+                                     str(round(progress.seconds, 1)) + " seconds. Skipped " +
+                                     str(progress.skipped) + " invalid entries.")
+
+    def import_passwords_error(self, err):
+        """
+        Reloads the main screen table, which keeps any passwords imported before
+        the error, and displays the error raised while importing
+        """
+        self.main_screen_widget.load_password_data()
+        self.statusBar().showMessage("Import failed: " + str(err))
+
+    def export_backup_to_file(self):
+        """
+        Asks the user for a backup file and a password to encrypt it with,
+        then exports every stored password on the database thread
+        """
+        path = QFileDialog.getSaveFileName(self, "Export Encrypted Backup", "", BACKUP_FILE_FILTER)[0]
+        if not path:
+            return
+        if not path.endswith(BACKUP_FILE_EXTENSION):
+            path += BACKUP_FILE_EXTENSION
+
+        password = self.ask_for_backup_password("Choose a password for this backup:")
+        if password is None:
+            return
+        if password != self.ask_for_backup_password("Re-enter the backup password:"):
+            self.statusBar().showMessage("Backup passwords must match. No backup was written.")
+            return
+
+        self.statusBar().showMessage("Exporting backup...")
+        self.db_tasks.run(export_backup, self.vault_cnx, path, password,
+                          on_progress=lambda row_count:
+                          self.statusBar().showMessage("Exporting backup... " + str(row_count) + " passwords"),
+                          on_result=lambda row_count:
+                          self.statusBar().showMessage("Exported " + str(row_count) + " passwords to the backup."),
+                          on_error=lambda err: self.statusBar().showMessage("Backup failed: " + str(err)))
+
+    def restore_backup_from_file(self):
+        """
+        Asks the user for a backup file and its password, then adds the
+        passwords in the backup to the vault on the database thread
+        """
+        path = QFileDialog.getOpenFileName(self, "Restore Encrypted Backup", "", BACKUP_FILE_FILTER)[0]
+        if not path:
+            return
+
+        password = self.ask_for_backup_password("Enter the password of this backup:")
+        if password is None:
+            return
+
+        self.statusBar().showMessage("Verifying backup...")
+        self.db_tasks.run(restore_backup, self.vault_cnx, path, password,
+                          on_progress=lambda row_count:
+                          self.statusBar().showMessage("Restoring backup... " + str(row_count) + " passwords"),
+                          on_result=self.finish_restoring_backup,
+                          on_error=self.restore_backup_error)
+
+    def resume_key_rotation(self):
+        """
+        Re-encrypts the stored passwords with the newest data key on the
+        rotation thread if a master password change left a key rotation
+        unfinished, so copying and editing passwords never wait behind it.
+        Does nothing if no rotation is in progress. A rotation stopped by
+        closing the app resumes at the next login.
+        """
+        self.rotation_tasks.run(rotate_vault_key, self.vault_cnx, should_stop=lambda: self.closing,
+                                on_progress=lambda row_count:
+                                self.statusBar().showMessage("Re-encrypting passwords... " + str(row_count) + " done"),
+                                on_result=self.finish_key_rotation,
+                                on_error=lambda err:
+                                self.statusBar().showMessage("Re-encrypting passwords stopped: " + str(err) +
+                                                             ". It will resume at the next login."))
+
+    def finish_key_rotation(self, row_count):
+        """
+        Reports how many passwords were re-encrypted by a key rotation. Nothing
+        is reported if no rotation was in progress, or if it was stopped or
+        replaced by a newer master password change.
+        """
+        if row_count:
+            self.statusBar().showMessage("Re-encrypted " + str(row_count) + " passwords with the new master key.")
+
+    def ask_for_backup_password(self, label_text):
+        """
+        Shows a dialog asking for a backup password
+        :return: The entered password, or None if the dialog was cancelled or left empty
+        """
+        password, accepted = QInputDialog.getText(self, "Backup Password", label_text, QLineEdit.Password)
+        if not accepted or not password:
+            return None
+
+        return password
+
+    def finish_restoring_backup(self, row_count):
+        """
+        Reloads the main screen table with the restored passwords
+        """
+        self.main_screen_widget.load_password_data()
+        self.statusBar().showMessage("Restored " + str(row_count) + " passwords from the backup.")
+
+    def restore_backup_error(self, err):
+        """
+        Reloads the main screen table, which keeps any passwords restored before
+        the error, and displays the error raised while restoring
+        """
+        self.main_screen_widget.load_password_data()
+        self.statusBar().showMessage("Restore failed: " + str(err))
+
     def go_to_create_account_screen(self):
         """
         Shows the create account screen
@@ -243,10 +566,31 @@ class MainWindow(QMainWindow):
             self.create_account_screen_widget.password_match_label.setText("Passwords must match")
             self.create_account_screen_widget.password_match_label.setStyleSheet("background-color: yellow;")
         else:
-            self.vault_cnx.create_user(username, password_input)
-            self.clear_create_account_screen()
-            self.reset_login_screen()
-            self.go_to_login_screen()
+            self.create_account_screen_widget.create_account_button.setEnabled(False)
+            self.db_tasks.run(self.vault_cnx.create_user, username, password_input,
+                              on_result=self.finish_creating_account,
+                              on_error=self.create_account_error)
+
+    def finish_creating_account(self, create_status):
+        """
+        Routes the user back to the login screen once the master account is created
+        """
+        self.create_account_screen_widget.create_account_button.setEnabled(True)
+        if not create_status:
+            self.statusBar().showMessage("Database error while creating account.")
+            return
+
+        self.clear_create_account_screen()
+        self.reset_login_screen()
+        self.go_to_login_screen()
+
+    def create_account_error(self, err):
+        """
+        Re-enables the create account button and displays the error raised
+        while creating the account
+        """
+        self.create_account_screen_widget.create_account_button.setEnabled(True)
+        self.show_database_error(err)
 
     def clear_create_account_screen(self):
         """
@@ -285,13 +629,40 @@ class MainWindow(QMainWindow):
             # Add password and account to the database
             new_account = self.add_password_screen_widget.account_input.text()
             password_input = self.add_password_screen_widget.password_input.text()
-            add_password_status = self.vault_cnx.add_new_password(new_account, password_input)
+            reuse_warning = self.main_screen_widget.get_reuse_warning(password_input)
+            self.add_password_screen_widget.add_button.setEnabled(False)
+            self.db_tasks.run(self.vault_cnx.add_new_password, new_account, password_input,
+                              on_result=lambda new_password_id:
+                              self.finish_adding_password(new_password_id, new_account, password_input,
+                                                          reuse_warning),
+                              on_error=self.add_password_error)
 
-            # Check if there was a database error
-            if not add_password_status:
-                self.statusBar().showMessage("Database error while adding password.")
-            else:
-                self.go_to_main_screen_from_add()
+    def finish_adding_password(self, new_password_id, new_account, password_input, reuse_warning=""):
+        """
+        Adds the new password to the main screen table and routes back to the
+        main screen once the database insert has finished
+        :param reuse_warning: message shown if the password is also used for other accounts
+        """
+        self.add_password_screen_widget.add_button.setEnabled(True)
+
+        # Check if there was a database error
+        if not new_password_id:
+            self.statusBar().showMessage("Database error while adding password.")
+        else:
+
+            # Insert only the new row into the table instead of reloading all passwords
+            self.main_screen_widget.add_row(PasswordSummary(new_password_id, new_account, len(password_input)),
+                                            password_input)
+            self.go_to_main_screen_from_add()
+            if reuse_warning:
+                self.statusBar().showMessage("Password added. " + reuse_warning)
+
+    def add_password_error(self, err):
+        """
+        Re-enables the add button and displays the error raised while adding a password
+        """
+        self.add_password_screen_widget.add_button.setEnabled(True)
+        self.show_database_error(err)
 
     def attempt_to_edit_password(self):
         """
@@ -304,15 +675,42 @@ class MainWindow(QMainWindow):
             password_id = self.edit_password_screen_widget.password_id
             new_account = self.edit_password_screen_widget.account_input.text()
             password_input = self.edit_password_screen_widget.password_input.text()
+            reuse_warning = self.main_screen_widget.get_reuse_warning(password_input, password_id)
 
             # Add password to the database
-            edit_password_status = self.vault_cnx.edit_password(password_id, new_account, password_input)
+            self.edit_password_screen_widget.edit_button.setEnabled(False)
+            self.db_tasks.run(self.vault_cnx.edit_password, password_id, new_account, password_input,
+                              on_result=lambda edit_password_status:
+                              self.finish_editing_password(edit_password_status, new_account, password_input,
+                                                           reuse_warning),
+                              on_error=self.edit_password_error)
 
-            # Check if there was a database error
-            if not edit_password_status:
-                self.statusBar().showMessage("Database error while adding password.")
-            else:
-                self.go_to_main_screen_from_edit()
+    def finish_editing_password(self, password_id, new_account, password_input, reuse_warning=""):
+        """
+        Updates the edited password in the main screen table and routes back
+        to the main screen once the database update has finished
+        :param reuse_warning: message shown if the password is also used for other accounts
+        """
+        self.edit_password_screen_widget.edit_button.setEnabled(True)
+
+        # Check if there was a database error
+        if not password_id:
+            self.statusBar().showMessage("Database error while adding password.")
+        else:
+
+            # Update only the edited row instead of reloading all passwords
+            self.main_screen_widget.update_row(PasswordSummary(password_id, new_account, len(password_input)),
+                                               password_input)
+            self.go_to_main_screen_from_edit()
+            if reuse_warning:
+                self.statusBar().showMessage("Password edited. " + reuse_warning)
+
+    def edit_password_error(self, err):
+        """
+        Re-enables the edit button and displays the error raised while editing a password
+        """
+        self.edit_password_screen_widget.edit_button.setEnabled(True)
+        self.show_database_error(err)
 
     def password_input_errors_exist(self, add_or_edit_widget):
         """
@@ -336,7 +734,7 @@ class MainWindow(QMainWindow):
         elif len(password_input) == 0:
             return self.show_missing_password_message(add_or_edit_widget)
 
-        elif self.contains_unapproved_specials(password_input):
+        elif password_entropy.contains_unapproved_specials(password_input):
             return self.show_illegal_special_chars_message(add_or_edit_widget)
         else:
             return False
@@ -374,27 +772,15 @@ class MainWindow(QMainWindow):
         and returns True to indicate this
         """
         add_or_edit_widget.password_match_label.setText("Password can only have the "
-                                                        "following special characters: " + SPECIALS)
+                                                        "following special characters: " +
+                                                        password_entropy.SPECIALS)
         add_or_edit_widget.password_match_label.setStyleSheet("background-color: yellow;")
         return True
 
-    def contains_unapproved_specials(self, password):
-        """
-        Returns True if the given password contains special characters not in
-        the approved special characters constant SPECIALS
-        """
-        for char in password:
-            if char not in LOWERS and char not in UPPERS and char not in NUMBERS:
-                if char not in SPECIALS:
-                    return True
-
-        return False
-
     def go_to_main_screen_from_add(self):
         """
         Takes user back to main screen after clearing all add screen input fields
         """
-        self.main_screen_widget.load_password_data()
         self.clear_add_password_fields()
         self.central_widget.setCurrentIndex(2)  # Back to main screen
 
@@ -402,7 +788,6 @@ class MainWindow(QMainWindow):
         """
         Takes user back to main screen after clearing all edit screen input fields
         """
-        self.main_screen_widget.load_password_data()
         self.clear_edit_password_fields()
         self.central_widget.setCurrentIndex(2)
 
@@ -643,11 +1028,43 @@ class EditMasterAccountScreen(CreateAccountScreen):
             new_username = self.name_input.text()
             new_password = self.password_input.text()
 
-            self.vault_cnx.edit_master_username(new_username)
-            self.vault_cnx.edit_master_password(new_password)
+            self.create_account_button.setEnabled(False)
+            self.parent.db_tasks.run(self.save_master_user, new_username, new_password,
+                                     on_result=self.finish_updating_master_user,
+                                     on_error=self.update_master_user_error)
 
-            self.parent.display_master_username()
-            self.go_back_to_main_screen()
+    def save_master_user(self, new_username, new_password):
+        """
+        Saves the new username and password to the database in one
+        transaction. Runs on the database thread.
+        :return: The master username stored in the database, or None if saving failed
+        """
+        if not self.vault_cnx.edit_master_password(new_password, new_username):
+            return None
+
+        return self.vault_cnx.get_master_username()
+
+    def finish_updating_master_user(self, master_username):
+        """
+        Displays the updated username and routes user back to main screen,
+        then re-encrypts the stored passwords with the new master key
+        """
+        self.create_account_button.setEnabled(True)
+        if master_username is None:
+            self.parent.statusBar().showMessage("Database error while updating master account.")
+            return
+
+        self.parent.display_master_username(master_username)
+        self.go_back_to_main_screen()
+        self.parent.resume_key_rotation()
+
+    def update_master_user_error(self, err):
+        """
+        Re-enables the edit button and displays the error raised while
+        updating the master account
+        """
+        self.create_account_button.setEnabled(True)
+        self.parent.show_database_error(err)
 
     def go_back_to_main_screen(self):
         """
@@ -692,12 +1109,50 @@ class MainScreen(QWidget):
         self.welcome_label_widget = QWidget(self)
         self.welcome_label_widget.setLayout(welcome_label_layout)
 
-        # Create table widget to view accounts and passwords
-        self.password_table = QTableWidget(self)
+        # Create search input that filters the table as the user types. Until every
+        # password is loaded, the database is also searched once the user stops typing.
+        self.account_index = AccountIndex()
+        self.search_input = QLineEdit()
+        self.search_input.setPlaceholderText("Search accounts")
+        self.search_input.setClearButtonEnabled(True)
+        self.search_input.textChanged.connect(self.filter_passwords)
+        self.search_timer = QtCore.QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(SEARCH_DELAY)
+        self.search_timer.timeout.connect(self.search_passwords)
+
+        # Create index used to warn when a saved password is reused across accounts
+        self.reuse_detector = ReuseDetector()
+        self.reuse_indexed_id = 0  # Highest row id the reuse detector has read from the database
+        self.reuse_changed_ids = None  # Rows changed while a reuse detector pass runs, or None if none is running
+        self.reuse_update_pending = False  # True if another pass should start when the running one finishes
+
+        # Create table view and model to view accounts and passwords
+        self.password_model = PasswordTableModel(self)
+        self.password_table = QTableView(self)
+        self.password_table.setModel(self.password_model)
         self.password_table.verticalHeader().setVisible(False)
-        self.password_table.horizontalHeader().setVisible(False)
+
+        # Use fixed row heights so the view never has to measure rows that are not visible
+        self.password_table.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.password_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+
+        # Draw the Copy, Edit, and Delete buttons with delegates instead of per-row widgets
+        self.copy_delegate = ButtonDelegate(self.password_table)
+        self.copy_delegate.clicked.connect(self.copy_row_clicked)
+        self.password_table.setItemDelegateForColumn(PasswordTableModel.COPY_COLUMN, self.copy_delegate)
+
+        self.edit_delegate = ButtonDelegate(self.password_table)
+        self.edit_delegate.clicked.connect(self.edit_row_clicked)
+        self.password_table.setItemDelegateForColumn(PasswordTableModel.EDIT_COLUMN, self.edit_delegate)
+
+        self.delete_delegate = ButtonDelegate(self.password_table)
+        self.delete_delegate.clicked.connect(self.delete_row_clicked)
+        self.password_table.setItemDelegateForColumn(PasswordTableModel.DELETE_COLUMN, self.delete_delegate)
 
         # Refresh/add data to table
+        self.load_generation = 0
+        self.loading = False  # True until every page of the current load has arrived
         self.load_password_data()
 
         # Create button to add a password
@@ -705,6 +1160,7 @@ class MainScreen(QWidget):
 
         # Add all widgets to layout
         layout.addWidget(self.welcome_label_widget)
+        layout.addWidget(self.search_input)
         layout.addWidget(self.password_table)
         layout.addWidget(self.add_password_button)
 
@@ -712,81 +1168,276 @@ class MainScreen(QWidget):
 
     def load_password_data(self):
         """
-        Loads all password data from the database into the table
+        Streams the account names and password lengths from the database into
+        the table model on the database thread. Each page is shown as soon as
+        it arrives. Passwords are only fetched when they are copied or edited,
+        and by the reuse detector for rows it has not read yet.
         """
+        self.load_generation += 1
+        load_generation = self.load_generation
+        self.loading = True
+        self.account_index.build([])
+        self.password_model.set_password_data([])
 
-        # Get table data and build table
-        password_data = self.parent.vault_cnx.fetch_all_passwords()
-        self.build_empty_table(password_data)
+        self.parent.db_tasks.run(self.stream_password_data,
+                                 on_progress=lambda page: self.add_password_page(page, load_generation),
+                                 on_result=lambda result: self.finish_loading(load_generation))
+        self.update_reuse_detector()
+        if self.search_input.text():
+            self.search_timer.start()
 
-        # Populate table data
-        table_row = 0
-        while table_row < len(password_data):
-            curr_id = password_data[table_row]["row_id"]
-            curr_account = password_data[table_row]["account"]
-            curr_password = password_data[table_row]["password"]
+    def filter_passwords(self):
+        """
+        Shows only the accounts matching the search input, using the in-memory
+        account index. While passwords are still loading, the database is
+        searched as well. Clearing the search input shows all passwords again.
+        """
+        search_text = self.search_input.text()
+        if not search_text:
+            self.search_timer.stop()
+            self.password_model.set_filter(None, None)
+            return
 
-            self.password_table.setItem(table_row + 1, 0, QTableWidgetItem(curr_account))
+        matching_ids = self.account_index.search(search_text)
+        self.password_model.set_filter(matching_ids, lambda record: account_matches(search_text, record.account))
+        if self.loading:
+            self.search_timer.start()
 
-            # Replace password text with asterisks
-            password_len = len(curr_password)
-            password_hidden = ""
-            for index in range(password_len):
-                password_hidden += "*"
+    def search_passwords(self):
+        """
+        Searches the database for accounts matching the search input that the
+        account index may not have yet, because they have not been loaded
+        """
+        search_text = self.search_input.text()
+        if not search_text or not self.loading:
+            return
 
-            self.password_table.setItem(table_row + 1, 1, QTableWidgetItem(password_hidden))
+        load_generation = self.load_generation
+        self.parent.search_tasks.run(self.parent.vault_cnx.search_passwords, search_text,
+                                     prefix_only=len(search_text) < TRIGRAM_LENGTH, summaries_only=True,
+                                     on_result=lambda results: self.add_search_results(results, load_generation))
 
-            # Add copy button
-            self.copy_button = QPushButton("Copy")
-            self.password_table.setCellWidget(table_row + 1, 2, self.copy_button)
-            self.copy_button.setToolTip("Copy for 15 seconds")
-            self.copy_button.clicked.connect(lambda state, password=curr_password:
-                                             self.copy_button_click(password))
+    def add_search_results(self, results, load_generation):
+        """
+        Adds the matches of a database search that have not been loaded yet
+        to the account index and the table, where the search filter shows them.
+        Results of a search made during an earlier load are ignored.
+        """
+        if load_generation == self.load_generation and self.loading:
+            self.add_password_page(results, load_generation)
+            if len(results) == SEARCH_LIMIT:
+                self.parent.statusBar().showMessage("Showing the first " + str(SEARCH_LIMIT) +
+                                                    " matches until all passwords are loaded")
 
-            # Add edit button with signal connected to a function that displays edit screen
-            edit_button = QPushButton("Edit")
-            self.password_table.setCellWidget(table_row + 1, 3, edit_button)
-            edit_button.clicked.connect(lambda state,
-                                        password_id=curr_id, account=curr_account, password=curr_password:
-                                        self.edit_password_button_click(password_id, account, password))
+    def finish_loading(self, load_generation):
+        """
+        Marks the current load as complete, after which searches only use the account index
+        """
+        if load_generation == self.load_generation:
+            self.loading = False
+            self.search_timer.stop()
 
-            # Add delete button
-            delete_button = QPushButton("Delete")
-            self.password_table.setCellWidget(table_row + 1, 4, delete_button)
-            delete_button.clicked.connect(lambda state, password_id=curr_id, account=curr_account:
-                                          self.show_delete_dialog_box(password_id, account))
+    def add_row(self, summary, password):
+        """
+        Adds a new password to the account index, the reuse detector, and the table
+        :param summary: PasswordSummary of the new row
+        :param password: the new password, which is only kept by the reuse detector as a digest
+        """
+        self.account_index.add(summary.row_id, summary.account)
+        self.add_to_reuse_detector(summary.row_id, password)
+        self.password_model.insert_row(summary)
 
-            table_row += 1
+    def update_row(self, summary, password):
+        """
+        Updates an edited password in the account index, the reuse detector, and the table
+        :param summary: PasswordSummary of the edited row
+        :param password: the new password, which is only kept by the reuse detector as a digest
+        """
+        self.account_index.add(summary.row_id, summary.account)
+        self.add_to_reuse_detector(summary.row_id, password)
+        self.password_model.update_row(summary)
 
-        # Resize width of first column
-        self.password_table.resizeColumnToContents(0)
+    def remove_row(self, row_id):
+        """
+        Removes a deleted password from the account index, the reuse detector, and the table
+        """
+        self.account_index.remove(row_id)
+        self.reuse_detector.remove(row_id)
+        if self.reuse_changed_ids is not None:
+            self.reuse_changed_ids.add(row_id)
+        self.password_model.remove_row(row_id)
 
-    def build_empty_table(self, password_data):
+    def stream_password_data(self, progress_callback):
         """
-        Builds the password table with a header row and no data yet
+        Reads pages of password summaries from the database and passes each
+        one to the progress callback. Runs on the database thread.
         """
+        for page in self.parent.vault_cnx.iter_password_pages(summaries_only=True):
+            progress_callback(page)
 
-        # Define table size
-        self.password_table.setRowCount(len(password_data) + 1)
-        self.password_table.setColumnCount(5)
+    def add_password_page(self, page, load_generation):
+        """
+        Adds a page of streamed password summaries to the table model,
+        ignoring pages left over from an earlier load and rows a search
+        already added
+        """
+        if load_generation == self.load_generation:
+            page = [row_data for row_data in page if row_data.row_id not in self.password_model.records_by_id]
+            self.account_index.add_records(page)
+            self.password_model.add_rows(page)
 
-        # Populate header row
-        self.password_table.setItem(0, 0, QTableWidgetItem("Account Name"))
-        self.password_table.setItem(0, 1, QTableWidgetItem("Password"))
-        self.password_table.setItem(0, 2, QTableWidgetItem("Copy Password"))
-        self.password_table.setItem(0, 3, QTableWidgetItem("Edit Password"))
-        self.password_table.setItem(0, 4, QTableWidgetItem("Delete Password"))
+    def add_to_reuse_detector(self, row_id, password):
+        """
+        Adds a saved password to the reuse detector, and keeps a running pass
+        from replacing it with the password read before it was saved
+        """
+        self.reuse_detector.add(row_id, password)
+        if self.reuse_changed_ids is not None:
+            self.reuse_changed_ids.add(row_id)
+
+    def update_reuse_detector(self):
+        """
+        Starts a pass that adds the passwords the reuse detector has not read
+        yet on the reuse detector thread. Only the first pass after logging in
+        reads the whole vault. Later passes only read rows added since, such as
+        imported or restored ones, because rows added, edited, and deleted in
+        the app are applied as they are saved.
+        """
+        if self.reuse_changed_ids is not None:
+            self.reuse_update_pending = True
+            return
+
+        self.reuse_changed_ids = set()
+        self.parent.reuse_tasks.run(self.hash_new_passwords, self.reuse_detector, self.reuse_indexed_id,
+                                    on_progress=self.add_reuse_entries,
+                                    on_result=lambda result: self.finish_reuse_update(),
+                                    on_error=self.reuse_update_error)
+
+    def hash_new_passwords(self, reuse_detector, after_id, progress_callback):
+        """
+        Reads the passwords stored after the given row id and passes their
+        reuse detector entries to the progress callback one page at a time.
+        Each page of decrypted passwords is dropped once it has been hashed.
+        Runs on the reuse detector thread.
+        """
+        for page in self.parent.vault_cnx.iter_password_snapshot(after_id=after_id):
+            if self.parent.closing:
+                return
+
+            progress_callback([reuse_detector.get_entry(record.row_id, record.password) for record in page])
+
+    def add_reuse_entries(self, entries):
+        """
+        Adds a page of entries hashed by a reuse detector pass, skipping rows
+        changed in the app since the pass started
+        """
+        for entry in entries:
+            if entry[0] not in self.reuse_changed_ids:
+                self.reuse_detector.add_entry(entry)
+
+        self.reuse_indexed_id = max(self.reuse_indexed_id, entries[-1][0])
+
+    def finish_reuse_update(self):
+        """
+        Ends a reuse detector pass, starting another if rows were added while it ran
+        """
+        self.reuse_changed_ids = None
+        if self.reuse_update_pending:
+            self.reuse_update_pending = False
+            self.update_reuse_detector()
+
+    def reuse_update_error(self, err):
+        """
+        Ends a reuse detector pass that failed and displays the error. The next
+        pass continues from the last row that was read.
+        """
+        self.parent.show_database_error(err)
+        self.finish_reuse_update()
+
+    def get_reuse_warning(self, password, exclude_id=None):
+        """
+        Checks the reuse detector for stored passwords that are the same as or
+        similar to the given password
+        :param exclude_id: row id of the password being edited, if any
+        :return: A warning naming the accounts found, or an empty string if there are none
+        """
+        reused_ids = self.reuse_detector.find_reused(password, exclude_id)
+        if reused_ids:
+            return "This password is also used for " + self.get_account_names(reused_ids) + "."
+
+        similar_ids = self.reuse_detector.find_similar(password, exclude_id)
+        if similar_ids:
+            return "This password is similar to the one used for " + self.get_account_names(similar_ids) + "."
+
+        return ""
+
+    def get_account_names(self, row_ids):
+        """
+        Returns the sorted account names of the given rows as one string,
+        listing at most MAX_REUSE_ACCOUNTS_SHOWN names. The reuse detector
+        can know rows the table has not loaded yet, which are only counted.
+        """
+        records_by_id = self.password_model.records_by_id
+        account_names = sorted(records_by_id[row_id].account for row_id in row_ids if row_id in records_by_id)
+        shown_names = account_names[:MAX_REUSE_ACCOUNTS_SHOWN]
+        other_count = len(row_ids) - len(shown_names)
+        if not shown_names:
+            return str(other_count) + (" other account" if other_count == 1 else " other accounts")
+
+        shown_names = ", ".join(shown_names)
+        if other_count:
+            shown_names += " and " + str(other_count) + " more"
+
+        return shown_names
+
+    def copy_row_clicked(self, row):
+        """
+        Fetches the password in the given table row on the database thread, then copies it
+        """
+        self.parent.db_tasks.run(self.parent.vault_cnx.fetch_password, self.password_model.row_data(row).row_id,
+                                 on_result=self.finish_copying_password)
+
+    def finish_copying_password(self, record):
+        """
+        Copies a password fetched by copy_row_clicked
+        :param record: PasswordRecord of the row, or None if it was deleted
+        """
+        if record is None:
+            self.parent.statusBar().showMessage("That password no longer exists.")
+        else:
+            self.copy_button_click(record.password)
+
+    def edit_row_clicked(self, row):
+        """
+        Fetches the password in the given table row on the database thread,
+        then opens the edit screen for it
+        """
+        self.parent.db_tasks.run(self.parent.vault_cnx.fetch_password, self.password_model.row_data(row).row_id,
+                                 on_result=self.finish_fetching_password_to_edit)
+
+    def finish_fetching_password_to_edit(self, record):
+        """
+        Opens the edit screen for a password fetched by edit_row_clicked
+        :param record: PasswordRecord of the row, or None if it was deleted
+        """
+        if record is None:
+            self.parent.statusBar().showMessage("That password no longer exists.")
+        else:
+            self.edit_password_button_click(record.row_id, record.account, record.password)
+
+    def delete_row_clicked(self, row):
+        """
+        Asks the user to confirm deletion of the password in the given table row
+        """
+        row_data = self.password_model.row_data(row)
+        self.show_delete_dialog_box(row_data.row_id, row_data.account)
 
     def copy_button_click(self, password):
         """
         Copies the given password to the clipboard for 15 seconds then removes
-        it from the clipboard using a background thread
+        it from the clipboard
         """
-        pyperclip.copy(password)
-
-        # Start a new thread to wait 15 seconds then clear clipboard
-        thr = threading.Thread(target=clear_clipboard)
-        thr.start()
+        self.parent.clipboard_manager.copy(password)
 
     def edit_password_button_click(self, password_id, account, password):
         """
@@ -820,13 +1471,393 @@ class MainScreen(QWidget):
         if reply_value == QMessageBox.Yes:
 
             # Delete password from database
-            delete_status = self.parent.vault_cnx.delete_password(password_id)
+            self.parent.db_tasks.run(self.parent.vault_cnx.delete_password, password_id,
+                                     on_result=self.finish_deleting_password)
+
+    def finish_deleting_password(self, deleted_password_id):
+        """
+        Removes the deleted password from the table once the database delete
+        has finished
+        """
+
+        # Check if deletion was successful
+        if not deleted_password_id:
+            self.parent.statusBar().showMessage("Database error while deleting password.")
+        else:
+            self.remove_row(deleted_password_id)
+
+
+class AuditScreen(QWidget):
+    """
+    This class defines the audit screen, which shows how many stored
+    passwords fall into each strength category and lists the weakest ones
+    """
+
+    def __init__(self, parent=None):
+        super().__init__()
+        self.parent = parent
+        self.auditor = PasswordAuditor()  # Caches scores between audits
+        layout = QVBoxLayout()
+
+        # Create an instruction label
+        self.instruct_label = QLabel("Password strength audit")
+        self.instruct_label.setFont(QFont("Arial", 12))
+
+        # Create a label showing the number of passwords in each strength category
+        self.summary_label = QLabel("")
+
+        # Create table listing the weakest passwords
+        self.weakest_label = QLabel("Weakest passwords:")
+        self.weakest_table = QTableWidget(self)
+        self.weakest_table.setColumnCount(4)
+        self.weakest_table.setHorizontalHeaderLabels(["Account Name", "Strength", "Bits", "Breached"])
+        self.weakest_table.verticalHeader().setVisible(False)
+        self.weakest_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+
+        # Create button to go back to main screen
+        self.back_button = QPushButton("Back")
+        self.back_button.clicked.connect(lambda: self.parent.central_widget.setCurrentIndex(2))
+
+        # Add all widgets to layout
+        layout.addWidget(self.instruct_label)
+        layout.addWidget(self.summary_label)
+        layout.addWidget(self.weakest_label)
+        layout.addWidget(self.weakest_table)
+        layout.addWidget(self.back_button)
+        self.setLayout(layout)
+
+    def run_audit(self, progress_callback):
+        """
+        Audits every stored password, fetching and decrypting only the
+        passwords changed since the last audit. Runs on the audit thread.
+        :return: An AuditReport of all stored passwords
+        """
+        versions = self.parent.vault_cnx.fetch_password_versions()
+        records = self.parent.vault_cnx.fetch_passwords(self.auditor.get_changed_ids(versions))
+        return self.auditor.audit(versions, records, progress_callback, should_stop=lambda: self.parent.closing)
+
+    def show_report(self, audit_report):
+        """
+        Displays the category counts and weakest passwords of the given report
+        """
+        summary_lines = ["Total passwords: " + str(audit_report.total)]
+        for strength in STRENGTH_CATEGORIES:
+            summary_lines.append(strength + ": " + str(audit_report.count(strength)))
+        summary_lines.append("Found in data breaches: " + str(len(audit_report.breached)))
+        self.summary_label.setText("\n".join(summary_lines))
+
+        self.weakest_table.setRowCount(len(audit_report.weakest))
+        for (row, entry) in enumerate(audit_report.weakest):
+            self.weakest_table.setItem(row, 0, QTableWidgetItem(entry.account))
+            self.weakest_table.setItem(row, 1, QTableWidgetItem(entry.strength))
+            self.weakest_table.setItem(row, 2, QTableWidgetItem(str(round(entry.bit_entropy, 2))))
+            self.weakest_table.setItem(row, 3, QTableWidgetItem("Yes" if entry.breached else "No"))
+
+
+class PasswordTableModel(QtCore.QAbstractTableModel):
+    """
+    This class defines the table model behind the main screen's password
+    table. The view only asks the model for the rows that are currently
+    visible, so no per-row widgets or items are created. Rows are kept
+    sorted by account name so that single rows can be inserted, updated,
+    or removed with a binary search instead of reloading the whole table.
+    The model can also show only a filtered subset of its rows.
+    """
+
+    ACCOUNT_COLUMN = 0
+    PASSWORD_COLUMN = 1
+    COPY_COLUMN = 2
+    EDIT_COLUMN = 3
+    DELETE_COLUMN = 4
 
-            # Check if deletion was successful
-            if not delete_status:
-                self.parent.statusBar().showMessage("Database error while deleting password.")
+    HEADERS = ["Account Name", "Password", "Copy Password", "Edit Password", "Delete Password"]
+    BUTTON_TEXT = {COPY_COLUMN: "Copy", EDIT_COLUMN: "Edit", DELETE_COLUMN: "Delete"}
 
-            self.load_password_data()
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.records_by_id = {}  # Maps row id to the PasswordSummary of that row
+        self.sort_keys_by_id = {}  # Maps row id to the sort key of that row
+        self.all_sort_keys = []  # Sorted keys of every row
+        self.visible_sort_keys = self.all_sort_keys  # Sorted keys of the shown rows, the same list if unfiltered
+        self.row_filter = None  # Function deciding if a row is shown, or None to show every row
+
+    @staticmethod
+    def get_sort_key(row_data):
+        """
+        Returns the key the table rows are sorted by. The row id breaks ties
+        between accounts with the same name.
+        """
+        return row_data.account.lower(), row_data.row_id
+
+    def is_filtered(self):
+        """
+        Returns True if only some of the rows are shown
+        """
+        return self.visible_sort_keys is not self.all_sort_keys
+
+    def set_password_data(self, password_data):
+        """
+        Replaces all rows in the model with the given password data
+        :param password_data: list of PasswordSummary objects
+        """
+        self.beginResetModel()
+        self.records_by_id = {record.row_id: record for record in password_data}
+        self.sort_keys_by_id = {record.row_id: self.get_sort_key(record) for record in password_data}
+
+        # Rows already arrive ordered by account name, so this sort is close to linear
+        self.all_sort_keys = sorted(self.sort_keys_by_id.values())
+        if self.row_filter is None:
+            self.visible_sort_keys = self.all_sort_keys
+        else:
+            self.visible_sort_keys = [key for key in self.all_sort_keys
+                                      if self.row_filter(self.records_by_id[key[1]])]
+        self.endResetModel()
+
+    def set_filter(self, visible_ids, row_filter):
+        """
+        Shows only the rows with the given row ids. Passing None for both
+        arguments shows every row again.
+        :param visible_ids: collection of the row ids to show
+        :param row_filter: function that returns True if a given PasswordSummary should be
+                           shown, used for rows added or edited while the filter is active
+        """
+        self.beginResetModel()
+        self.row_filter = row_filter
+        if visible_ids is None:
+            self.visible_sort_keys = self.all_sort_keys
+        elif len(visible_ids) * FILTER_SCAN_RATIO > len(self.all_sort_keys):
+
+            # When most rows match, one pass over the sorted keys is cheaper than sorting the matches
+            visible_ids = set(visible_ids)
+            self.visible_sort_keys = [key for key in self.all_sort_keys if key[1] in visible_ids]
+        else:
+            self.visible_sort_keys = sorted(self.sort_keys_by_id[row_id] for row_id in visible_ids
+                                            if row_id in self.sort_keys_by_id)
+        self.endResetModel()
+
+    def add_rows(self, password_data):
+        """
+        Adds many rows to the model. The rows are sorted once, then inserted
+        in blocks of rows that share a position, so the pages of a streamed
+        load are appended as one block each. The database may sort account
+        names differently from get_sort_key, for example names with accents,
+        which then only splits a page into a few blocks.
+        :param password_data: list of PasswordSummary objects
+        """
+        if not password_data:
+            return
+
+        new_rows = sorted(password_data, key=self.get_sort_key)
+        new_keys = [self.get_sort_key(row_data) for row_data in new_rows]
+        for row_data, key in zip(new_rows, new_keys):
+            self.records_by_id[row_data.row_id] = row_data
+            self.sort_keys_by_id[row_data.row_id] = key
+
+        # Only insert the new rows that pass the filter into the shown rows
+        if self.is_filtered():
+            for (position, keys) in reversed(_get_insert_blocks(self.all_sort_keys, new_keys)):
+                self.all_sort_keys[position:position] = keys
+            new_keys = [key for (row_data, key) in zip(new_rows, new_keys) if self.row_filter(row_data)]
+
+        # Insert the last blocks first, so the positions of earlier blocks stay valid
+        for (position, keys) in reversed(_get_insert_blocks(self.visible_sort_keys, new_keys)):
+            self.beginInsertRows(QtCore.QModelIndex(), position, position + len(keys) - 1)
+            self.visible_sort_keys[position:position] = keys
+            self.endInsertRows()
+
+    def insert_row(self, row_data):
+        """
+        Inserts a single row at its sorted position
+        :param row_data: PasswordSummary of the row
+        """
+        key = self.get_sort_key(row_data)
+        self.records_by_id[row_data.row_id] = row_data
+        self.sort_keys_by_id[row_data.row_id] = key
+
+        if self.is_filtered():
+            insort(self.all_sort_keys, key)
+            if not self.row_filter(row_data):
+                return
+
+        row = bisect_right(self.visible_sort_keys, key)
+        self.beginInsertRows(QtCore.QModelIndex(), row, row)
+        self.visible_sort_keys.insert(row, key)
+        self.endInsertRows()
+
+    def update_row(self, row_data):
+        """
+        Replaces the row with the same row id as the given row, moving it if
+        the account name changed
+        :param row_data: PasswordSummary of the row
+        """
+        old_key = self.sort_keys_by_id.get(row_data.row_id)
+        if old_key is None:
+            self.insert_row(row_data)
+            return
+
+        # Update in place if the row keeps its position, otherwise remove and reinsert it
+        row = self.find_row(row_data.row_id)
+        still_shown = self.row_filter is None or self.row_filter(row_data)
+        if row is not None and still_shown and old_key == self.get_sort_key(row_data):
+            self.records_by_id[row_data.row_id] = row_data
+            self.dataChanged.emit(self.index(row, 0), self.index(row, self.columnCount() - 1))
+        else:
+            self.remove_row(row_data.row_id)
+            self.insert_row(row_data)
+
+    def remove_row(self, row_id):
+        """
+        Removes the row with the given row id from the model
+        :param row_id: database id of the password to remove
+        """
+        row = self.find_row(row_id)
+        key = self.sort_keys_by_id.pop(row_id, None)
+        if key is None:
+            return
+
+        del self.records_by_id[row_id]
+        if self.is_filtered():
+            del self.all_sort_keys[bisect_left(self.all_sort_keys, key)]
+
+        if row is not None:
+            self.beginRemoveRows(QtCore.QModelIndex(), row, row)
+            del self.visible_sort_keys[row]
+            self.endRemoveRows()
+
+    def find_row(self, row_id):
+        """
+        Returns the table row showing the given row id, or None if the row id
+        is not in the model or is hidden by the filter
+        """
+        key = self.sort_keys_by_id.get(row_id)
+        if key is None:
+            return None
+
+        row = bisect_left(self.visible_sort_keys, key)
+        if row < len(self.visible_sort_keys) and self.visible_sort_keys[row] == key:
+            return row
+        return None
+
+    def row_data(self, row):
+        """
+        Returns the password summary for the given table row
+        """
+        return self.records_by_id[self.visible_sort_keys[row][1]]
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.visible_sort_keys)
+
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.HEADERS)
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        """
+        Returns the text shown in the given cell. Passwords are replaced with
+        asterisks and the button columns return their button text.
+        """
+        if not index.isValid():
+            return None
+
+        column = index.column()
+        if role == QtCore.Qt.DisplayRole:
+            row_data = self.row_data(index.row())
+            if column == self.ACCOUNT_COLUMN:
+                return row_data.account
+            elif column == self.PASSWORD_COLUMN:
+                return "*" * row_data.password_length
+            else:
+                return self.BUTTON_TEXT[column]
+
+        elif role == QtCore.Qt.ToolTipRole and column == self.COPY_COLUMN:
+            return "Copy for 15 seconds"
+
+        return None
+
+    def headerData(self, section, orientation, role=QtCore.Qt.DisplayRole):
+        if orientation == QtCore.Qt.Horizontal and role == QtCore.Qt.DisplayRole:
+            return self.HEADERS[section]
+        return None
+
+
+class ButtonDelegate(QStyledItemDelegate):
+    """
+    This class defines an item delegate that paints a push button in each
+    cell of a column and emits the row number when the button is clicked
+    """
+
+    clicked = QtCore.pyqtSignal(int)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.pressed_index = None
+
+    def paint(self, painter, option, index):
+        """
+        Draws a push button showing the cell text
+        """
+        button_option = QStyleOptionButton()
+        button_option.rect = option.rect.adjusted(2, 2, -2, -2)
+        button_option.text = index.data()
+        button_option.state = QStyle.State_Enabled | QStyle.State_Raised
+
+        QApplication.style().drawControl(QStyle.CE_PushButton, button_option, painter)
+
+    def editorEvent(self, event, model, option, index):
+        """
+        Tracks mouse presses on the button and emits the clicked signal when
+        the mouse is released over the same button
+        """
+        if event.type() == QtCore.QEvent.MouseButtonPress and event.button() == QtCore.Qt.LeftButton:
+            self.pressed_index = QtCore.QPersistentModelIndex(index)
+            return True
+
+        if event.type() == QtCore.QEvent.MouseButtonRelease and event.button() == QtCore.Qt.LeftButton:
+            was_pressed = self.pressed_index == QtCore.QPersistentModelIndex(index)
+            self.pressed_index = None
+            if was_pressed and option.rect.contains(event.pos()):
+                self.clicked.emit(index.row())
+            return True
+
+        return super().editorEvent(event, model, option, index)
+
+
+class ClipboardManager(QtCore.QObject):
+    """
+    This class copies passwords to the clipboard and clears them again after
+    CLIPBOARD_CLEAR_MS. One timer is restarted on every copy, so only the
+    latest copy is cleared, and only if the clipboard still holds it.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.copied_value = None  # Value this manager last put on the clipboard, or None
+        self.clear_timer = QtCore.QTimer(self)
+        self.clear_timer.setSingleShot(True)
+        self.clear_timer.setInterval(CLIPBOARD_CLEAR_MS)
+        self.clear_timer.timeout.connect(self.clear)
+
+    def copy(self, value):
+        """
+        Copies the given value to the clipboard and restarts the clear timer
+        """
+        pyperclip.copy(value)
+        self.copied_value = value
+        self.clear_timer.start()
+
+    def clear(self):
+        """
+        Clears the clipboard if it still holds the last copied value, leaving
+        anything the user copied since then in place
+        """
+        self.clear_timer.stop()
+        if self.copied_value is not None:
+            if pyperclip.paste() == self.copied_value:
+                pyperclip.copy("")
+            self.copied_value = None
 
 
 class AddEditPasswordScreen(QWidget):
@@ -868,7 +1899,7 @@ class AddEditPasswordScreen(QWidget):
 
         # Create password input and password label widgets
         self.password_input = QLineEdit()
-        self.password_input.textChanged.connect(self.get_password_strength)
+        self.password_input.textChanged.connect(self.schedule_password_strength)
         self.password_input.setPlaceholderText("Enter password here")
         self.password_label = QLabel("Password: ")
 
@@ -879,6 +1910,16 @@ class AddEditPasswordScreen(QWidget):
         self.password_strength_bar.setStyleSheet("QProgressBar::chunk {"
                                                  "background-color: green; }")
         self.password_strength_bar.setAlignment(QtCore.Qt.AlignCenter)
+        self.password_strength_color = "green"  # Color set by the current style sheet
+
+        # Estimate password strength on its own thread once typing pauses. A separate
+        # runner keeps estimates from waiting behind database operations.
+        self.strength_tasks = DatabaseTaskRunner(parent=self)
+        self.strength_timer = QtCore.QTimer(self)
+        self.strength_timer.setSingleShot(True)
+        self.strength_timer.setInterval(STRENGTH_DEBOUNCE_MS)
+        self.strength_timer.timeout.connect(self.get_password_strength)
+        self.strength_generation = 0  # Increased per estimate so results for older text are ignored
 
         # Create horizontal password layout
         password_layout = QHBoxLayout()
@@ -917,9 +1958,8 @@ class AddEditPasswordScreen(QWidget):
 
     def generate_password(self):
         """
-        Calls the RPyC microservice to generate a password of a specified length
-        that may contain uppercase, numbers, or special characters depending on
-        the user options
+        Generates a password of a specified length that may contain uppercase,
+        numbers, or special characters depending on the user options
         """
 
         # Get values for password length and user options
@@ -928,25 +1968,50 @@ class AddEditPasswordScreen(QWidget):
         has_number = self.generate_widget.numbers_check.isChecked()
         has_uppercase = self.generate_widget.case_check.isChecked()
 
-        # Call RPyC microservice to generate password
+        # Generate password, which only fails if the optional microservice backend is unavailable
         try:
-            conn = rpyc.connect("localhost", 18861)
-            generated_password = conn.root.exposed_get_password(password_length, has_uppercase,
-                                                                has_number, has_special_chars)
-        except ConnectionRefusedError:
+            generated_password = self.parent.password_generator.get_password(password_length, has_uppercase,
+                                                                              has_number, has_special_chars)
+        except GeneratorUnavailableError:
             self.parent.statusBar().showMessage("Error connecting to microservice")
         else:
             self.parent.statusBar().showMessage("Ready")
             self.password_input.setText(generated_password)
             self.reenter_input.setText(generated_password)
 
+    def schedule_password_strength(self):
+        """
+        This method is called every time the password input field is changed. It
+        restarts the strength timer, so the strength is estimated once the user
+        stops typing instead of on every keystroke.
+        """
+        self.strength_timer.start()
+
     def get_password_strength(self):
         """
-        This method is called every time the password input field is changed. The
-        password bit entropy is calculated and the corresponding strength is
-        displayed.
+        Starts estimating the strength of the entered password on a background
+        thread. An empty password is shown right away.
+        """
+        self.strength_generation += 1
+        password = self.password_input.text()
+        if not password:
+            self.show_password_strength((self.strength_generation, 0, False))
+            return
+
+        self.strength_tasks.run(estimate_password_strength, self.strength_generation, password,
+                                on_result=self.show_password_strength)
+
+    def show_password_strength(self, estimate):
+        """
+        Displays the password bit entropy and the corresponding strength, unless
+        the password was changed again after the estimate was started
+        :param estimate: tuple of the estimate's generation, the bit entropy, and
+                         whether the password was found in a data breach
         """
-        bit_entropy = password_entropy.get_entropy(self.password_input.text())
+        generation, bit_entropy, breached = estimate
+        if generation != self.strength_generation:
+            return
+
         password_strength_text = password_entropy.get_password_strength(bit_entropy)
 
         # Calculate password strength of out 150 bits
@@ -957,6 +2022,11 @@ class AddEditPasswordScreen(QWidget):
         # Change progress bar format and text
         self.password_strength_bar.setValue(strength_percentage)
         password_strength_with_bits = password_strength_text + " (" + str(round(bit_entropy, 2)) + " bits)"
+
+        # A breached password is shown as weak however random it looks
+        if breached:
+            password_strength_with_bits += " - found in a data breach"
+            password_strength_text = "Very Weak"
         self.password_strength_bar.setFormat(password_strength_with_bits)
 
         self.set_color_of_password_strength_bar(password_strength_text)
@@ -964,7 +2034,8 @@ class AddEditPasswordScreen(QWidget):
     def set_color_of_password_strength_bar(self, password_strength_text):
         """
         Sets the color of the password strength bar given a string of text
-        describing the password strength
+        describing the password strength. The style sheet is only replaced when
+        the color changes, as applying a style sheet is slow.
         """
         if password_strength_text == "Very Weak" or password_strength_text == "Weak":
             color = "red"
@@ -975,7 +2046,9 @@ class AddEditPasswordScreen(QWidget):
         else:
             color = "#18b549"
 
-        self.password_strength_bar.setStyleSheet("QProgressBar::chunk { background-color: " + color + "; }")
+        if color != self.password_strength_color:
+            self.password_strength_color = color
+            self.password_strength_bar.setStyleSheet("QProgressBar::chunk { background-color: " + color + "; }")
 
 
 class GeneratePasswordWidget(QWidget):
@@ -1087,12 +2160,33 @@ class EditPasswordScreen(AddEditPasswordScreen):
         self.setLayout(self.layout)
 
 
-def clear_clipboard():
+def estimate_password_strength(generation, password):
+    """
+    Estimates the bit entropy of the given password and checks it against the
+    breached password list. Runs on a background thread.
+    :param generation: number identifying the estimate, returned unchanged
+    :return: A tuple of the generation, the bit entropy, and True if the password was breached
+    """
+    return (generation, password_entropy.get_entropy(password, password_entropy.PATTERN_MODE),
+            password_entropy.is_password_breached(password))
+
+
+def _get_insert_blocks(sorted_keys, new_keys):
     """
-    Waits 15 seconds then clears the clipboard
+    Finds where sorted new keys belong in a sorted list of keys, grouping
+    neighbouring new keys that belong at the same position
+    :return: A list of (position, list of keys) tuples, in position order
     """
-    time.sleep(15)
-    pyperclip.copy("")
+    blocks = []
+    position = 0
+    for key in new_keys:
+        position = bisect_right(sorted_keys, key, position)
+        if blocks and blocks[-1][0] == position:
+            blocks[-1][1].append(key)
+        else:
+            blocks.append((position, [key]))
+
+    return blocks
 
 
 def main():
@@ -1102,6 +2196,10 @@ def main():
     app = QApplication([])
     main_window = MainWindow()
     app.exec()
+    main_window.clipboard_manager.clear()
+    main_window.stop_background_tasks()
+    main_window.vault_cnx.close_connection()
+    main_window.password_generator.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,248 @@
+# Author: Ian Docherty
+# Description: This module exports the vault to an encrypted backup file and restores
+#              backups into the vault. Rows are streamed in chunks that are compressed
+#              and encrypted one at a time with AES-GCM, so vaults of any size are
+#              backed up and restored in bounded memory.
+
+import hashlib
+import json
+import os
+import secrets
+import struct
+import zlib
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from password_importer import is_valid_entry
+from storage_backend import PAGE_SIZE
+
+
+# File extension of backup files
+BACKUP_FILE_EXTENSION = ".pvbackup"
+
+# Layout of the backup file header: magic, version, scrypt log2(n), r, p, and salt
+BACKUP_MAGIC = b"PVBK"
+BACKUP_VERSION = 1
+BACKUP_HEADER = struct.Struct("<4sHBBB16s")
+
+# Each chunk is stored as its length followed by the encrypted chunk
+CHUNK_LENGTH = struct.Struct("<I")
+MAX_CHUNK_SIZE = 16 << 20  # Longest encrypted or decompressed chunk accepted by restore
+
+# Each chunk's nonce is its index followed by a byte that is 1 only for the last
+# chunk, so chunks can't be reordered, dropped, or cut off the end of the file
+CHUNK_NONCE = struct.Struct(">QxxxB")
+
+# scrypt settings used to derive the backup key from the backup password
+SCRYPT_LOG2_N = 15
+SCRYPT_R = 8
+SCRYPT_P = 1
+SALT_SIZE = 16
+KEY_SIZE = 32
+
+# Largest scrypt settings accepted from a backup header, so a damaged header
+# can't make restore use unbounded memory or time
+MAX_SCRYPT_MEMORY = 256 << 20
+MAX_SCRYPT_P = 16
+
+# Separates the rows of a chunk, each stored as a JSON [account, password] list
+ROW_SEPARATOR = "\n"
+
+
+class BackupError(Exception):
+    """
+    Raised when a backup can't be written, or a backup file is damaged, has
+    been tampered with, or was opened with the wrong password
+    """
+    pass
+
+
+def export_backup(vault_cnx, path, password, chunk_rows=PAGE_SIZE, progress_callback=None):
+    """
+    Writes every stored password to an encrypted backup file. The file is
+    written to a temporary path first, so an interrupted export never leaves
+    a partial backup behind.
+    :param vault_cnx: connected StorageBackend object
+    :param path: path of the backup file to write
+    :param password: password the backup is encrypted with
+    :param chunk_rows: number of rows per encrypted chunk
+    :param progress_callback: if given, called with the number of rows written after each chunk
+    :return: The number of rows written
+    """
+    salt = secrets.token_bytes(SALT_SIZE)
+    header = BACKUP_HEADER.pack(BACKUP_MAGIC, BACKUP_VERSION, SCRYPT_LOG2_N, SCRYPT_R, SCRYPT_P, salt)
+    cipher = AESGCM(_derive_key(password, salt, SCRYPT_LOG2_N, SCRYPT_R, SCRYPT_P))
+
+    row_count = 0
+    chunk_index = 0
+    temp_path = path + ".tmp"
+    try:
+        with open(temp_path, "wb") as file:
+            file.write(header)
+
+            # Each chunk is written once the next one arrives, so the last one can be marked
+            pending_rows = []
+            for rows in vault_cnx.iter_password_snapshot(chunk_rows):
+                if pending_rows:
+                    _write_chunk(file, cipher, header, chunk_index, pending_rows, False)
+                    chunk_index += 1
+                pending_rows = rows
+                row_count += len(rows)
+                if progress_callback is not None:
+                    progress_callback(row_count)
+
+            _write_chunk(file, cipher, header, chunk_index, pending_rows, True)
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+    os.replace(temp_path, path)
+    return row_count
+
+
+def iter_backup_entries(path, password):
+    """
+    Generator that decrypts a backup file one chunk at a time and yields the
+    (account, password) pairs of each chunk as a list. Each chunk is verified
+    before any of its rows are returned.
+    :param path: path of the backup file
+    :param password: password the backup was encrypted with
+    """
+    with open(path, "rb") as file:
+        header = file.read(BACKUP_HEADER.size)
+        if len(header) != BACKUP_HEADER.size:
+            raise BackupError("Not a PasswordVault backup file")
+
+        magic, version, log2_n, r, p, salt = BACKUP_HEADER.unpack(header)
+        if magic != BACKUP_MAGIC:
+            raise BackupError("Not a PasswordVault backup file")
+        if version != BACKUP_VERSION:
+            raise BackupError("Unsupported backup version: " + str(version))
+
+        cipher = AESGCM(_derive_key(password, salt, log2_n, r, p))
+
+        chunk_index = 0
+        while True:
+            length_bytes = file.read(CHUNK_LENGTH.size)
+            if len(length_bytes) != CHUNK_LENGTH.size:
+                raise BackupError("The backup file is incomplete")
+
+            (length, ) = CHUNK_LENGTH.unpack(length_bytes)
+            encrypted_chunk = file.read(length)
+            if length > MAX_CHUNK_SIZE or len(encrypted_chunk) != length:
+                raise BackupError("The backup file is damaged")
+
+            # The last chunk only decrypts with the last chunk flag set
+            chunk, is_last = _decrypt_chunk(cipher, header, chunk_index, encrypted_chunk)
+            yield _decode_rows(chunk)
+
+            if is_last:
+                if file.read(1):
+                    raise BackupError("The backup file has data after its last chunk")
+                return
+
+            chunk_index += 1
+
+
+def restore_backup(vault_cnx, path, password, progress_callback=None):
+    """
+    Adds every password in a backup file to the vault. The whole file is
+    verified first, so a damaged or tampered file, or a wrong password, adds
+    nothing. Rows are then added one chunk per transaction.
+    :param vault_cnx: connected StorageBackend object
+    :param path: path of the backup file
+    :param password: password the backup was encrypted with
+    :param progress_callback: if given, called with the number of rows restored after each chunk
+    :return: The number of rows restored
+    """
+    for _ in iter_backup_entries(path, password):
+        pass
+
+    restored_count = 0
+    for entries in iter_backup_entries(path, password):
+        if entries:
+            added_count = vault_cnx.add_passwords_bulk(entries)
+            if added_count is False:
+                raise BackupError("Database error after restoring " + str(restored_count) + " passwords")
+
+            restored_count += added_count
+            if progress_callback is not None:
+                progress_callback(restored_count)
+
+    return restored_count
+
+
+def _derive_key(password, salt, log2_n, r, p):
+    """
+    Returns the AES key derived from the given backup password with scrypt
+    """
+    n = 1 << log2_n
+    memory = 128 * r * n
+    if memory > MAX_SCRYPT_MEMORY or p > MAX_SCRYPT_P:
+        raise BackupError("The backup file has invalid key settings")
+
+    try:
+        return hashlib.scrypt(password.encode("utf-8"), salt=salt, n=n, r=r, p=p,
+                              maxmem=2 * memory, dklen=KEY_SIZE)
+    except ValueError as err:
+        raise BackupError("The backup file has invalid key settings") from err
+
+
+def _write_chunk(file, cipher, header, chunk_index, rows, is_last):
+    """
+    Compresses, encrypts, and writes one chunk of rows. The file header is
+    authenticated with every chunk.
+    """
+    chunk = ROW_SEPARATOR.join(json.dumps([row.account, row.password]) for row in rows)
+    nonce = CHUNK_NONCE.pack(chunk_index, is_last)
+    encrypted_chunk = cipher.encrypt(nonce, zlib.compress(chunk.encode("utf-8")), header)
+
+    file.write(CHUNK_LENGTH.pack(len(encrypted_chunk)))
+    file.write(encrypted_chunk)
+
+
+def _decrypt_chunk(cipher, header, chunk_index, encrypted_chunk):
+    """
+    Decrypts and decompresses one chunk
+    :return: The chunk text, and True if it is the last chunk
+    """
+    for is_last in (False, True):
+        try:
+            compressed_chunk = cipher.decrypt(CHUNK_NONCE.pack(chunk_index, is_last), encrypted_chunk, header)
+        except InvalidTag:
+            continue
+
+        # Limit the decompressed size so a damaged chunk can't use unbounded memory
+        decompressor = zlib.decompressobj()
+        try:
+            chunk = decompressor.decompress(compressed_chunk, MAX_CHUNK_SIZE)
+        except zlib.error as err:
+            raise BackupError("The backup file is damaged") from err
+        if decompressor.unconsumed_tail or not decompressor.eof:
+            raise BackupError("The backup file is damaged")
+
+        return chunk.decode("utf-8"), is_last
+
+    raise BackupError("Wrong password, or the backup file is damaged")
+
+
+def _decode_rows(chunk):
+    """
+    Returns the (account, password) pairs stored in a decrypted chunk. Every
+    pair is checked with the rules of the add password screen, so a bad entry
+    stops the restore before anything is added.
+    """
+    if not chunk:
+        return []
+
+    entries = []
+    for row in chunk.split(ROW_SEPARATOR):
+        try:
+            account, password = json.loads(row)
+        except (TypeError, ValueError) as err:
+            raise BackupError("The backup file is damaged") from err
+        if not isinstance(account, str) or not isinstance(password, str) or not is_valid_entry(account, password):
+            raise BackupError("The backup file has an invalid entry")
+        entries.append((account, password))
+
+    return entries
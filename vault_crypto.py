@@ -0,0 +1,187 @@
+# Author: Ian Docherty
+# Description: This module encrypts stored passwords on the client before they reach
+#              the database. Each vault has a random data key that encrypts every row,
+#              and the data key is stored wrapped by a key derived from the master
+#              password, so changing the master password only rewraps the data key.
+
+import hashlib
+import math
+import os
+import struct
+import time
+from collections import namedtuple
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+
+# Seconds the master password key derivation should take when it is calibrated
+KDF_TARGET_SECONDS = 0.5
+
+# Bounds of the scrypt cost log2(n). The upper bound keeps memory use at 128 MiB.
+MIN_KDF_LOG2_N = 14
+MAX_KDF_LOG2_N = 17
+KDF_R = 8
+KDF_P = 1
+MAX_KDF_P = 16
+
+SALT_SIZE = 16
+KEY_SIZE = 32
+NONCE_SIZE = 12
+TAG_SIZE = 16
+
+# Encrypted passwords start with a format version and the id of the data key
+# that encrypted them, followed by the nonce and the AES-GCM ciphertext
+CIPHERTEXT_VERSION = 1
+CIPHERTEXT_HEADER = struct.Struct(">BI")
+CIPHERTEXT_START = CIPHERTEXT_HEADER.size + NONCE_SIZE
+CIPHERTEXT_OVERHEAD = CIPHERTEXT_START + TAG_SIZE  # Bytes an encrypted password adds to the password
+
+# Settings of one scrypt key derivation
+KdfParams = namedtuple("KdfParams", ["log2_n", "r", "p"])
+
+
+class VaultKeyError(Exception):
+    """
+    Raised when a data key can't be unwrapped with the given master password,
+    or an encrypted password can't be decrypted
+    """
+    pass
+
+
+def calibrate_kdf(target_seconds=KDF_TARGET_SECONDS):
+    """
+    Times one scrypt derivation at the lowest cost, then returns the settings
+    whose derivation takes about target_seconds on this computer. scrypt's
+    time doubles with each step of log2(n).
+    :return: A KdfParams object
+    """
+    start_time = time.perf_counter()
+    derive_key("calibration", bytes(SALT_SIZE), KdfParams(MIN_KDF_LOG2_N, KDF_R, KDF_P))
+    elapsed = max(time.perf_counter() - start_time, 1e-6)
+
+    extra_steps = math.floor(math.log2(target_seconds / elapsed)) if elapsed < target_seconds else 0
+    return KdfParams(min(MAX_KDF_LOG2_N, MIN_KDF_LOG2_N + extra_steps), KDF_R, KDF_P)
+
+
+def derive_key(password, salt, kdf_params):
+    """
+    Returns the key derived from the given master password with scrypt
+    :param kdf_params: KdfParams object
+    """
+
+    # Refuse stored settings that would use more memory than calibration ever picks
+    if not MIN_KDF_LOG2_N <= kdf_params.log2_n <= MAX_KDF_LOG2_N or kdf_params.r != KDF_R \
+            or not 1 <= kdf_params.p <= MAX_KDF_P:
+        raise VaultKeyError("The vault key has invalid key settings")
+
+    n = 1 << kdf_params.log2_n
+    return hashlib.scrypt(password.encode("utf-8"), salt=salt, n=n, r=kdf_params.r, p=kdf_params.p,
+                          maxmem=2 * 128 * kdf_params.r * n, dklen=KEY_SIZE)
+
+
+def generate_data_key():
+    """
+    Returns a new random data key
+    """
+    return AESGCM.generate_key(bit_length=8 * KEY_SIZE)
+
+
+def wrap_data_key(data_key, wrapping_key, salt, kdf_params):
+    """
+    Encrypts a data key with a key derived from the master password. The salt
+    and KDF settings are authenticated with it.
+    :return: The wrapped data key as bytes
+    """
+    nonce = os.urandom(NONCE_SIZE)
+    return nonce + AESGCM(wrapping_key).encrypt(nonce, data_key, _get_wrapping_aad(salt, kdf_params))
+
+
+def unwrap_data_key(wrapped_key, wrapping_key, salt, kdf_params):
+    """
+    Decrypts a data key wrapped by wrap_data_key
+    :return: The data key as bytes
+    """
+    try:
+        return AESGCM(wrapping_key).decrypt(wrapped_key[:NONCE_SIZE], wrapped_key[NONCE_SIZE:],
+                                            _get_wrapping_aad(salt, kdf_params))
+    except InvalidTag:
+        raise VaultKeyError("Wrong master password, or the vault key is damaged") from None
+
+
+def get_key_id(encrypted_password):
+    """
+    Returns the id of the data key that encrypted the given password, or
+    None if the value is not an encrypted password
+    """
+    if not isinstance(encrypted_password, (bytes, bytearray)) or len(encrypted_password) < CIPHERTEXT_START \
+            or encrypted_password[0] != CIPHERTEXT_VERSION:
+        return None
+
+    return CIPHERTEXT_HEADER.unpack_from(encrypted_password)[1]
+
+
+def _get_wrapping_aad(salt, kdf_params):
+    """
+    Returns the data authenticated along with a wrapped data key
+    """
+    return bytes(kdf_params) + salt
+
+
+class VaultCipher:
+    """
+    Encrypts and decrypts stored passwords with the unwrapped data keys of a
+    vault. An AESGCM object is created once per key and reused for every row,
+    and new passwords are encrypted with the current key. Each password is
+    bound to its account name, so encrypted passwords can't be swapped
+    between rows.
+    """
+
+    def __init__(self):
+        """
+        Creates a VaultCipher with no keys
+        """
+        self.data_keys = {}  # Maps key id to data key, kept so keys can be rewrapped
+        self.ciphers = {}  # Maps key id to the AESGCM object of that data key
+        self.current_key_id = None
+
+    def add_key(self, key_id, data_key, current=False):
+        """
+        Adds an unwrapped data key
+        :param current: True if new passwords should be encrypted with this key
+        """
+        self.data_keys[key_id] = data_key
+        self.ciphers[key_id] = AESGCM(data_key)
+        if current:
+            self.current_key_id = key_id
+
+    def encrypt(self, password, account):
+        """
+        Encrypts a password with the current data key
+        :return: The encrypted password as bytes
+        """
+        header = CIPHERTEXT_HEADER.pack(CIPHERTEXT_VERSION, self.current_key_id)
+        nonce = os.urandom(NONCE_SIZE)
+        ciphertext = self.ciphers[self.current_key_id].encrypt(nonce, password.encode("utf-8"),
+                                                                header + account.encode("utf-8"))
+        return header + nonce + ciphertext
+
+    def decrypt(self, encrypted_password, account):
+        """
+        Decrypts a password encrypted by encrypt
+        :param encrypted_password: the encrypted password as bytes or a bytearray
+        :return: The password
+        """
+        encrypted_password = bytes(encrypted_password)
+        version, key_id = CIPHERTEXT_HEADER.unpack_from(encrypted_password)
+        cipher = self.ciphers.get(key_id)
+        if version != CIPHERTEXT_VERSION or cipher is None:
+            raise VaultKeyError("Password encrypted with an unknown key")
+
+        try:
+            password = cipher.decrypt(encrypted_password[CIPHERTEXT_HEADER.size:CIPHERTEXT_START],
+                                      encrypted_password[CIPHERTEXT_START:],
+                                      encrypted_password[:CIPHERTEXT_HEADER.size] + account.encode("utf-8"))
+        except InvalidTag:
+            raise VaultKeyError("Encrypted password is damaged") from None
+
+        return password.decode("utf-8")